@@ -1,10 +1,14 @@
-from typing import AsyncGenerator
-from fastapi import Header, HTTPException, status
+from typing import AsyncGenerator, Callable
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from ..db.session import SessionLocal, TenantSessionLocal
+from ..db.tenant import tenant_scope
+from ..core.permissions import CompiledPermissions, get_permissions
+from ..core.rbac import Permission
+from ..core.security import verify_token
 
-from ..db.session import SessionLocal
-from ..core.config import settings
+bearer_scheme = HTTPBearer()
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -24,24 +28,72 @@ def get_tenant_school_id(x_school_id: int | None = Header(default=None)) -> int:
 async def get_tenant_db(
     x_school_id: int | None = Header(default=None),
 ) -> AsyncGenerator[AsyncSession, None]:
-    """Yield a DB session with per-request tenant GUC set for Postgres.
+    """Yield a DB session bound to the request's tenant for RLS.
 
-    Sets `SET LOCAL app.tenant_id` when using Postgres to enable RLS policies.
+    On Postgres every transaction of the session runs with `app.tenant_id`
+    set (see db/tenant.py); failing to set it fails the request.
     """
     if x_school_id is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Missing X-School-ID header for tenant context",
         )
-    async with SessionLocal() as session:
-        # Best-effort: only attempt on Postgres. Ignore on other engines.
-        if settings.database_url.startswith("postgresql"):
-            try:
-                await session.execute(
-                    text("SET LOCAL app.tenant_id = :tenant_id"),
-                    {"tenant_id": int(x_school_id)},
-                )
-            except Exception:
-                # Do not block request if SET fails (e.g., non-Postgres)
-                pass
-        yield session
\ No newline at end of file
+    async with tenant_scope(TenantSessionLocal, x_school_id) as session:
+        yield session
+
+
+def get_current_user_id(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+) -> int:
+    payload = verify_token(credentials.credentials)
+    try:
+        return int(payload["sub"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+
+
+def require(
+    permission: Permission,
+    scope: str | None = None,
+    scope_param: str | None = None,
+) -> Callable:
+    """Dependency factory enforcing `permission` in the tenant school.
+
+    With `scope="class"` (or "course") the id is read from the `class_id`
+    path/query parameter (override with `scope_param`) and checked against
+    the user's access-control entries. Returns the compiled permissions so
+    handlers can make further checks without extra queries. Permissions are
+    loaded on the route's tenant session (dependencies are cached per
+    request), so no second connection is checked out.
+    """
+    param = scope_param or (f"{scope}_id" if scope else None)
+
+    async def dependency(
+        request: Request,
+        user_id: int = Depends(get_current_user_id),
+        school_id: int = Depends(get_tenant_school_id),
+        db: AsyncSession = Depends(get_tenant_db),
+    ) -> CompiledPermissions:
+        compiled = await get_permissions(db, user_id)
+        scope_ref = None
+        if scope:
+            raw = request.path_params.get(param) or request.query_params.get(param)
+            if raw is not None:
+                try:
+                    scope_ref = (scope, int(raw))
+                except ValueError:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Invalid {param}",
+                    )
+        if not compiled.allows(school_id, permission, scope_ref):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Permission denied. Required: {permission.value}",
+            )
+        return compiled
+
+    return dependency
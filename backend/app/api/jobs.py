@@ -0,0 +1,43 @@
+from celery import Task
+from celery.result import AsyncResult
+from celery.utils import uuid
+from fastapi import HTTPException, status
+
+from ..celery_app import celery_app
+from ..schemas.jobs import JobOut
+
+OWNER_KEY = "job-owner-{}"
+
+
+def start_job(task: Task, school_id: int, *args) -> JobOut:
+    """Queue a tenant's Celery job as `task(school_id, *args)`.
+
+    The owning school is written to the result backend under the task id
+    before the task is sent, so `job_status` can check it in every state.
+    """
+    task_id = uuid()
+    celery_app.backend.set(OWNER_KEY.format(task_id), str(school_id))
+    task.apply_async(args=(school_id, *args), task_id=task_id)
+    return JobOut(task_id=task_id, state="PENDING")
+
+
+def job_status(task_id: str, school_id: int) -> JobOut:
+    """State of a tenant's Celery job started with `start_job`.
+
+    Jobs report PROGRESS with `done`/`total` and return a dict. Jobs of
+    another school, or not started through `start_job`, are not found.
+    """
+    owner = celery_app.backend.get(OWNER_KEY.format(task_id))
+    if owner is None or int(owner) != school_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    job = AsyncResult(task_id, app=celery_app)
+    info = job.info if isinstance(job.info, dict) else {}
+    out = JobOut(task_id=task_id, state=job.state)
+    if job.state == "PROGRESS":
+        out.done, out.total = info.get("done"), info.get("total")
+    elif job.state == "SUCCESS":
+        out.result = info
+    elif job.state == "FAILURE":
+        out.error = str(job.info)
+    return out
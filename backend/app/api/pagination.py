@@ -0,0 +1,60 @@
+from typing import Any, Sequence
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+class Page(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: int | None = None
+
+
+def project_columns(model: Any, fields: str | None, allowed: Sequence[str]) -> list[Any]:
+    """Resolve a comma-separated `fields` param into model columns.
+
+    `id` is always selected because it is the pagination key.
+    """
+    if not fields:
+        names = list(allowed)
+    else:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [n for n in names if n not in allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}",
+            )
+    if "id" not in names:
+        names.insert(0, "id")
+    return [getattr(model, n) for n in names]
+
+
+async def keyset_page(
+    db: AsyncSession,
+    model: Any,
+    columns: Sequence[Any],
+    where: Sequence[Any],
+    limit: int,
+    cursor: int | None,
+) -> Page:
+    """Fetch one page ordered by `id`, starting after `cursor`.
+
+    Reads `limit + 1` rows to know whether another page exists, so the cost
+    per request depends on the page size, not on the size of the table.
+    """
+    query = select(*columns).where(*where)
+    if cursor is not None:
+        query = query.where(model.id > cursor)
+    result = await db.execute(query.order_by(model.id).limit(limit + 1))
+    rows = [dict(row._mapping) for row in result]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["id"]
+    return Page(items=rows, next_cursor=next_cursor)
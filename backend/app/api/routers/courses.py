@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, or_
 from typing import List
 
 from ...api.deps import get_db, get_tenant_school_id
+from ...api.pagination import DEFAULT_LIMIT, MAX_LIMIT, Page, keyset_page, project_columns
 from ...models.academics import Course, CourseTeacher
 from ...models.school import Staff
 
 router = APIRouter()
 
+COURSE_FIELDS = ("id", "code", "name", "description", "credit_hours", "status")
+
 
 @router.post("")
 async def create_course(
@@ -30,15 +33,31 @@ async def create_course(
     return course
 
 
-@router.get("")
+@router.get("", response_model=Page)
 async def list_courses(
+    limit: int = Query(default=DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: int | None = Query(default=None),
+    status_filter: str = Query(default="active", alias="status"),
+    staff_id: int | None = Query(default=None),
+    q: str | None = Query(default=None, description="Course code or name prefix"),
+    fields: str | None = Query(default=None, description="Comma-separated columns to return"),
     db: AsyncSession = Depends(get_db),
     school_id: int = Depends(get_tenant_school_id),
 ):
-    result = await db.execute(
-        select(Course).where(Course.school_id == school_id, Course.status == "active")
-    )
-    return result.scalars().all()
+    where = [Course.school_id == school_id]
+    if status_filter != "all":
+        where.append(Course.status == status_filter)
+    if q:
+        where.append(or_(Course.code.istartswith(q, autoescape=True),
+                         Course.name.istartswith(q, autoescape=True)))
+    if staff_id is not None:
+        where.append(Course.id.in_(
+            select(CourseTeacher.course_id).where(
+                CourseTeacher.school_id == school_id, CourseTeacher.staff_id == staff_id
+            )
+        ))
+    columns = project_columns(Course, fields, COURSE_FIELDS)
+    return await keyset_page(db, Course, columns, where, limit, cursor)
 
 
 @router.post("/{course_id}/assign-teacher")
@@ -1,4 +1,22 @@
-from fastapi import APIRouter
+from datetime import date
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...api.deps import get_current_user_id, get_tenant_db, get_tenant_school_id, require
+from ...api.jobs import job_status, start_job
+from ...core.rbac import Permission
+from ...schemas.finance import (
+    CollectionsReport, GenerateInvoicesIn, OutstandingReport, OverdueReport,
+    PaymentIn, PaymentOut, ReconciliationReport,
+)
+from ...schemas.jobs import JobOut
+from ...services.finance_rollups import (
+    collections_by_day, current_academic_year_id, outstanding_by_class,
+    overdue_by_class, week_start,
+)
+from ...services.payments import post_payment, reconcile_upload
+from ...tasks.finance import generate_invoices
 
 router = APIRouter()
 
@@ -18,10 +36,159 @@ async def list_invoices():
 async def create_invoice(data: dict):
     return {"message": "Create invoice endpoint - to be implemented"}
 
+@router.post("/invoices/generate", response_model=JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def start_invoice_generation(
+    data: GenerateInvoicesIn,
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_FEES)),
+):
+    """Queue invoicing of every enrolled student (or one class) for a term.
+
+    Safe to re-run: students already invoiced for their fee structure and
+    the term are skipped.
+    """
+    return start_job(generate_invoices, school_id, user_id, data.model_dump(mode="json"))
+
+@router.get("/invoices/generate/{task_id}", response_model=JobOut)
+async def invoice_generation_status(
+    task_id: str,
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.MANAGE_FEES)),
+):
+    return job_status(task_id, school_id)
+
 @router.get("/payments")
 async def list_payments():
     return {"message": "Payments endpoints - to be implemented"}
 
-@router.post("/payments")
-async def create_payment(data: dict):
-    return {"message": "Create payment endpoint - to be implemented"} 
\ No newline at end of file
+@router.post("/payments", response_model=PaymentOut, status_code=status.HTTP_201_CREATED)
+async def create_payment(
+    data: PaymentIn,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_FEES)),
+):
+    """Post a payment against an invoice and its payment plan installments."""
+    try:
+        payment = await post_payment(
+            db,
+            school_id,
+            data.invoice_id,
+            data.amount,
+            user_id,
+            payment_method=data.payment_method,
+            payment_date=data.payment_date,
+            transaction_id=data.transaction_id,
+            reference_number=data.reference_number,
+            notes=data.notes,
+        )
+    except LookupError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+    except ValueError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    await db.commit()
+    return payment
+
+@router.post("/payments/reconcile", response_model=ReconciliationReport)
+async def reconcile_payments(
+    file: UploadFile = File(...),
+    payment_method: str = Query(default="bank_transfer"),
+    dry_run: bool = Query(default=False),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_FEES)),
+):
+    """Match a bank/mobile-money statement (CSV/XLSX) to invoices and post the matches.
+
+    Columns: reference (or description), amount, date, transaction_id. Lines
+    are matched by invoice number; already-posted transaction ids are
+    reported as duplicates.
+    """
+    try:
+        return await reconcile_upload(
+            db, school_id, user_id, file.file, file.filename,
+            payment_method=payment_method, dry_run=dry_run,
+        )
+    except (ValueError, UnicodeDecodeError) as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    finally:
+        await file.close()
+
+
+async def _academic_year(db: AsyncSession, school_id: int, academic_year_id: int | None) -> int:
+    if academic_year_id is not None:
+        return academic_year_id
+    academic_year_id = await current_academic_year_id(db, school_id)
+    if academic_year_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No current academic year")
+    return academic_year_id
+
+@router.get("/reports/outstanding", response_model=OutstandingReport)
+async def outstanding_report(
+    academic_year_id: int | None = Query(default=None),
+    term_id: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_FEES)),
+):
+    """Invoiced, collected and outstanding amounts per class (current academic year by default)."""
+    academic_year_id = await _academic_year(db, school_id, academic_year_id)
+    classes = await outstanding_by_class(db, school_id, academic_year_id, term_id)
+    return OutstandingReport(
+        academic_year_id=academic_year_id,
+        term_id=term_id,
+        total_outstanding=sum((c["outstanding_amount"] for c in classes), 0),
+        classes=classes,
+    )
+
+@router.get("/reports/collections", response_model=CollectionsReport)
+async def collections_report(
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    class_id: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_FEES)),
+):
+    """Payments collected per day; defaults to this week so far."""
+    end = end or date.today()
+    start = start or week_start(end)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+    days = await collections_by_day(db, school_id, start, end, class_id)
+    return CollectionsReport(
+        start=start,
+        end=end,
+        total_amount=sum((d["amount"] for d in days), 0),
+        payment_count=sum(d["payments"] for d in days),
+        days=days,
+    )
+
+@router.get("/reports/overdue", response_model=OverdueReport)
+async def overdue_report(
+    academic_year_id: int | None = Query(default=None),
+    term_id: int | None = Query(default=None),
+    as_of: date | None = Query(default=None),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_FEES)),
+):
+    """Balance and number of invoices past their due date, per class."""
+    academic_year_id = await _academic_year(db, school_id, academic_year_id)
+    as_of = as_of or date.today()
+    classes = await overdue_by_class(db, school_id, academic_year_id, term_id, as_of)
+    return OverdueReport(
+        academic_year_id=academic_year_id,
+        term_id=term_id,
+        as_of=as_of,
+        total_amount=sum((c["overdue_amount"] for c in classes), 0),
+        total_count=sum(c["overdue_count"] for c in classes),
+        classes=classes,
+    )
+
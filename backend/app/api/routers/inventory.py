@@ -1,4 +1,18 @@
-from fastapi import APIRouter
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...api.deps import get_current_user_id, get_tenant_db, get_tenant_school_id, require
+from ...core.rbac import Permission
+from ...schemas.inventory import (
+    DeliveryNoteIn, PostMovementsIn, PostMovementsOut, StockAlertOut,
+    StockCountIn, StockCountOut, StockSnapshotOut,
+)
+from ...services.stock_alerts import list_alerts
+from ...services.stock_counts import approve_stock_count, create_stock_count, create_stock_count_upload
+from ...services.stock_ledger import post_delivery, post_movements
+from ...services.stock_snapshots import list_snapshots
 
 router = APIRouter()
 
@@ -22,6 +36,115 @@ async def create_item(data: dict):
 async def list_stock_movements():
     return {"message": "Stock movements endpoints - to be implemented"}
 
-@router.post("/stock-movements")
-async def create_stock_movement(data: dict):
-    return {"message": "Create stock movement endpoint - to be implemented"} 
\ No newline at end of file
+
+async def _post(db: AsyncSession, posting):
+    try:
+        result = await posting
+    except LookupError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+    except ValueError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    await db.commit()
+    return result
+
+@router.post("/stock-movements", response_model=PostMovementsOut, status_code=status.HTTP_201_CREATED)
+async def create_stock_movements(
+    data: PostMovementsIn,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_INVENTORY)),
+):
+    """Post a batch of in/out/transfer/adjustment movements; all or nothing.
+
+    Rejected with 409 if any item would go below its available stock.
+    """
+    return await _post(db, post_movements(
+        db, school_id, data.movements, user_id, movement_date=data.movement_date
+    ))
+
+@router.post("/deliveries", response_model=PostMovementsOut, status_code=status.HTTP_201_CREATED)
+async def receive_delivery(
+    data: DeliveryNoteIn,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_INVENTORY)),
+):
+    """Receive a whole delivery note (lines by item id, SKU or barcode) into one inventory."""
+    return await _post(db, post_delivery(db, school_id, data, user_id))
+
+@router.get("/alerts", response_model=list[StockAlertOut])
+async def stock_alerts(
+    inventory_id: int | None = Query(default=None),
+    kind: str | None = Query(default=None, pattern="^(low|over)$"),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_INVENTORY)),
+):
+    """Items at or below their reorder level (low) or above their max level (over)."""
+    return await list_alerts(db, school_id, inventory_id, kind)
+
+@router.get("/valuation", response_model=list[StockSnapshotOut])
+async def stock_valuation(
+    start: date | None = Query(default=None),
+    end: date | None = Query(default=None),
+    inventory_id: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_INVENTORY)),
+):
+    """Daily closing valuation and movement totals per inventory; defaults to the last 30 days."""
+    end = end or date.today()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+    return await list_snapshots(db, school_id, start, end, inventory_id)
+
+@router.post("/stock-counts", response_model=StockCountOut, status_code=status.HTTP_201_CREATED)
+async def create_count(
+    data: StockCountIn,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_INVENTORY)),
+):
+    """Record a count sheet as a draft stock adjustment (lines matched by SKU or barcode)."""
+    return await _post(db, create_stock_count(db, school_id, data, user_id))
+
+@router.post("/stock-counts/upload", response_model=StockCountOut, status_code=status.HTTP_201_CREATED)
+async def upload_count(
+    inventory_id: int = Query(...),
+    full_count: bool = Query(default=False),
+    description: str | None = Query(default=None),
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_INVENTORY)),
+):
+    """Same as `POST /stock-counts` from a CSV/XLSX sheet with sku (or barcode) and quantity columns."""
+    try:
+        return await _post(db, create_stock_count_upload(
+            db, school_id, inventory_id, file.file, file.filename, user_id,
+            full_count=full_count, description=description,
+        ))
+    except UnicodeDecodeError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    finally:
+        await file.close()
+
+@router.post("/stock-counts/{adjustment_id}/approve", response_model=PostMovementsOut)
+async def approve_count(
+    adjustment_id: int,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_INVENTORY)),
+):
+    """Post a draft count's differences as adjustment movements, all in one transaction."""
+    return await _post(db, approve_stock_count(db, school_id, adjustment_id, user_id))
+
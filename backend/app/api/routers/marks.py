@@ -1,4 +1,16 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from ...api.deps import get_current_user_id, get_tenant_db, get_tenant_school_id, require
+from ...core.rbac import Permission
+from ...models.marks import MarkReport
+from ...schemas.marks import (
+    ComputeReportsIn, ComputeReportsOut, MarkReportOut, RecomputeScope, RecomputeStatus,
+)
+from ...services.mark_recompute import pending_recomputes
+from ...services.mark_reports import compute_reports
 
 router = APIRouter()
 
@@ -18,6 +30,61 @@ async def list_exams():
 async def create_exam_mark(data: dict):
     return {"message": "Create exam mark endpoint - to be implemented"}
 
-@router.get("/reports")
-async def list_reports():
-    return {"message": "Mark reports endpoints - to be implemented"} 
\ No newline at end of file
+@router.get("/reports", response_model=List[MarkReportOut])
+async def list_reports(
+    class_id: int = Query(...),
+    term_id: int = Query(...),
+    course_id: int | None = Query(default=None),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_MARKS, scope="class")),
+):
+    stmt = select(MarkReport).where(
+        MarkReport.school_id == school_id,
+        MarkReport.class_id == class_id,
+        MarkReport.term_id == term_id,
+    )
+    if course_id is not None:
+        stmt = stmt.where(MarkReport.course_id == course_id)
+    result = await db.execute(stmt.order_by(MarkReport.course_id, MarkReport.position, MarkReport.student_id))
+    return result.scalars().all()
+
+
+@router.post("/reports/compute", response_model=ComputeReportsOut)
+async def compute_mark_reports(
+    data: ComputeReportsIn,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_MARKS)),
+):
+    """Recompute totals, grades and positions for a whole class and term."""
+    try:
+        count = await compute_reports(
+            db,
+            school_id,
+            data.class_id,
+            data.term_id,
+            grading_scale_id=data.grading_scale_id,
+            computed_by=user_id,
+            course_ids=data.course_ids,
+        )
+    except ValueError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+    await db.commit()
+    return ComputeReportsOut(class_id=data.class_id, term_id=data.term_id, reports=count) 
+
+
+@router.get("/reports/recompute/status", response_model=RecomputeStatus)
+async def recompute_status(
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_MARKS)),
+):
+    """Report keys queued by mark edits that have not been recomputed yet."""
+    scopes = [
+        RecomputeScope.model_validate(row, from_attributes=True)
+        for row in await pending_recomputes(db, school_id)
+    ]
+    return RecomputeStatus(pending=sum(s.pending for s in scopes), scopes=scopes)
@@ -1,4 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...api.deps import get_current_user_id, get_tenant_db, get_tenant_school_id, require
+from ...core.rbac import Permission
+from ...schemas.messages import FanOutOut, MessageIn, MessageOut
+from ...services.message_fanout import create_message, fan_out
 
 router = APIRouter()
 
@@ -6,6 +12,43 @@ router = APIRouter()
 async def list_messages():
     return {"message": "Messages endpoints - to be implemented"}
 
+async def _commit(db: AsyncSession, work):
+    try:
+        result = await work
+    except LookupError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+    except ValueError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    await db.commit()
+    return result
+
+@router.post("", response_model=MessageOut, status_code=status.HTTP_201_CREATED)
+async def create(
+    data: MessageIn,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.SEND_MESSAGES)),
+):
+    """Schedule a message for its targets (classes, roles, all parents, ...) and fan it out.
+
+    Recipients are resolved and stored in the database with one
+    `INSERT ... SELECT`, one row per distinct phone/email.
+    """
+    return await _commit(db, create_message(db, school_id, user_id, data))
+
+@router.post("/{message_id}/fan-out", response_model=FanOutOut)
+async def refresh_recipients(
+    message_id: int,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.SEND_MESSAGES)),
+):
+    """Add recipients who joined the message's targets since it was fanned out."""
+    return await _commit(db, fan_out(db, school_id, message_id))
+
 @router.post("/email")
 async def send_email(data: dict):
     return {"message": "Send email endpoint - to be implemented"}
@@ -1,14 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, or_
 from typing import List
 
-from ...api.deps import get_db, get_tenant_school_id
+from ...api.deps import get_db, get_tenant_db, get_tenant_school_id, require
+from ...api.pagination import DEFAULT_LIMIT, MAX_LIMIT, Page, keyset_page, project_columns
+from ...models.academics import ClassTeacher, Enrollment
 from ...models.school import Staff, Student, Parent, ParentStudent
 from ...core.rbac import Permission, require_permission, UserRole
+from ...schemas.people import StudentImportReport
+from ...services.student_import import import_students as run_student_import
 
 router = APIRouter()
 
+STAFF_FIELDS = (
+    "id", "first_name", "last_name", "other_names", "gender", "email", "phone",
+    "employment_no", "position", "department", "status",
+)
+STUDENT_FIELDS = (
+    "id", "first_name", "last_name", "gender", "dob", "admission_no", "admission_date", "status",
+)
+PARENT_FIELDS = ("id", "first_name", "last_name", "phone", "email", "occupation")
+
+
+def _name_prefix(model, q: str | None) -> list:
+    if not q:
+        return []
+    return [or_(model.first_name.istartswith(q, autoescape=True),
+                model.last_name.istartswith(q, autoescape=True))]
+
+
+def _enrolled_in(school_id: int, class_id: int):
+    return select(Enrollment.student_id).where(
+        Enrollment.school_id == school_id,
+        Enrollment.class_id == class_id,
+        Enrollment.status == "active",
+    )
+
 # Staff endpoints
 @router.post("/staff")
 async def create_staff(
@@ -31,15 +59,30 @@ async def create_staff(
     return staff
 
 
-@router.get("/staff")
+@router.get("/staff", response_model=Page)
 async def list_staff(
+    limit: int = Query(default=DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: int | None = Query(default=None),
+    status_filter: str = Query(default="active", alias="status"),
+    class_id: int | None = Query(default=None),
+    q: str | None = Query(default=None, description="First or last name prefix"),
+    fields: str | None = Query(default=None, description="Comma-separated columns to return"),
     db: AsyncSession = Depends(get_db),
     school_id: int = Depends(get_tenant_school_id),
 ):
-    result = await db.execute(
-        select(Staff).where(Staff.school_id == school_id, Staff.status == "active")
-    )
-    return result.scalars().all()
+    where = [Staff.school_id == school_id, *_name_prefix(Staff, q)]
+    if status_filter != "all":
+        where.append(Staff.status == status_filter)
+    if class_id is not None:
+        where.append(Staff.id.in_(
+            select(ClassTeacher.staff_id).where(
+                ClassTeacher.school_id == school_id,
+                ClassTeacher.class_id == class_id,
+                ClassTeacher.ended_at.is_(None),
+            )
+        ))
+    columns = project_columns(Staff, fields, STAFF_FIELDS)
+    return await keyset_page(db, Staff, columns, where, limit, cursor)
 
 
 # Student endpoints
@@ -62,15 +105,50 @@ async def create_student(
     return student
 
 
-@router.get("/students")
+@router.post("/students/import", response_model=StudentImportReport)
+async def import_students(
+    file: UploadFile = File(...),
+    dry_run: bool = Query(default=False),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.MANAGE_STUDENTS)),
+):
+    """Bulk-import students (with parent links and current-year enrollments) from CSV/XLSX.
+
+    Columns: first_name, last_name, admission_no, gender, dob, admission_date,
+    class, parent_first_name, parent_last_name, parent_phone, parent_email,
+    parent_relationship, parent_occupation. Nothing is written unless every
+    row is valid and `dry_run` is false.
+    """
+    try:
+        return await run_student_import(
+            db, school_id, file.file, file.filename, dry_run=dry_run
+        )
+    except (ValueError, UnicodeDecodeError) as exc:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    finally:
+        await file.close()
+
+
+@router.get("/students", response_model=Page)
 async def list_students(
+    limit: int = Query(default=DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: int | None = Query(default=None),
+    status_filter: str = Query(default="active", alias="status"),
+    class_id: int | None = Query(default=None),
+    q: str | None = Query(default=None, description="First or last name prefix"),
+    fields: str | None = Query(default=None, description="Comma-separated columns to return"),
     db: AsyncSession = Depends(get_db),
     school_id: int = Depends(get_tenant_school_id),
 ):
-    result = await db.execute(
-        select(Student).where(Student.school_id == school_id, Student.status == "active")
-    )
-    return result.scalars().all()
+    where = [Student.school_id == school_id, *_name_prefix(Student, q)]
+    if status_filter != "all":
+        where.append(Student.status == status_filter)
+    if class_id is not None:
+        where.append(Student.id.in_(_enrolled_in(school_id, class_id)))
+    columns = project_columns(Student, fields, STUDENT_FIELDS)
+    return await keyset_page(db, Student, columns, where, limit, cursor)
 
 
 # Parent endpoints
@@ -94,6 +172,28 @@ async def create_parent(
     return parent
 
 
+@router.get("/parents", response_model=Page)
+async def list_parents(
+    limit: int = Query(default=DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+    cursor: int | None = Query(default=None),
+    class_id: int | None = Query(default=None),
+    q: str | None = Query(default=None, description="First or last name prefix"),
+    fields: str | None = Query(default=None, description="Comma-separated columns to return"),
+    db: AsyncSession = Depends(get_db),
+    school_id: int = Depends(get_tenant_school_id),
+):
+    where = [Parent.school_id == school_id, *_name_prefix(Parent, q)]
+    if class_id is not None:
+        where.append(Parent.id.in_(
+            select(ParentStudent.parent_id).where(
+                ParentStudent.school_id == school_id,
+                ParentStudent.student_id.in_(_enrolled_in(school_id, class_id)),
+            )
+        ))
+    columns = project_columns(Parent, fields, PARENT_FIELDS)
+    return await keyset_page(db, Parent, columns, where, limit, cursor)
+
+
 @router.post("/parents/{parent_id}/assign-student")
 async def assign_student_to_parent(
     parent_id: int,
@@ -1,4 +1,23 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...api.deps import get_current_user_id, get_tenant_db, get_tenant_school_id, require
+from ...api.jobs import job_status, start_job
+from ...core.rbac import Permission
+from ...db.session import TenantSessionLocal
+from ...db.tenant import tenant_scope
+from ...schemas.jobs import JobOut
+from ...schemas.timetable import (
+    Clash, EntryValidation, GenerateTimetableIn,
+    ValidateTimetableIn, ValidateTimetableOut,
+)
+from ...services.timetable_export import (
+    FORMATS, cached_fingerprint, etag_for, feed_token, load_schedule,
+    parse_feed_token, remember_fingerprint, rendered_path,
+)
+from ...services.timetable_index import get_occupancy
+from ...tasks.timetable import generate_timetable
 
 router = APIRouter()
 
@@ -8,4 +27,156 @@ async def list_timetables():
 
 @router.post("")
 async def create_timetable(data: dict):
-    return {"message": "Create timetable endpoint - to be implemented"} 
\ No newline at end of file
+    return {"message": "Create timetable endpoint - to be implemented"}
+
+
+@router.post("/generate", response_model=JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def start_generation(
+    data: GenerateTimetableIn,
+    school_id: int = Depends(get_tenant_school_id),
+    user_id: int = Depends(get_current_user_id),
+    _=Depends(require(Permission.MANAGE_TIMETABLE)),
+):
+    """Queue generation of draft timetables for every class in `requirements`.
+
+    Poll `GET /timetable/generate/{task_id}` for progress and the result,
+    which lists the new timetable ids and any lessons that could not be placed.
+    """
+    return start_job(generate_timetable, school_id, user_id, data.model_dump())
+
+
+@router.get("/generate/{task_id}", response_model=JobOut)
+async def generation_status(
+    task_id: str,
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.MANAGE_TIMETABLE)),
+):
+    return job_status(task_id, school_id)
+
+
+@router.post("/validate", response_model=ValidateTimetableOut)
+async def validate_entries(
+    data: ValidateTimetableIn,
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_TIMETABLE)),
+):
+    """Check proposed entries for class, teacher and room clashes.
+
+    Entries are checked against the term's active timetables and against
+    each other; entries being moved (`entry_id`) free their current slot.
+    """
+    index = await get_occupancy(db, school_id, data.term_id)
+    moved = {e.entry_id for e in data.entries if e.entry_id is not None}
+    # (kind, resource id, period id) -> positions of earlier proposed entries
+    proposed: dict[tuple[str, int, int], list[int]] = {}
+
+    results = []
+    for position, entry in enumerate(data.entries):
+        if entry.period_id not in index.overlaps:
+            results.append(EntryValidation(index=position, ok=False, error="Unknown or inactive period"))
+            continue
+        clashes = [
+            Clash(kind=kind, entry_id=entry_id)
+            for kind, entry_id in index.clashes(
+                entry.period_id, entry.class_id, entry.staff_id, entry.room_id, ignore=moved
+            )
+        ]
+        resources = [("class", entry.class_id), ("staff", entry.staff_id)]
+        if entry.room_id is not None:
+            resources.append(("room", entry.room_id))
+        for period_id in index.overlaps[entry.period_id]:
+            for kind, resource_id in resources:
+                for other in proposed.get((kind, resource_id, period_id), ()):
+                    clashes.append(Clash(kind=kind, proposed_index=other))
+        for kind, resource_id in resources:
+            proposed.setdefault((kind, resource_id, entry.period_id), []).append(position)
+        results.append(EntryValidation(index=position, ok=not clashes, clashes=clashes))
+
+    return ValidateTimetableOut(ok=all(r.ok for r in results), results=results)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+async def _export_response(
+    request: Request,
+    db: AsyncSession,
+    school_id: int,
+    term_id: int,
+    kind: str,
+    resource_id: int,
+    fmt: str,
+) -> Response:
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown export format")
+    if_none_match = request.headers.get("if-none-match")
+
+    # Unchanged since the last poll: answer from the cached hash, no query
+    fingerprint = cached_fingerprint(school_id, term_id, kind, resource_id)
+    if fingerprint and _etag_matches(if_none_match, etag_for(fingerprint, fmt)):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag_for(fingerprint, fmt)})
+
+    try:
+        schedule = await load_schedule(db, school_id, term_id, kind, resource_id)
+    except LookupError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+    remember_fingerprint(schedule, school_id, term_id, resource_id)
+
+    headers = {"ETag": etag_for(schedule.fingerprint, fmt), "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    try:
+        path = await rendered_path(schedule, fmt)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    return FileResponse(
+        path,
+        media_type=FORMATS[fmt],
+        headers=headers,
+        filename=f"timetable-{kind}-{resource_id}.{fmt}",
+        content_disposition_type="inline",
+    )
+
+
+@router.get("/export/{kind}/{resource_id}.{fmt}")
+async def export_timetable(
+    kind: str,
+    resource_id: int,
+    fmt: str,
+    request: Request,
+    term_id: int = Query(...),
+    db: AsyncSession = Depends(get_tenant_db),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_TIMETABLE)),
+):
+    """ICS or PDF of the active timetable of a class, teacher or room (`kind`)."""
+    return await _export_response(request, db, school_id, term_id, kind, resource_id, fmt)
+
+
+@router.get("/export/{kind}/{resource_id}/feed")
+async def export_feed_url(
+    kind: str,
+    resource_id: int,
+    request: Request,
+    term_id: int = Query(...),
+    school_id: int = Depends(get_tenant_school_id),
+    _=Depends(require(Permission.VIEW_TIMETABLE)),
+):
+    """Signed ICS URL that calendar apps can subscribe to without auth headers."""
+    token = feed_token(school_id, term_id, kind, resource_id)
+    return {"url": str(request.url_for("timetable_feed", token=token))}
+
+
+@router.get("/feeds/{token}.ics", name="timetable_feed")
+async def timetable_feed(token: str, request: Request):
+    claims = parse_feed_token(token)
+    if claims is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found")
+    school_id, term_id, kind, resource_id = claims
+    async with tenant_scope(TenantSessionLocal, school_id) as db:
+        return await _export_response(request, db, school_id, term_id, kind, resource_id, "ics")
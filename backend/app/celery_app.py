@@ -1,9 +1,25 @@
 from celery import Celery
+from celery.schedules import crontab
 import os
 
 broker_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 backend_url = broker_url
 
 celery_app = Celery(
-    "inkingi", broker=broker_url, backend=backend_url, include=["app.tasks.example"]
-) 
\ No newline at end of file
+    "inkingi", broker=broker_url, backend=backend_url, include=["app.tasks.example", "app.tasks.marks", "app.tasks.timetable", "app.tasks.finance", "app.tasks.inventory"]
+)
+
+celery_app.conf.beat_schedule = {
+    "reconcile-finance-rollups": {
+        "task": "app.tasks.finance.reconcile_finance_rollups",
+        "schedule": crontab(hour=int(os.getenv("FINANCE_ROLLUP_HOUR", "2")), minute=0),
+    },
+    "snapshot-inventories": {
+        "task": "app.tasks.inventory.snapshot_inventories",
+        "schedule": crontab(hour=0, minute=15),
+    },
+    "sweep-overdue-fees": {
+        "task": "app.tasks.finance.sweep_overdue_fees",
+        "schedule": crontab(hour=int(os.getenv("OVERDUE_SWEEP_HOUR", "1")), minute=0),
+    },
+}
@@ -4,6 +4,8 @@ from typing import List
 class Settings:
     # Database
     database_url: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./inkingi.db")
+    # "transaction" (works behind pgbouncer transaction pooling) or "checkout"
+    tenant_guc_mode: str = os.getenv("TENANT_GUC_MODE", "transaction")
     
     # Redis
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -12,7 +14,32 @@ class Settings:
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     refresh_token_expire_minutes: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", "43200"))
+    permission_cache_size: int = int(os.getenv("PERMISSION_CACHE_SIZE", "10000"))
+    # Seconds other worker processes may keep serving a user's old permissions
+    # (e.g. after deactivation); invalidation on commit is per process only
+    permission_cache_ttl: int = int(os.getenv("PERMISSION_CACHE_TTL", "30"))
+    # argon2 parameters; changing them rehashes passwords on the next login
+    argon2_time_cost: int = int(os.getenv("ARGON2_TIME_COST", "3"))
+    argon2_memory_cost: int = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+    argon2_parallelism: int = int(os.getenv("ARGON2_PARALLELISM", "4"))
+    # Hashing thread pool per worker; calls beyond the pending limit get a 503
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    password_hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
     
+    # Seconds to wait after a mark edit before recomputing affected reports
+    mark_recompute_delay: int = int(os.getenv("MARK_RECOMPUTE_DELAY", "10"))
+
+    # Timetable occupancy indexes kept per (school, term); other workers' edits show up after the TTL
+    timetable_index_size: int = int(os.getenv("TIMETABLE_INDEX_SIZE", "256"))
+    timetable_index_ttl: int = int(os.getenv("TIMETABLE_INDEX_TTL", "300"))
+
+    # Rendered timetable exports (ICS/PDF), stored by content hash
+    timetable_export_dir: str = os.getenv("TIMETABLE_EXPORT_DIR", "./exports/timetables")
+    timetable_export_ttl: int = int(os.getenv("TIMETABLE_EXPORT_TTL", "60"))
+
+    # Rows marked overdue per UPDATE (and transaction) by the overdue sweeper
+    overdue_sweep_batch: int = int(os.getenv("OVERDUE_SWEEP_BATCH", "1000"))
+
     # CORS
     cors_allow_origins: List[str] = os.getenv("CORS_ALLOW_ORIGINS", "*").split(",")
     
@@ -0,0 +1,63 @@
+"""Password hashing off the event loop.
+
+argon2 takes tens to hundreds of milliseconds per call; run inline in an
+async route it stalls every other request on the worker for that long.
+`PasswordHasher` runs hashes on a small dedicated thread pool (argon2-cffi
+releases the GIL while hashing, so threads are enough and the event
+loop keeps serving other requests), and admits at most `max_pending` calls
+per worker: beyond that it raises `HashingBusy` at once, which the app turns
+into a 503 with Retry-After, so a burst of logins waits in the clients
+instead of piling up behind the pool.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+class HashingBusy(Exception):
+    """Too many password hashes queued on this worker."""
+
+
+class PasswordHasher:
+    def __init__(self, context: CryptContext, workers: int, max_pending: int):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def _run(self, fn, *args):
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self.pending >= self.max_pending:
+            raise HashingBusy()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(fn, *args)
+        self.pending += 1
+        # Released when the hash itself finishes: a cancelled request (client
+        # disconnect) leaves its hash running on the pool, still holding a slot
+        future.add_done_callback(lambda _: self._release(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._decrement)
+        except RuntimeError:
+            pass  # Loop closed; nothing is waiting on the count any more
+
+    def _decrement(self) -> None:
+        self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """(matches, new hash); the new hash is set when the stored one uses outdated parameters."""
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
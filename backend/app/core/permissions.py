@@ -0,0 +1,182 @@
+"""Materialized permission resolution.
+
+A user's role assignments (`user_roles`, per school), the permissions granted
+to those roles (built-in `ROLE_PERMISSIONS` plus `role_permissions` rows) and
+their access-control entries are compiled once into a `CompiledPermissions`
+object: one permission bitmask per school plus an index of the class/course
+ids the user is restricted to. Checks are then a dict lookup, an AND and a
+set membership test, with no queries. An inactive user compiles to no
+permissions at all.
+
+Compiled entries are cached per process and invalidated on commit whenever a
+user, role, permission or ACE changes through the ORM. The invalidation is
+local: other worker processes keep the old entry until it expires, so
+`permission_cache_ttl` (30 seconds by default) bounds how long a
+deactivated user or a revoked role keeps working there. Code that writes
+`user_roles`/`role_permissions` with Core statements must call
+`invalidate_permissions` itself.
+"""
+from typing import Iterable
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from .config import settings
+from .rbac import ALL_PERMISSIONS_MASK, PERMISSION_BITS, ROLE_MASKS, Permission, UserRole
+from ..models.user import AccessControlEntry, Role, User, role_permissions, user_roles
+from ..models.user import Permission as PermissionRecord
+
+# ACE scope types that narrow a permission to specific ids
+RESTRICTING_SCOPES = ("class", "course")
+
+_PERMISSIONS_BY_NAME = {p.value: p for p in Permission}
+_ROLES_BY_NAME = {r.value: r for r in UserRole}
+
+
+class CompiledPermissions:
+    __slots__ = ("user_id", "is_system_admin", "masks", "scopes")
+
+    def __init__(
+        self,
+        user_id: int,
+        is_system_admin: bool,
+        masks: dict[int, int],
+        scopes: dict[int, dict[str, frozenset[int]]],
+    ):
+        self.user_id = user_id
+        self.is_system_admin = is_system_admin
+        self.masks = masks
+        self.scopes = scopes
+
+    def allows(
+        self,
+        school_id: int,
+        permission: Permission,
+        scope: tuple[str, int] | None = None,
+    ) -> bool:
+        """Check `permission` in `school_id`, optionally on one class/course.
+
+        A user with no ACE of a given scope type has school-wide access for
+        that type; once any ACE of that type exists, only the listed ids pass.
+        """
+        if self.is_system_admin:
+            return True
+        if not self.masks.get(school_id, 0) & PERMISSION_BITS[permission]:
+            return False
+        if scope is None:
+            return True
+        scope_type, scope_id = scope
+        allowed_ids = self.scopes.get(school_id, {}).get(scope_type)
+        return allowed_ids is None or scope_id in allowed_ids
+
+    def permissions(self, school_id: int) -> list[Permission]:
+        mask = ALL_PERMISSIONS_MASK if self.is_system_admin else self.masks.get(school_id, 0)
+        return [p for p, bit in PERMISSION_BITS.items() if mask & bit]
+
+
+def _role_mask(role_name: str) -> int:
+    role = _ROLES_BY_NAME.get(role_name)
+    return ROLE_MASKS.get(role, 0) if role else 0
+
+
+async def compile_permissions(db: AsyncSession, user_id: int) -> CompiledPermissions:
+    """Build a user's permission bitsets and scope index with two queries."""
+    result = await db.execute(
+        select(user_roles.c.school_id, Role.name, PermissionRecord.name)
+        .join(Role, Role.id == user_roles.c.role_id)
+        .join(User, User.id == user_roles.c.user_id)
+        .outerjoin(role_permissions, role_permissions.c.role_id == Role.id)
+        .outerjoin(PermissionRecord, PermissionRecord.id == role_permissions.c.permission_id)
+        .where(user_roles.c.user_id == user_id, Role.is_active == True, User.is_active == True)
+    )
+    rows = result.all()
+    if not rows:
+        # No active role, or the user is inactive: nothing to look up for ACEs
+        return CompiledPermissions(user_id, False, {}, {})
+    masks: dict[int, int] = {}
+    is_system_admin = False
+    for school_id, role_name, permission_name in rows:
+        if role_name == UserRole.SYSTEM_ADMIN.value:
+            is_system_admin = True
+        mask = masks.get(school_id, 0) | _role_mask(role_name)
+        permission = _PERMISSIONS_BY_NAME.get(permission_name) if permission_name else None
+        if permission is not None:
+            mask |= PERMISSION_BITS[permission]
+        masks[school_id] = mask
+
+    result = await db.execute(
+        select(
+            AccessControlEntry.school_id,
+            AccessControlEntry.scope_type,
+            AccessControlEntry.scope_id,
+        ).where(
+            AccessControlEntry.user_id == user_id,
+            AccessControlEntry.scope_type.in_(RESTRICTING_SCOPES),
+        )
+    )
+    collected: dict[int, dict[str, set[int]]] = {}
+    for school_id, scope_type, scope_id in result:
+        collected.setdefault(school_id, {}).setdefault(scope_type, set()).add(scope_id)
+    scopes = {
+        school_id: {t: frozenset(ids) for t, ids in by_type.items()}
+        for school_id, by_type in collected.items()
+    }
+
+    return CompiledPermissions(user_id, is_system_admin, masks, scopes)
+
+
+_cache = TTLCache(
+    maxsize=settings.permission_cache_size, ttl=settings.permission_cache_ttl
+)
+
+
+async def get_permissions(db: AsyncSession, user_id: int) -> CompiledPermissions:
+    compiled = _cache.get(user_id)
+    if compiled is None:
+        compiled = await compile_permissions(db, user_id)
+        _cache.set(user_id, compiled)
+    return compiled
+
+
+def invalidate_permissions(user_ids: Iterable[int] | None = None) -> None:
+    """Drop compiled permissions for some users, or for everyone if None."""
+    if user_ids is None:
+        _cache.clear()
+        return
+    for user_id in user_ids:
+        _cache.delete(user_id)
+
+
+def permission_cache_stats() -> dict[str, int]:
+    return {"hits": _cache.hits, "misses": _cache.misses, "size": len(_cache)}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_permission_changes(session, flush_context):
+    changed = session.info.setdefault("permissions_dirty", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+        elif isinstance(obj, AccessControlEntry):
+            changed.add(obj.user_id)
+        elif isinstance(obj, (Role, PermissionRecord)):
+            # Role definitions affect every holder: recompile everyone
+            changed.add(None)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_permission_changes(session):
+    changed = session.info.pop("permissions_dirty", None)
+    if not changed:
+        return
+    if None in changed:
+        invalidate_permissions()
+    else:
+        invalidate_permissions(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_permission_changes(session):
+    session.info.pop("permissions_dirty", None)
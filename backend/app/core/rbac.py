@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List, Set
+from typing import Iterable, List, Set
 from fastapi import HTTPException, status
 
 
@@ -105,14 +105,35 @@ ROLE_PERMISSIONS: dict[UserRole, Set[Permission]] = {
 }
 
 
+# Each permission owns one bit so a set of permissions is a single int and a
+# check is one AND instead of a walk over role sets.
+PERMISSION_BITS: dict[Permission, int] = {p: 1 << i for i, p in enumerate(Permission)}
+ALL_PERMISSIONS_MASK = (1 << len(Permission)) - 1
+
+
+def permissions_mask(permissions: Iterable[Permission]) -> int:
+    mask = 0
+    for permission in permissions:
+        mask |= PERMISSION_BITS[permission]
+    return mask
+
+
+ROLE_MASKS: dict[UserRole, int] = {
+    role: permissions_mask(perms) for role, perms in ROLE_PERMISSIONS.items()
+}
+ROLE_MASKS[UserRole.SYSTEM_ADMIN] = ALL_PERMISSIONS_MASK  # System admin has all permissions
+
+
+def roles_mask(user_roles: Iterable[UserRole]) -> int:
+    mask = 0
+    for role in user_roles:
+        mask |= ROLE_MASKS.get(role, 0)
+    return mask
+
+
 def check_permission(user_roles: List[UserRole], required_permission: Permission) -> bool:
     """Check if user has required permission based on their roles"""
-    for role in user_roles:
-        if role == UserRole.SYSTEM_ADMIN:
-            return True  # System admin has all permissions
-        if required_permission in ROLE_PERMISSIONS.get(role, set()):
-            return True
-    return False
+    return bool(roles_mask(user_roles) & PERMISSION_BITS[required_permission])
 
 
 def require_permission(user_roles: List[UserRole], required_permission: Permission) -> None:
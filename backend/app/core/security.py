@@ -4,8 +4,18 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from .config import settings
-
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from .hashing import PasswordHasher
+
+# Hashes made with a lower time or memory cost are upgraded on the next login
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=settings.argon2_time_cost,
+    argon2__min_rounds=settings.argon2_time_cost,
+    argon2__memory_cost=settings.argon2_memory_cost,
+    argon2__parallelism=settings.argon2_parallelism,
+)
+password_hasher = PasswordHasher(pwd_context, settings.password_hash_workers, settings.password_hash_max_pending)
 
 ALGORITHM = "HS256"
 
@@ -29,6 +39,15 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify off the event loop; the new hash is set when the stored one should be upgraded."""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+
 def verify_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
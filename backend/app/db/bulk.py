@@ -0,0 +1,150 @@
+from typing import Any, Sequence
+
+from sqlalchemy import Table, any_, insert, literal, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+
+
+def is_postgres() -> bool:
+    return settings.database_url.startswith("postgresql")
+
+
+async def allocate_ids(session: AsyncSession, table: Table, count: int) -> list[int]:
+    """Reserve `count` primary keys from the table's serial sequence in one round-trip."""
+    if count <= 0:
+        return []
+    result = await session.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+        {"table": table.name, "count": count},
+    )
+    return [row[0] for row in result]
+
+
+def _conflict_clause(skip_conflicts: Sequence[str], conflict_where: str | None) -> str:
+    target = f"({', '.join(skip_conflicts)})"
+    if conflict_where is not None:
+        target += f" WHERE {conflict_where}"
+    return f" ON CONFLICT {target} DO NOTHING RETURNING id"
+
+
+async def copy_rows(
+    session: AsyncSession,
+    table: Table,
+    rows: Sequence[dict[str, Any]],
+    *,
+    skip_conflicts: Sequence[str] = (),
+    conflict_where: str | None = None,
+) -> set[int]:
+    """Stream rows into `table` with PostgreSQL COPY.
+
+    COPY FROM is rejected on tables with row-level security, so rows are
+    copied into a transaction-scoped staging table and moved across with a
+    single INSERT ... SELECT, which goes through the normal RLS checks.
+
+    With `skip_conflicts` (the columns of a unique index, plus its
+    `conflict_where` predicate for a partial index) rows that collide with
+    existing ones are dropped and the ids of the rows actually inserted are
+    returned.
+    """
+    if not rows:
+        return set()
+    columns = list(rows[0].keys())
+    column_list = ", ".join(columns)
+    staging = f"_stage_{table.name}"
+
+    await session.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+        f"(LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DROP"
+    ))
+    connection = await session.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        staging,
+        records=[tuple(row[c] for c in columns) for row in rows],
+        columns=columns,
+    )
+    statement = f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM {staging}"
+    if skip_conflicts:
+        statement += _conflict_clause(skip_conflicts, conflict_where)
+    result = await session.execute(text(statement))
+    inserted = set(result.scalars()) if skip_conflicts else set()
+    await session.execute(text(f"TRUNCATE {staging}"))
+    return inserted
+
+
+async def bulk_insert(
+    session: AsyncSession,
+    table: Table,
+    rows: Sequence[dict[str, Any]],
+    *,
+    with_ids: bool = False,
+    skip_conflicts: Sequence[str] = (),
+    conflict_where: str | None = None,
+) -> list[int | None]:
+    """Insert many rows in a handful of statements.
+
+    Uses COPY on PostgreSQL and a single executemany elsewhere (SQLite).
+    When `with_ids` is set the new primary keys are returned in the same
+    order as `rows`.
+
+    `skip_conflicts` names the columns of a unique index (`conflict_where`
+    is its predicate when the index is partial); rows that would violate it
+    are skipped instead of failing the statement, and their position in the
+    returned ids is None. Requires `with_ids`.
+    """
+    if not rows:
+        return []
+    if skip_conflicts and not with_ids:
+        raise ValueError("skip_conflicts requires with_ids")
+
+    if is_postgres():
+        ids: list[int | None] = []
+        if with_ids:
+            ids = await allocate_ids(session, table, len(rows))
+            rows = [{**row, "id": id_} for row, id_ in zip(rows, ids)]
+        inserted = await copy_rows(
+            session, table, rows, skip_conflicts=skip_conflicts, conflict_where=conflict_where
+        )
+        if skip_conflicts:
+            ids = [id_ if id_ in inserted else None for id_ in ids]
+        return ids
+
+    if skip_conflicts:
+        # Row by row, so a skipped row can be told apart from an inserted one
+        statement = upsert_insert(table).on_conflict_do_nothing(
+            index_elements=list(skip_conflicts),
+            index_where=text(conflict_where) if conflict_where is not None else None,
+        ).returning(table.c.id)
+        return [(await session.execute(statement, row)).scalar_one_or_none() for row in rows]
+
+    if with_ids:
+        result = await session.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            list(rows),
+        )
+        return list(result.scalars())
+    await session.execute(insert(table), list(rows))
+    return []
+
+
+def upsert_insert(table: Table):
+    """Dialect-specific INSERT supporting `on_conflict_do_update` (PostgreSQL/SQLite)."""
+    if is_postgres():
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table)
+
+
+def id_in(column, ids: Sequence[int]):
+    """`column = ANY(:ids)` on PostgreSQL, an expanding IN elsewhere.
+
+    The array is one bind parameter, so batches of any size share one
+    statement text and plan.
+    """
+    if is_postgres():
+        from sqlalchemy.dialects.postgresql import ARRAY
+        return column == any_(literal(list(ids), ARRAY(column.type)))
+    return column.in_(ids)
+
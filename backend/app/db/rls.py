@@ -1,11 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy import text
 
+TENANT_MATCH = "NULLIF(current_setting('app.tenant_id', true), '')::int = school_id"
+
 
 async def setup_rls(engine: AsyncEngine) -> None:
     """Enable RLS and define tenant policies on multi-tenant tables.
 
-    Assumes tables already exist. Policies are idempotent via IF NOT EXISTS.
+    Assumes tables already exist. Policies are dropped and recreated in one
+    transaction, so databases set up with older policy definitions (e.g. a
+    bare `::int` cast, which fails when no tenant is set) are brought up to
+    date.
     """
     tenant_tables = [
         "staff",
@@ -20,44 +25,16 @@ async def setup_rls(engine: AsyncEngine) -> None:
         "academic_years",
         "terms",
     ]
+    policies = {
+        "select": f"FOR SELECT USING ({TENANT_MATCH})",
+        "insert": f"FOR INSERT WITH CHECK ({TENANT_MATCH})",
+        "update": f"FOR UPDATE USING ({TENANT_MATCH}) WITH CHECK ({TENANT_MATCH})",
+    }
 
     async with engine.begin() as conn:
         for table in tenant_tables:
             # Enable RLS
             await conn.execute(text(f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY"))
-            # SELECT policy
-            await conn.execute(text(
-                f"""
-                DO $$ BEGIN
-                  IF NOT EXISTS (
-                    SELECT 1 FROM pg_policies WHERE schemaname = 'public' AND tablename = '{table}' AND policyname = 'rls_{table}_select'
-                  ) THEN
-                    EXECUTE 'CREATE POLICY rls_{table}_select ON {table} FOR SELECT USING (current_setting(''app.tenant_id'', true)::int = school_id)';
-                  END IF;
-                END $$;
-                """
-            ))
-            # INSERT policy
-            await conn.execute(text(
-                f"""
-                DO $$ BEGIN
-                  IF NOT EXISTS (
-                    SELECT 1 FROM pg_policies WHERE schemaname = 'public' AND tablename = '{table}' AND policyname = 'rls_{table}_insert'
-                  ) THEN
-                    EXECUTE 'CREATE POLICY rls_{table}_insert ON {table} FOR INSERT WITH CHECK (current_setting(''app.tenant_id'', true)::int = school_id)';
-                  END IF;
-                END $$;
-                """
-            ))
-            # UPDATE policy
-            await conn.execute(text(
-                f"""
-                DO $$ BEGIN
-                  IF NOT EXISTS (
-                    SELECT 1 FROM pg_policies WHERE schemaname = 'public' AND tablename = '{table}' AND policyname = 'rls_{table}_update'
-                  ) THEN
-                    EXECUTE 'CREATE POLICY rls_{table}_update ON {table} FOR UPDATE USING (current_setting(''app.tenant_id'', true)::int = school_id) WITH CHECK (current_setting(''app.tenant_id'', true)::int = school_id)';
-                  END IF;
-                END $$;
-                """
-            ))
+            for action, clause in policies.items():
+                await conn.execute(text(f"DROP POLICY IF EXISTS rls_{table}_{action} ON {table}"))
+                await conn.execute(text(f"CREATE POLICY rls_{table}_{action} ON {table} {clause}"))
@@ -1,9 +1,14 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from ..core.config import settings
+from .tenant import make_tenant_sessionmaker, tenant_connect_args
 
 class Base(DeclarativeBase):
     pass
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
-SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=AsyncSession) 
\ No newline at end of file
+engine = create_async_engine(
+    settings.database_url, echo=False, future=True, connect_args=tenant_connect_args(settings.database_url)
+)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=AsyncSession) 
+# Sessions for tenant-scoped requests: app.tenant_id is set for RLS (see db/tenant.py)
+TenantSessionLocal = make_tenant_sessionmaker(engine)
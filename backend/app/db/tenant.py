@@ -0,0 +1,176 @@
+"""Tenant context for PostgreSQL row-level security.
+
+RLS policies compare `school_id` with the `app.tenant_id` GUC. Two ways of
+setting it are supported, chosen with `TENANT_GUC_MODE`:
+
+- ``transaction`` (default, safe behind pgbouncer transaction pooling): the
+  GUC is set with ``set_config(..., true)`` at the start of every
+  transaction the tenant session opens, so it survives commits inside a
+  request and is discarded with the transaction. On asyncpg engines created
+  with `tenant_connect_args` it is sent in the same message as the BEGIN,
+  so it costs no round-trip of its own; elsewhere it is a separate statement.
+- ``checkout`` (direct connections only): the GUC is set at session level
+  when a connection is checked out from the pool, and only if that
+  connection last served a different tenant. Requests for the same tenant
+  on a warm connection pay no extra round-trip.
+
+Both fail closed: if the GUC cannot be set the error propagates and the
+request fails instead of running without tenant isolation.
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator
+
+import asyncpg
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+
+TENANT_GUC = "app.tenant_id"
+
+current_tenant_id: ContextVar[int | None] = ContextVar("current_tenant_id", default=None)
+
+
+def _guc_value(tenant_id: int | None) -> str:
+    # Validated as int so it can be inlined safely; '' means "no tenant"
+    return "" if tenant_id is None else str(int(tenant_id))
+
+
+def set_tenant_sql(tenant_id: int | None, local: bool) -> str:
+    scope = "true" if local else "false"
+    return f"SELECT set_config('{TENANT_GUC}', '{_guc_value(tenant_id)}', {scope})"
+
+
+class TenantConnection(asyncpg.Connection):
+    """asyncpg connection that sends a pending tenant GUC along with the next BEGIN.
+
+    SQLAlchemy's asyncpg adapter begins transactions lazily, right before
+    their first statement, with a plain-text BEGIN; appending the
+    set_config to it puts both in one round-trip.
+    """
+
+    __slots__ = ("tenant_sql",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tenant_sql: str | None = None
+
+    async def _send_tenant(self) -> None:
+        tenant_sql, self.tenant_sql = self.tenant_sql, None
+        if tenant_sql is not None:
+            await super().execute(tenant_sql)
+
+    async def execute(self, query: str, *args, timeout: float | None = None) -> str:
+        if self.tenant_sql is not None and not args and query.lstrip().upper().startswith("BEGIN"):
+            tenant_sql, self.tenant_sql = self.tenant_sql, None
+            try:
+                return await super().execute(f"{query.rstrip().rstrip(';')}; {tenant_sql};", timeout=timeout)
+            except Exception:
+                # The BEGIN may have gone through; don't hand back an open transaction
+                if not self.is_closed():
+                    try:
+                        await super().execute("ROLLBACK")
+                    except Exception:
+                        pass
+                raise
+        await self._send_tenant()
+        return await super().execute(query, *args, timeout=timeout)
+
+    async def prepare(self, *args, **kwargs):
+        await self._send_tenant()
+        return await super().prepare(*args, **kwargs)
+
+    async def executemany(self, *args, **kwargs):
+        await self._send_tenant()
+        return await super().executemany(*args, **kwargs)
+
+
+def tenant_connect_args(database_url: str) -> dict[str, Any]:
+    """`connect_args` for engines whose tenant sessions should piggyback the GUC on BEGIN."""
+    if database_url.startswith("postgresql+asyncpg"):
+        return {"connection_class": TenantConnection}
+    return {}
+
+
+class TenantSession(Session):
+    """Sync session class behind `TenantSessionLocal`; carries `info["tenant_id"]`."""
+
+
+@event.listens_for(TenantSession, "after_begin")
+def _set_tenant_for_transaction(session, transaction, connection):
+    if connection.dialect.name != "postgresql" or settings.tenant_guc_mode != "transaction":
+        return
+    tenant_id = session.info.get("tenant_id")
+    if tenant_id is None:
+        raise RuntimeError("Tenant session used without a tenant id")
+    sql = set_tenant_sql(tenant_id, local=True)
+    driver_connection = connection.connection.driver_connection
+    if isinstance(driver_connection, TenantConnection):
+        # Sent with the BEGIN the adapter issues before the first statement
+        driver_connection.tenant_sql = sql
+    else:
+        connection.exec_driver_sql(sql)
+
+
+def install_checkout_tenant_guc(engine: AsyncEngine) -> None:
+    """Set the tenant GUC on pool checkout, skipping it when already current."""
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _set_tenant_on_checkout(dbapi_connection, connection_record, connection_proxy):
+        tenant_id = current_tenant_id.get()
+        value = _guc_value(tenant_id)
+        if connection_record.info.get(TENANT_GUC) == value:
+            return
+        connection_record.info.pop(TENANT_GUC, None)
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(set_tenant_sql(tenant_id, local=False))
+        finally:
+            cursor.close()
+        # Commit so a later rollback of the request's transaction cannot
+        # revert the setting behind the cached value
+        dbapi_connection.commit()
+        connection_record.info[TENANT_GUC] = value
+
+
+def install_checkin_tenant_reset(engine: AsyncEngine) -> None:
+    """Drop a GUC still pending when its transaction ran no statement."""
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _reset_pending_tenant(dbapi_connection, connection_record):
+        driver_connection = getattr(dbapi_connection, "driver_connection", None)
+        if isinstance(driver_connection, TenantConnection):
+            driver_connection.tenant_sql = None
+
+
+def make_tenant_sessionmaker(engine: AsyncEngine) -> async_sessionmaker:
+    mode = settings.tenant_guc_mode
+    if mode not in ("transaction", "checkout"):
+        raise ValueError(f"Unknown TENANT_GUC_MODE '{mode}'")
+    if mode == "checkout" and engine.dialect.name == "postgresql":
+        install_checkout_tenant_guc(engine)
+    elif engine.dialect.name == "postgresql":
+        install_checkin_tenant_reset(engine)
+    return async_sessionmaker(
+        bind=engine,
+        autoflush=False,
+        expire_on_commit=False,
+        class_=AsyncSession,
+        sync_session_class=TenantSession,
+    )
+
+
+@asynccontextmanager
+async def tenant_scope(
+    sessionmaker: async_sessionmaker, tenant_id: int
+) -> AsyncIterator[AsyncSession]:
+    """Open a session bound to `tenant_id` for every transaction it runs."""
+    tenant_id = int(tenant_id)
+    token = current_tenant_id.set(tenant_id)
+    try:
+        async with sessionmaker(info={"tenant_id": tenant_id}) as session:
+            yield session
+    finally:
+        current_tenant_id.reset(token)
@@ -1,8 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 from .core.config import settings
+from .core.hashing import HashingBusy
+from .core.security import password_hasher
 from .db.session import Base, engine
 from .db.rls import setup_rls
 
@@ -51,6 +54,21 @@ app.include_router(inventory_router, prefix="/inventory", tags=["inventory"])
 app.include_router(messages_router, prefix="/messages", tags=["messages"])
 
 
+@app.exception_handler(HashingBusy)
+async def hashing_busy(request: Request, exc: HashingBusy) -> JSONResponse:
+    # Too many password hashes queued on this worker
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in attempts right now. Please try again shortly."},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.on_event("shutdown")
+async def on_shutdown_stop_hashing() -> None:
+    password_hasher.shutdown()
+
+
 @app.on_event("startup")
 async def on_startup_create_tables() -> None:
     async with engine.begin() as conn:
@@ -4,14 +4,14 @@ from .school import School, Staff, Student, Parent, ParentStudent
 from .user import User, Role, Permission, AccessControlEntry
 from .academics import Class, Course, ClassTeacher, CourseTeacher, Enrollment
 from .timetable import Room, Period, Timetable, TimetableEntry, TeacherAvailability
-from .marks import AssignmentMark, ExamMark, MarkReport, GradingScale, GradingBand
+from .marks import AssignmentMark, ExamMark, MarkReport, MarkRecompute, GradingScale, GradingBand
 from .finance import (
-    FeeStructure, FeeItem, Invoice, InvoiceItem, 
-    Payment, PaymentPlan, PaymentInstallment
+    FeeStructure, FeeItem, Invoice, InvoiceItem, InvoiceSequence,
+    Payment, PaymentPlan, PaymentInstallment, FinanceRollup, OverdueSweep
 )
 from .inventory import (
     Inventory, ItemCategory, Item, InventoryItem, 
-    StockMovement, StockAdjustment, StockAdjustmentItem
+    StockMovement, StockAdjustment, StockAdjustmentItem, StockAlert, StockSnapshot
 )
 from .message import (
     Message, MessageRecipient, MessageTemplate, 
@@ -35,15 +35,15 @@ __all__ = [
     "Room", "Period", "Timetable", "TimetableEntry", "TeacherAvailability",
     
     # Marks
-    "AssignmentMark", "ExamMark", "MarkReport", "GradingScale", "GradingBand",
+    "AssignmentMark", "ExamMark", "MarkReport", "MarkRecompute", "GradingScale", "GradingBand",
     
     # Finance
-    "FeeStructure", "FeeItem", "Invoice", "InvoiceItem", 
-    "Payment", "PaymentPlan", "PaymentInstallment",
+    "FeeStructure", "FeeItem", "Invoice", "InvoiceItem", "InvoiceSequence",
+    "Payment", "PaymentPlan", "PaymentInstallment", "FinanceRollup", "OverdueSweep",
     
     # Inventory
     "Inventory", "ItemCategory", "Item", "InventoryItem", 
-    "StockMovement", "StockAdjustment", "StockAdjustmentItem",
+    "StockMovement", "StockAdjustment", "StockAdjustmentItem", "StockAlert", "StockSnapshot",
     
     # Messages
     "Message", "MessageRecipient", "MessageTemplate", 
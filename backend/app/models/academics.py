@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..db.session import Base
@@ -23,6 +23,10 @@ class Class(Base):
 
 class Course(Base):
     __tablename__ = "courses"
+    __table_args__ = (
+        # Keyset pagination: WHERE school_id = ? AND id > ? ORDER BY id
+        Index("ix_courses_school_id_id", "school_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
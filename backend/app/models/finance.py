@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Numeric, Text, Date
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Numeric, Text, Date, Index, UniqueConstraint, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..db.session import Base
@@ -16,6 +16,7 @@ class FeeStructure(Base):
     
     # Fee details
     total_amount = Column(Numeric(10, 2), nullable=False)
+    late_fee_amount = Column(Numeric(10, 2), nullable=False, default=0)  # Added once when an invoice becomes overdue
     currency = Column(String(10), nullable=False, default="USD")
     payment_schedule = Column(String(50), nullable=False, default="termly")  # termly, monthly, yearly
     
@@ -52,6 +53,18 @@ class FeeItem(Base):
 
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        # One live invoice per student, fee structure and term; makes bulk generation idempotent
+        Index(
+            "uq_invoices_student_structure_term",
+            "student_id", "fee_structure_id", "term_id",
+            unique=True,
+            postgresql_where=text("status <> 'cancelled'"),
+            sqlite_where=text("status <> 'cancelled'"),
+        ),
+        # Outstanding-invoice scans (reconciliation, overdue checks)
+        Index("ix_invoices_school_status_due", "school_id", "status", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -90,6 +103,15 @@ class Invoice(Base):
     items = relationship("InvoiceItem", back_populates="invoice", cascade="all, delete-orphan")
 
 
+class InvoiceSequence(Base):
+    """Next invoice number per school; numbers are taken in blocks inside the inserting transaction."""
+    __tablename__ = "invoice_sequences"
+
+    school_id = Column(Integer, primary_key=True)
+    next_number = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
 class InvoiceItem(Base):
     __tablename__ = "invoice_items"
 
@@ -109,6 +131,10 @@ class InvoiceItem(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # Duplicate checks when importing bank statements
+        Index("ix_payments_school_transaction", "school_id", "transaction_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -167,6 +193,10 @@ class PaymentPlan(Base):
 
 class PaymentInstallment(Base):
     __tablename__ = "payment_installments"
+    __table_args__ = (
+        # Overdue sweeps
+        Index("ix_payment_installments_school_status_due", "school_id", "status", "due_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -178,4 +208,51 @@ class PaymentInstallment(Base):
     status = Column(String(50), nullable=False, default="pending")  # pending, paid, overdue
 
     # Relationships
-    plan = relationship("PaymentPlan", back_populates="installments_due") 
\ No newline at end of file
+    plan = relationship("PaymentPlan", back_populates="installments_due") 
+
+
+class OverdueSweep(Base):
+    """Per-school checkpoint of the overdue sweeper: rows due before `swept_through` are done."""
+    __tablename__ = "overdue_sweeps"
+
+    school_id = Column(Integer, primary_key=True)
+    swept_through = Column(Date, nullable=False)
+    invoices_marked = Column(Integer, nullable=False, default=0)  # Last run
+    installments_marked = Column(Integer, nullable=False, default=0)  # Last run
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FinanceRollup(Base):
+    """Daily finance totals per school, academic year, term and class.
+
+    Maintained by the invoicing/payment services in the same transaction as
+    the write and rebuilt nightly. `term_id`/`class_id` are 0 when an invoice
+    has no term or its student no enrollment. Flow columns are keyed by
+    issue/payment day; `due_*` columns by the invoices' due day.
+    """
+    __tablename__ = "finance_daily_rollups"
+    __table_args__ = (
+        UniqueConstraint(
+            "school_id", "academic_year_id", "term_id", "class_id", "day",
+            name="uq_finance_daily_rollups_key",
+        ),
+        # Date-range reads (collections per day)
+        Index("ix_finance_daily_rollups_school_day", "school_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(Integer, nullable=False)
+    academic_year_id = Column(Integer, nullable=False)
+    term_id = Column(Integer, nullable=False, default=0)
+    class_id = Column(Integer, nullable=False, default=0)
+    day = Column(Date, nullable=False)
+
+    invoiced_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    invoice_count = Column(Integer, nullable=False, default=0)
+    collected_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
+    due_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    due_paid_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    due_count = Column(Integer, nullable=False, default=0)
+    due_settled_count = Column(Integer, nullable=False, default=0)
+
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Numeric, Text
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, ForeignKey, Numeric, Text, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..db.session import Base
@@ -73,6 +73,10 @@ class Item(Base):
 
 class InventoryItem(Base):
     __tablename__ = "inventory_items"
+    __table_args__ = (
+        # One stock row per item and inventory; the ledger upserts into it
+        UniqueConstraint("inventory_id", "item_id", name="uq_inventory_items_inventory_item"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -99,6 +103,12 @@ class InventoryItem(Base):
 
 class StockMovement(Base):
     __tablename__ = "stock_movements"
+    __table_args__ = (
+        # Duplicate delivery note checks
+        Index("ix_stock_movements_school_reference", "school_id", "reference_type", "reference_number"),
+        # Daily snapshots
+        Index("ix_stock_movements_school_date", "school_id", "movement_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -131,6 +141,55 @@ class StockMovement(Base):
     moved_by_user = relationship("User")
 
 
+class StockAlert(Base):
+    """Item below its reorder level ("low") or above its max level ("over") in an inventory.
+
+    Kept in step with stock levels by the ledger and rebuilt daily.
+    """
+    __tablename__ = "stock_alerts"
+    __table_args__ = (
+        UniqueConstraint("inventory_id", "item_id", name="uq_stock_alerts_inventory_item"),
+        Index("ix_stock_alerts_school_kind", "school_id", "kind"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(Integer, nullable=False)
+    inventory_id = Column(Integer, ForeignKey('inventories.id'), nullable=False)
+    item_id = Column(Integer, ForeignKey('items.id'), nullable=False)
+    kind = Column(String(20), nullable=False)  # low, over
+    current_stock = Column(Integer, nullable=False)
+    available_stock = Column(Integer, nullable=False)
+    threshold = Column(Integer, nullable=False)  # reorder_level or max_stock_level
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class StockSnapshot(Base):
+    """Per-inventory valuation and movement totals for one day."""
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (
+        UniqueConstraint("school_id", "inventory_id", "day", name="uq_stock_snapshots_inventory_day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(Integer, nullable=False)
+    inventory_id = Column(Integer, ForeignKey('inventories.id'), nullable=False)
+    day = Column(Date, nullable=False)
+
+    # Closing position, valued at item unit cost
+    item_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    stock_value = Column(Numeric(14, 2), nullable=False, default=0)
+
+    # Movements dated that day
+    movement_count = Column(Integer, nullable=False, default=0)
+    units_in = Column(Integer, nullable=False, default=0)
+    units_out = Column(Integer, nullable=False, default=0)
+    value_in = Column(Numeric(14, 2), nullable=False, default=0)
+    value_out = Column(Numeric(14, 2), nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class StockAdjustment(Base):
     __tablename__ = "stock_adjustments"
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Float, Text, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Float, Text, Numeric, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..db.session import Base
@@ -6,6 +6,10 @@ from ..db.session import Base
 
 class AssignmentMark(Base):
     __tablename__ = "assignment_marks"
+    __table_args__ = (
+        # Report computation scans one class and term at a time
+        Index("ix_assignment_marks_school_class_term", "school_id", "class_id", "term_id", "course_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -42,6 +46,10 @@ class AssignmentMark(Base):
 
 class ExamMark(Base):
     __tablename__ = "exam_marks"
+    __table_args__ = (
+        # Report computation scans one class and term at a time
+        Index("ix_exam_marks_school_class_term", "school_id", "class_id", "term_id", "course_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -77,6 +85,10 @@ class ExamMark(Base):
 
 class MarkReport(Base):
     __tablename__ = "mark_reports"
+    __table_args__ = (
+        # One report per student/course/term; target of the report upsert
+        UniqueConstraint("student_id", "course_id", "term_id", name="uq_mark_reports_student_course_term"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -111,6 +123,25 @@ class MarkReport(Base):
     computed_by_user = relationship("User")
 
 
+class MarkRecompute(Base):
+    """Report keys whose marks changed and still await an incremental recompute."""
+    __tablename__ = "mark_recomputes"
+    __table_args__ = (
+        UniqueConstraint(
+            "school_id", "class_id", "term_id", "course_id", "student_id",
+            name="uq_mark_recomputes_key",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    school_id = Column(Integer, nullable=False, index=True)
+    class_id = Column(Integer, nullable=False)
+    term_id = Column(Integer, nullable=False)
+    course_id = Column(Integer, nullable=False)
+    student_id = Column(Integer, nullable=False)
+    queued_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class GradingScale(Base):
     __tablename__ = "grading_scales"
 
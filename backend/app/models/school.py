@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..db.session import Base
@@ -21,6 +21,10 @@ class School(Base):
 
 class Staff(Base):
     __tablename__ = "staff"
+    __table_args__ = (
+        # Keyset pagination: WHERE school_id = ? AND id > ? ORDER BY id
+        Index("ix_staff_school_id_id", "school_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -50,6 +54,10 @@ class Staff(Base):
 
 class Student(Base):
     __tablename__ = "students"
+    __table_args__ = (
+        # Keyset pagination: WHERE school_id = ? AND id > ? ORDER BY id
+        Index("ix_students_school_id_id", "school_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -72,6 +80,10 @@ class Student(Base):
 
 class Parent(Base):
     __tablename__ = "parents"
+    __table_args__ = (
+        # Keyset pagination: WHERE school_id = ? AND id > ? ORDER BY id
+        Index("ix_parents_school_id_id", "school_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     school_id = Column(Integer, nullable=False, index=True)
@@ -0,0 +1,99 @@
+from datetime import date
+from decimal import Decimal
+
+from pydantic import BaseModel
+
+
+class GenerateInvoicesIn(BaseModel):
+    term_id: int
+    due_date: date
+    issue_date: date | None = None
+    # Whole school when omitted
+    class_id: int | None = None
+    include_optional: bool = False
+
+
+class PaymentIn(BaseModel):
+    invoice_id: int
+    amount: Decimal
+    payment_method: str  # cash, bank_transfer, card, mobile_money
+    payment_date: date | None = None
+    transaction_id: str | None = None
+    reference_number: str | None = None
+    notes: str | None = None
+
+
+class PaymentOut(BaseModel):
+    id: int
+    payment_reference: str
+    invoice_id: int
+    amount: Decimal
+    invoice_paid_amount: Decimal
+    invoice_balance: Decimal
+    invoice_status: str
+
+
+class ReconciliationLine(BaseModel):
+    row: int
+    reference: str | None = None
+    amount: Decimal | None = None
+    status: str  # matched, unmatched, duplicate, overpayment, invalid
+    invoice_id: int | None = None
+    invoice_number: str | None = None
+    error: str | None = None
+
+
+class ReconciliationReport(BaseModel):
+    dry_run: bool
+    total_lines: int = 0
+    matched: int = 0
+    unmatched: int = 0
+    matched_amount: Decimal = Decimal("0")
+    posted: int = 0
+    lines: list[ReconciliationLine] = []
+
+
+class ClassOutstanding(BaseModel):
+    # 0: students without an enrollment for the year
+    class_id: int
+    invoiced_amount: Decimal
+    collected_amount: Decimal
+    outstanding_amount: Decimal
+    invoice_count: int
+    open_count: int
+
+
+class OutstandingReport(BaseModel):
+    academic_year_id: int
+    term_id: int | None = None
+    total_outstanding: Decimal = Decimal("0")
+    classes: list[ClassOutstanding] = []
+
+
+class CollectionDay(BaseModel):
+    day: date
+    amount: Decimal
+    payments: int
+
+
+class CollectionsReport(BaseModel):
+    start: date
+    end: date
+    total_amount: Decimal = Decimal("0")
+    payment_count: int = 0
+    days: list[CollectionDay] = []
+
+
+class ClassOverdue(BaseModel):
+    class_id: int
+    overdue_amount: Decimal
+    overdue_count: int
+
+
+class OverdueReport(BaseModel):
+    academic_year_id: int
+    term_id: int | None = None
+    as_of: date
+    total_amount: Decimal = Decimal("0")
+    total_count: int = 0
+    classes: list[ClassOverdue] = []
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from pydantic import BaseModel
+
+
+class MovementIn(BaseModel):
+    movement_type: str  # in, out, transfer, adjustment
+    item_id: int
+    inventory_id: int
+    # Positive; signed for adjustments
+    quantity: int
+    # Destination of a transfer
+    to_inventory_id: int | None = None
+    unit_cost: Decimal | None = None
+    reason: str
+    reference_type: str | None = None
+    reference_id: int | None = None
+    reference_number: str | None = None
+    notes: str | None = None
+
+
+class PostMovementsIn(BaseModel):
+    movements: list[MovementIn]
+    movement_date: datetime | None = None
+
+
+class DeliveryLineIn(BaseModel):
+    # One of item_id, sku or barcode
+    item_id: int | None = None
+    sku: str | None = None
+    barcode: str | None = None
+    quantity: int
+    unit_cost: Decimal | None = None
+
+
+class DeliveryNoteIn(BaseModel):
+    inventory_id: int
+    delivery_note_number: str
+    supplier: str | None = None
+    movement_date: datetime | None = None
+    notes: str | None = None
+    lines: list[DeliveryLineIn]
+
+
+class StockLevelOut(BaseModel):
+    inventory_id: int
+    item_id: int
+    current_stock: int
+    available_stock: int
+
+
+class PostMovementsOut(BaseModel):
+    movements: int
+    stock: list[StockLevelOut]
+
+
+class StockAlertOut(BaseModel):
+    inventory_id: int
+    item_id: int
+    sku: str
+    name: str
+    kind: str  # low, over
+    current_stock: int
+    available_stock: int
+    threshold: int
+    since: datetime | None = None
+
+
+class StockSnapshotOut(BaseModel):
+    inventory_id: int
+    day: date
+    item_count: int
+    units: int
+    stock_value: Decimal
+    movement_count: int
+    units_in: int
+    units_out: int
+    value_in: Decimal
+    value_out: Decimal
+
+    class Config:
+        from_attributes = True
+
+
+class CountLineIn(BaseModel):
+    # sku or barcode
+    sku: str | None = None
+    barcode: str | None = None
+    quantity: int
+
+
+class StockCountIn(BaseModel):
+    inventory_id: int
+    adjustment_type: str = "physical_count"
+    description: str | None = None
+    # Items with stock that are missing from the sheet were counted as zero
+    full_count: bool = False
+    lines: list[CountLineIn]
+
+
+class StockCountOut(BaseModel):
+    adjustment_id: int
+    adjustment_number: str
+    status: str
+    counted_items: int
+    differences: int
+    total_value_change: Decimal
+    # SKUs/barcodes not found
+    unmatched: list[str] = []
+    errors: list[str] = []
@@ -0,0 +1,12 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class JobOut(BaseModel):
+    task_id: str
+    state: str
+    done: int | None = None
+    total: int | None = None
+    result: dict[str, Any] | None = None
+    error: str | None = None
@@ -0,0 +1,47 @@
+from datetime import datetime
+from decimal import Decimal
+
+from pydantic import BaseModel
+
+
+class ComputeReportsIn(BaseModel):
+    class_id: int
+    term_id: int
+    grading_scale_id: int | None = None
+    course_ids: list[int] | None = None
+
+
+class ComputeReportsOut(BaseModel):
+    class_id: int
+    term_id: int
+    reports: int
+
+
+class MarkReportOut(BaseModel):
+    id: int
+    student_id: int
+    course_id: int
+    class_id: int
+    term_id: int
+    assignment_total: Decimal
+    exam_total: Decimal
+    total: Decimal
+    percentage: Decimal
+    grade: str | None = None
+    position: int | None = None
+    total_students: int | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class RecomputeScope(BaseModel):
+    class_id: int
+    term_id: int
+    pending: int
+    oldest_queued_at: datetime | None = None
+
+
+class RecomputeStatus(BaseModel):
+    pending: int
+    scopes: list[RecomputeScope]
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from ..models.message import MessageChannel, MessageStatus, RecipientType
+
+
+class RecipientTarget(BaseModel):
+    # user, staff, student, parent, class, role, all_staff, all_students, all_parents
+    type: RecipientType
+    ids: list[int] = []
+    # Enrollment year for class targets; the current year when omitted
+    academic_year_id: int | None = None
+
+
+class MessageIn(BaseModel):
+    channel: MessageChannel
+    subject: str | None = None
+    body: str
+    targets: list[RecipientTarget]
+    message_type: str | None = None
+    priority: str = "normal"
+    scheduled_at: datetime | None = None
+
+
+class MessageOut(BaseModel):
+    id: int
+    channel: MessageChannel
+    subject: str | None = None
+    status: MessageStatus
+    total_recipients: int
+    scheduled_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class FanOutOut(BaseModel):
+    message_id: int
+    added: int
+    total_recipients: int
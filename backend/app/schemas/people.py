@@ -34,4 +34,19 @@ class StudentOut(BaseModel):
     admission_no: str | None = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class StudentImportRowError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class StudentImportReport(BaseModel):
+    dry_run: bool
+    total_rows: int = 0
+    valid_rows: int = 0
+    imported: int = 0
+    parents_created: int = 0
+    parent_links: int = 0
+    enrollments: int = 0
+    errors: list[StudentImportRowError] = []
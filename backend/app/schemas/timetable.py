@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+
+
+class CourseRequirementIn(BaseModel):
+    class_id: int
+    course_id: int
+    periods_per_week: int
+    staff_id: int | None = None
+    room_type: str | None = None
+
+
+class GenerateTimetableIn(BaseModel):
+    term_id: int
+    name: str | None = None
+    requirements: list[CourseRequirementIn]
+    time_limit: float = 10.0
+
+
+class ProposedEntry(BaseModel):
+    class_id: int
+    period_id: int
+    staff_id: int
+    room_id: int | None = None
+    course_id: int | None = None
+    # Existing entry being moved; its current slot does not count as a clash
+    entry_id: int | None = None
+
+
+class ValidateTimetableIn(BaseModel):
+    term_id: int
+    entries: list[ProposedEntry]
+
+
+class Clash(BaseModel):
+    kind: str  # class, staff, room
+    entry_id: int | None = None
+    # Index of a clashing entry within the same request
+    proposed_index: int | None = None
+
+
+class EntryValidation(BaseModel):
+    index: int
+    ok: bool
+    clashes: list[Clash] = []
+    error: str | None = None
+
+
+class ValidateTimetableOut(BaseModel):
+    ok: bool
+    results: list[EntryValidation]
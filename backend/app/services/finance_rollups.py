@@ -0,0 +1,297 @@
+"""Daily finance rollups for the finance dashboards.
+
+`finance_daily_rollups` holds one row per school, academic year, term,
+class and day. Invoices count towards their issue day (`invoiced_*`) and
+their due day (`due_*`); payments count towards their payment day
+(`collected_*`) and their invoice's due day (`due_paid_amount`, plus
+`due_settled_count` when they settle it). A class's outstanding balance is
+then the sum of `due_amount - due_paid_amount` over its rows, and its
+overdue balance the same sum over days before today, so dashboards read a
+term's worth of rows however many invoices and payments lie behind them.
+
+The invoicing, payment and overdue services call `record_invoices`,
+`record_charges` and `record_payments` in the transaction of their write: deltas are summed in
+Python and applied with one multi-row upsert that adds to the stored
+totals. Writes that bypass those services (manual edits, cancellations)
+are picked up by `rebuild_rollups`, which the nightly job runs for every
+current academic year. `term_id`/`class_id` are 0 for invoices without a
+term or students without an enrollment, so the unique key has no NULLs.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import Integer, Numeric, case, delete, func, insert, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import upsert_insert
+from ..models.academics import Enrollment
+from ..models.calendar import AcademicYear
+from ..models.finance import FinanceRollup, Invoice, Payment
+
+KEY = ("school_id", "academic_year_id", "term_id", "class_id", "day")
+MEASURES = (
+    "invoiced_amount", "invoice_count", "collected_amount", "payment_count",
+    "due_amount", "due_paid_amount", "due_count", "due_settled_count",
+)
+
+
+def _class_of_invoice():
+    """Class the invoiced student is enrolled in for the invoice's year (0 if none)."""
+    enrolled = (
+        select(Enrollment.class_id)
+        .where(
+            Enrollment.school_id == Invoice.school_id,
+            Enrollment.student_id == Invoice.student_id,
+            Enrollment.academic_year_id == Invoice.academic_year_id,
+        )
+        .order_by((Enrollment.status == "active").desc(), Enrollment.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    return func.coalesce(enrolled, 0)
+
+
+def _dimensions():
+    return (
+        Invoice.academic_year_id,
+        func.coalesce(Invoice.term_id, 0).label("term_id"),
+        _class_of_invoice().label("class_id"),
+    )
+
+
+class RollupDeltas:
+    """Per-key increments of the rollup measures, applied in one statement."""
+
+    __slots__ = ("school_id", "rows")
+
+    def __init__(self, school_id: int):
+        self.school_id = school_id
+        # (academic year, term, class, day) -> measure -> increment
+        self.rows: dict[tuple[int, int, int, date], dict[str, Decimal | int]] = {}
+
+    def add(self, dimensions: tuple[int, int, int], day: date, **measures: Decimal | int) -> None:
+        row = self.rows.setdefault((*dimensions, day), {})
+        for name, value in measures.items():
+            row[name] = row.get(name, 0) + value
+
+    async def apply(self, db: AsyncSession) -> None:
+        if not self.rows:
+            return
+        table = FinanceRollup.__table__
+        values = [
+            {
+                "school_id": self.school_id,
+                "academic_year_id": year_id,
+                "term_id": term_id,
+                "class_id": class_id,
+                "day": day,
+                **{name: measures.get(name, 0) for name in MEASURES},
+            }
+            # Fixed key order so concurrent writers lock rows in the same order
+            for (year_id, term_id, class_id, day), measures in sorted(self.rows.items())
+        ]
+        stmt = upsert_insert(table).values(values)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=list(KEY),
+                set_={name: table.c[name] + stmt.excluded[name] for name in MEASURES},
+            )
+        )
+        self.rows.clear()
+
+
+async def _invoice_dimensions(db: AsyncSession, school_id: int, invoice_ids: Iterable[int]):
+    result = await db.execute(
+        select(Invoice.id, *_dimensions(), Invoice.issue_date, Invoice.due_date, Invoice.total_amount).where(
+            Invoice.school_id == school_id, Invoice.id.in_(set(invoice_ids))
+        )
+    )
+    return {row[0]: row for row in result}
+
+
+async def record_invoices(db: AsyncSession, school_id: int, invoice_ids: Iterable[int]) -> None:
+    """Add newly created invoices to the rollups; the caller commits."""
+    deltas = RollupDeltas(school_id)
+    for _, year_id, term_id, class_id, issue_date, due_date, total in (
+        await _invoice_dimensions(db, school_id, invoice_ids)
+    ).values():
+        dimensions = (year_id, term_id, class_id)
+        deltas.add(dimensions, issue_date, invoiced_amount=total, invoice_count=1)
+        deltas.add(dimensions, due_date, due_amount=total, due_count=1)
+    await deltas.apply(db)
+
+
+async def record_charges(db: AsyncSession, school_id: int, charges: Iterable[tuple[int, Decimal]]) -> None:
+    """Add (invoice id, amount) charges added to existing invoices, e.g. late fees; the caller commits."""
+    charges = list(charges)
+    invoices = await _invoice_dimensions(db, school_id, [c[0] for c in charges])
+    deltas = RollupDeltas(school_id)
+    for invoice_id, amount in charges:
+        _, year_id, term_id, class_id, issue_date, due_date, _ = invoices[invoice_id]
+        deltas.add((year_id, term_id, class_id), issue_date, invoiced_amount=amount)
+        deltas.add((year_id, term_id, class_id), due_date, due_amount=amount)
+    await deltas.apply(db)
+
+
+async def record_payments(
+    db: AsyncSession,
+    school_id: int,
+    payments: Iterable[tuple[int, Decimal, date]],
+    settled: Iterable[int] = (),
+) -> None:
+    """Add completed (invoice id, amount, payment date) payments to the rollups.
+
+    `settled` holds the ids of invoices these payments paid in full. The
+    caller commits.
+    """
+    payments = list(payments)
+    settled = set(settled)
+    invoices = await _invoice_dimensions(db, school_id, [p[0] for p in payments] + list(settled))
+    deltas = RollupDeltas(school_id)
+    for invoice_id, amount, paid_on in payments:
+        _, year_id, term_id, class_id, _, due_date, _ = invoices[invoice_id]
+        dimensions = (year_id, term_id, class_id)
+        deltas.add(dimensions, paid_on, collected_amount=amount, payment_count=1)
+        deltas.add(dimensions, due_date, due_paid_amount=amount)
+    for invoice_id in settled:
+        _, year_id, term_id, class_id, _, due_date, _ = invoices[invoice_id]
+        deltas.add((year_id, term_id, class_id), due_date, due_settled_count=1)
+    await deltas.apply(db)
+
+
+def _rollup_rows(day, **values):
+    """One branch of the rebuild union: dimensions, day and every measure."""
+    columns = [Invoice.school_id, *_dimensions(), day.label("day")]
+    for name in MEASURES:
+        kind = Integer if name.endswith("_count") else Numeric(14, 2)
+        columns.append(values.get(name, literal(0, kind)).label(name))
+    return select(*columns)
+
+
+async def rebuild_rollups(db: AsyncSession, school_id: int, academic_year_id: int) -> int:
+    """Recompute a school year's rollups from invoices and payments; the caller commits.
+
+    Returns the number of rollup rows written.
+    """
+    scope = (
+        Invoice.school_id == school_id,
+        Invoice.academic_year_id == academic_year_id,
+        Invoice.status != "cancelled",
+    )
+    one = literal(1, Integer)
+    rows = union_all(
+        _rollup_rows(Invoice.issue_date, invoiced_amount=Invoice.total_amount, invoice_count=one).where(*scope),
+        _rollup_rows(
+            Invoice.due_date,
+            due_amount=Invoice.total_amount,
+            due_paid_amount=Invoice.paid_amount,
+            due_count=one,
+            due_settled_count=case((Invoice.status == "paid", 1), else_=0),
+        ).where(*scope),
+        _rollup_rows(Payment.payment_date, collected_amount=Payment.amount, payment_count=one)
+        .join(Payment, Payment.invoice_id == Invoice.id)
+        .where(*scope, Payment.status == "completed"),
+    ).subquery("r")
+
+    await db.execute(
+        delete(FinanceRollup).where(
+            FinanceRollup.school_id == school_id,
+            FinanceRollup.academic_year_id == academic_year_id,
+        )
+    )
+    result = await db.execute(
+        insert(FinanceRollup).from_select(
+            [*KEY, *MEASURES],
+            select(
+                *(rows.c[name] for name in KEY),
+                *(func.sum(rows.c[name]) for name in MEASURES),
+            ).group_by(*(rows.c[name] for name in KEY)),
+        )
+    )
+    return result.rowcount
+
+
+async def current_academic_year_id(db: AsyncSession, school_id: int) -> int | None:
+    result = await db.execute(
+        select(AcademicYear.id)
+        .where(AcademicYear.school_id == school_id, AcademicYear.is_current == True)
+        .order_by(AcademicYear.id.desc())
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+def _report_scope(school_id: int, academic_year_id: int, term_id: int | None):
+    scope = [FinanceRollup.school_id == school_id, FinanceRollup.academic_year_id == academic_year_id]
+    if term_id is not None:
+        scope.append(FinanceRollup.term_id == term_id)
+    return scope
+
+
+async def outstanding_by_class(
+    db: AsyncSession, school_id: int, academic_year_id: int, term_id: int | None = None
+) -> list[dict]:
+    r = FinanceRollup
+    result = await db.execute(
+        select(
+            r.class_id,
+            func.sum(r.invoiced_amount).label("invoiced_amount"),
+            func.sum(r.collected_amount).label("collected_amount"),
+            func.sum(r.due_amount - r.due_paid_amount).label("outstanding_amount"),
+            func.sum(r.invoice_count).label("invoice_count"),
+            func.sum(r.due_count - r.due_settled_count).label("open_count"),
+        )
+        .where(*_report_scope(school_id, academic_year_id, term_id))
+        .group_by(r.class_id)
+        .order_by(r.class_id)
+    )
+    return [dict(row._mapping) for row in result]
+
+
+async def overdue_by_class(
+    db: AsyncSession,
+    school_id: int,
+    academic_year_id: int,
+    term_id: int | None = None,
+    as_of: date | None = None,
+) -> list[dict]:
+    """Unpaid balance and invoice count per class due before `as_of` (today)."""
+    r = FinanceRollup
+    overdue_amount = func.sum(r.due_amount - r.due_paid_amount)
+    result = await db.execute(
+        select(
+            r.class_id,
+            overdue_amount.label("overdue_amount"),
+            func.sum(r.due_count - r.due_settled_count).label("overdue_count"),
+        )
+        .where(*_report_scope(school_id, academic_year_id, term_id), r.day < (as_of or date.today()))
+        .group_by(r.class_id)
+        .having(overdue_amount > 0)
+        .order_by(r.class_id)
+    )
+    return [dict(row._mapping) for row in result]
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+async def collections_by_day(
+    db: AsyncSession,
+    school_id: int,
+    start: date,
+    end: date,
+    class_id: int | None = None,
+) -> list[dict]:
+    """Amount and number of payments collected per day in [start, end]."""
+    r = FinanceRollup
+    stmt = select(
+        r.day,
+        func.sum(r.collected_amount).label("amount"),
+        func.sum(r.payment_count).label("payments"),
+    ).where(r.school_id == school_id, r.day >= start, r.day <= end, r.payment_count > 0)
+    if class_id is not None:
+        stmt = stmt.where(r.class_id == class_id)
+    result = await db.execute(stmt.group_by(r.day).order_by(r.day))
+    return [dict(row._mapping) for row in result]
@@ -0,0 +1,242 @@
+"""Bulk invoice generation for a term.
+
+Every active enrollment of the term's academic year (optionally one class)
+is matched to its fee structure: the class-specific one if it exists, else
+the school-wide one (`class_id IS NULL`); among several, the latest
+effective one wins. Students who already hold a live invoice for that
+structure and term are skipped, so re-running a generation only fills in
+what is missing (a partial unique index backs this up against concurrent
+runs).
+
+Invoices are written in chunks, each in its own transaction: invoice
+numbers for the chunk are taken as one block from `invoice_sequences` with
+a single UPDATE ... RETURNING, then invoices and their items are
+bulk-inserted. Because the block is taken in the same transaction as the
+inserts, a failed chunk releases its numbers and the sequence stays
+gap-free. Each chunk adds its invoices to the finance rollups in the same
+transaction.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import bulk_insert, upsert_insert
+from ..models.academics import Enrollment
+from ..models.calendar import Term
+from ..models.finance import FeeItem, FeeStructure, Invoice, InvoiceItem, InvoiceSequence
+from .finance_rollups import record_invoices
+
+CHUNK_SIZE = 500
+
+
+def format_invoice_number(school_id: int, number: int) -> str:
+    # invoice_number is unique across schools
+    return f"INV-{school_id}-{number:06d}"
+
+
+async def allocate_invoice_numbers(db: AsyncSession, school_id: int, count: int) -> int:
+    """Reserve `count` consecutive numbers for the school; returns the first.
+
+    The sequence row stays locked until the caller's transaction ends.
+    """
+    await db.execute(
+        upsert_insert(InvoiceSequence.__table__)
+        .values(school_id=school_id, next_number=1)
+        .on_conflict_do_nothing(index_elements=["school_id"])
+    )
+    result = await db.execute(
+        update(InvoiceSequence)
+        .where(InvoiceSequence.school_id == school_id)
+        .values(next_number=InvoiceSequence.next_number + count)
+        .returning(InvoiceSequence.next_number)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one() - count
+
+
+async def _structures_by_class(
+    db: AsyncSession, school_id: int, academic_year_id: int, as_of: date
+) -> dict[int | None, int]:
+    result = await db.execute(
+        select(FeeStructure.class_id, FeeStructure.id)
+        .where(
+            FeeStructure.school_id == school_id,
+            FeeStructure.academic_year_id == academic_year_id,
+            FeeStructure.is_active == True,
+            # Structures taking effect later do not apply yet
+            or_(FeeStructure.effective_date.is_(None), FeeStructure.effective_date <= as_of),
+        )
+        # Later rows win: latest effective date in force, then newest
+        .order_by(FeeStructure.effective_date.is_(None).desc(), FeeStructure.effective_date, FeeStructure.id)
+    )
+    return dict(result.all())
+
+
+async def _fee_lines(
+    db: AsyncSession, structure_ids: set[int], include_optional: bool
+) -> dict[int, list[tuple[int | None, str, Decimal]]]:
+    """(fee item id, description, amount) per structure."""
+    stmt = select(FeeItem.fee_structure_id, FeeItem.id, FeeItem.name, FeeItem.amount).where(
+        FeeItem.fee_structure_id.in_(structure_ids)
+    )
+    if not include_optional:
+        stmt = stmt.where(FeeItem.is_mandatory == True)
+    lines: dict[int, list] = {}
+    for structure_id, item_id, name, amount in await db.execute(stmt.order_by(FeeItem.id)):
+        lines.setdefault(structure_id, []).append((item_id, name, amount))
+
+    # Structures without items are billed as one line for their total
+    missing = structure_ids - lines.keys()
+    if missing:
+        result = await db.execute(
+            select(FeeStructure.id, FeeStructure.name, FeeStructure.total_amount).where(
+                FeeStructure.id.in_(missing)
+            )
+        )
+        for structure_id, name, total in result:
+            lines[structure_id] = [(None, name, total)]
+    return lines
+
+
+async def plan_invoices(
+    db: AsyncSession, school_id: int, term_id: int, class_id: int | None = None, as_of: date | None = None
+) -> tuple[int, list[tuple[int, int]]]:
+    """Academic year id and the (student_id, fee_structure_id) pairs still to invoice.
+
+    Each class is billed with the structure in force on `as_of` (today by default).
+    """
+    result = await db.execute(
+        select(Term.academic_year_id).where(Term.id == term_id, Term.school_id == school_id)
+    )
+    academic_year_id = result.scalar_one_or_none()
+    if academic_year_id is None:
+        raise ValueError("Term not found")
+
+    structures = await _structures_by_class(db, school_id, academic_year_id, as_of or date.today())
+    if not structures:
+        raise ValueError("No active fee structure for the term's academic year")
+
+    stmt = select(Enrollment.student_id, Enrollment.class_id).where(
+        Enrollment.school_id == school_id,
+        Enrollment.academic_year_id == academic_year_id,
+        Enrollment.status == "active",
+    )
+    if class_id is not None:
+        stmt = stmt.where(Enrollment.class_id == class_id)
+    enrollments = (await db.execute(stmt.distinct())).all()
+
+    result = await db.execute(
+        select(Invoice.student_id, Invoice.fee_structure_id).where(
+            Invoice.school_id == school_id,
+            Invoice.term_id == term_id,
+            Invoice.status != "cancelled",
+        )
+    )
+    invoiced = set(result.all())
+
+    planned = {}
+    for student_id, enrolled_class_id in enrollments:
+        structure_id = structures.get(enrolled_class_id, structures.get(None))
+        if structure_id is not None and (student_id, structure_id) not in invoiced:
+            planned[(student_id, structure_id)] = None
+    return academic_year_id, sorted(planned)
+
+
+async def generate_invoices(
+    db: AsyncSession,
+    school_id: int,
+    term_id: int,
+    created_by: int,
+    *,
+    due_date: date,
+    issue_date: date | None = None,
+    class_id: int | None = None,
+    include_optional: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Callable[[int, int], None] | None = None,
+) -> dict[str, Any]:
+    """Invoice every enrolled student not invoiced yet; commits per chunk.
+
+    Students invoiced by an overlapping run in the meantime are counted
+    under `skipped`; their reserved invoice numbers are left unused.
+    """
+    issue_date = issue_date or date.today()
+    academic_year_id, planned = await plan_invoices(db, school_id, term_id, class_id, issue_date)
+    lines = await _fee_lines(db, {s for _, s in planned}, include_optional)
+    total = len(planned)
+    if progress is not None:
+        progress(0, total)
+
+    first_number = last_number = None
+    skipped = 0
+    for start in range(0, total, chunk_size):
+        chunk = planned[start:start + chunk_size]
+        first = await allocate_invoice_numbers(db, school_id, len(chunk))
+        invoices = []
+        for offset, (student_id, structure_id) in enumerate(chunk):
+            amount = sum((line[2] for line in lines[structure_id]), Decimal("0"))
+            invoices.append({
+                "school_id": school_id,
+                "invoice_number": format_invoice_number(school_id, first + offset),
+                "student_id": student_id,
+                "fee_structure_id": structure_id,
+                "term_id": term_id,
+                "academic_year_id": academic_year_id,
+                "subtotal": amount,
+                "discount_amount": Decimal("0"),
+                "tax_amount": Decimal("0"),
+                "total_amount": amount,
+                "paid_amount": Decimal("0"),
+                "balance": amount,
+                "issue_date": issue_date,
+                "due_date": due_date,
+                "status": "pending",
+                "created_by": created_by,
+            })
+        # A concurrent run may have invoiced some of these students since the
+        # plan was made; the live-invoice unique index decides, and those rows
+        # are skipped rather than failing the chunk.
+        ids = await bulk_insert(
+            db, Invoice.__table__, invoices, with_ids=True,
+            skip_conflicts=["student_id", "fee_structure_id", "term_id"],
+            conflict_where="status <> 'cancelled'",
+        )
+        created = [
+            (invoice_id, structure_id)
+            for invoice_id, (_, structure_id) in zip(ids, chunk)
+            if invoice_id is not None
+        ]
+        invoice_ids = [invoice_id for invoice_id, _ in created]
+        skipped += len(chunk) - len(created)
+
+        items = [
+            {
+                "school_id": school_id,
+                "invoice_id": invoice_id,
+                "fee_item_id": fee_item_id,
+                "description": description,
+                "quantity": 1,
+                "unit_price": amount,
+                "total_price": amount,
+            }
+            for invoice_id, structure_id in created
+            for fee_item_id, description, amount in lines[structure_id]
+        ]
+        await bulk_insert(db, InvoiceItem.__table__, items)
+        await record_invoices(db, school_id, invoice_ids)
+        await db.commit()
+
+        first_number = first if first_number is None else first_number
+        last_number = first + len(chunk) - 1
+        if progress is not None:
+            progress(start + len(chunk), total)
+
+    return {
+        "created": total - skipped,
+        "skipped": skipped,
+        "first_invoice_number": format_invoice_number(school_id, first_number) if total else None,
+        "last_invoice_number": format_invoice_number(school_id, last_number) if total else None,
+    }
@@ -0,0 +1,160 @@
+"""Incremental recomputation of mark reports after mark edits.
+
+Every flush that inserts, updates or deletes an `AssignmentMark`/`ExamMark`
+records the affected report key (school, class, term, course, student) in
+`mark_recomputes`, in the same transaction as the mark itself, so a queued
+key is never lost or recorded for a rolled-back edit. After commit a
+debounced Celery task is scheduled; it drains the queue, re-aggregates only
+the queued (student, course) reports and re-ranks the affected course
+partitions.
+
+Code that writes marks with Core statements must call `queue_recompute`
+itself.
+"""
+import logging
+import time
+from typing import Iterable
+
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..db.bulk import upsert_insert
+from ..models.marks import AssignmentMark, ExamMark, MarkRecompute
+from .mark_reports import compute_reports
+
+logger = logging.getLogger(__name__)
+
+KEY_FIELDS = ("school_id", "class_id", "term_id", "course_id", "student_id")
+DRAIN_BATCH_SIZE = 5000
+
+# Monotonic time until which a scheduled task is still pending in this process
+_scheduled_until = 0.0
+
+
+def _mark_keys(obj) -> set[tuple]:
+    state = inspect(obj)
+    current = tuple(getattr(obj, field) for field in KEY_FIELDS)
+    # Moving a mark to another student/course also changes the old report
+    previous = tuple(
+        state.attrs[field].history.deleted[0]
+        if state.attrs[field].history.deleted
+        else getattr(obj, field)
+        for field in KEY_FIELDS
+    )
+    return {key for key in (current, previous) if None not in key}
+
+
+def queue_recompute(connection, keys: Iterable[tuple]) -> None:
+    """Record report keys as dirty on `connection` (part of its transaction).
+
+    An already queued key is updated rather than skipped: the row lock makes
+    a drain that is about to claim it wait until this edit commits.
+    """
+    rows = [dict(zip(KEY_FIELDS, key)) for key in set(keys)]
+    if not rows:
+        return
+    stmt = upsert_insert(MarkRecompute.__table__).values(rows)
+    connection.execute(
+        stmt.on_conflict_do_update(index_elements=list(KEY_FIELDS), set_={"queued_at": func.now()})
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_mark_changes(session, flush_context):
+    keys: set[tuple] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (AssignmentMark, ExamMark)):
+            keys |= _mark_keys(obj)
+    if keys:
+        queue_recompute(session.connection(), keys)
+        session.info["marks_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _schedule_after_commit(session):
+    if session.info.pop("marks_dirty", False):
+        schedule_recompute()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_mark_changes(session):
+    session.info.pop("marks_dirty", None)
+
+
+def schedule_recompute() -> None:
+    """Enqueue the recompute task unless one is already due in this process.
+
+    The task runs `mark_recompute_delay` seconds after it is scheduled, so
+    every commit skipped here landed before it starts and is drained by it.
+    """
+    global _scheduled_until
+    now = time.monotonic()
+    if now < _scheduled_until:
+        return
+    from ..tasks.marks import recompute_mark_reports
+
+    try:
+        recompute_mark_reports.apply_async(countdown=settings.mark_recompute_delay)
+    except Exception:
+        # Keys stay queued and are picked up by the next scheduled run
+        logger.exception("Could not schedule mark report recompute")
+        return
+    _scheduled_until = now + settings.mark_recompute_delay
+
+
+async def drain_recomputes(db: AsyncSession, batch_size: int = DRAIN_BATCH_SIZE) -> int:
+    """Recompute every queued report key; returns the number of keys handled.
+
+    Each batch's keys are claimed (deleted) before its marks are read and
+    committed with the recomputed reports, so a crash leaves them queued and
+    an edit committed after the claim queues its key again. Keys locked by
+    an edit still in flight are skipped and drained by the run that edit
+    schedules.
+    """
+    handled = 0
+    while True:
+        claimed = (
+            select(MarkRecompute.id)
+            .order_by(MarkRecompute.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(
+            delete(MarkRecompute)
+            .where(MarkRecompute.id.in_(claimed.scalar_subquery()))
+            .returning(*(getattr(MarkRecompute, f) for f in KEY_FIELDS))
+        )
+        rows = result.all()
+        if not rows:
+            return handled
+
+        scopes: dict[tuple[int, int, int], set[tuple[int, int]]] = {}
+        for row in rows:
+            scope = (row.school_id, row.class_id, row.term_id)
+            scopes.setdefault(scope, set()).add((row.student_id, row.course_id))
+        for (school_id, class_id, term_id), keys in scopes.items():
+            try:
+                await compute_reports(db, school_id, class_id, term_id, keys=sorted(keys))
+            except ValueError:
+                logger.warning("Skipping recompute for missing term %s", term_id)
+
+        await db.commit()
+        handled += len(rows)
+
+
+async def pending_recomputes(db: AsyncSession, school_id: int) -> list:
+    """Queued keys per class and term, with the age of the oldest one."""
+    result = await db.execute(
+        select(
+            MarkRecompute.class_id,
+            MarkRecompute.term_id,
+            func.count().label("pending"),
+            func.min(MarkRecompute.queued_at).label("oldest_queued_at"),
+        )
+        .where(MarkRecompute.school_id == school_id)
+        .group_by(MarkRecompute.class_id, MarkRecompute.term_id)
+        .order_by(MarkRecompute.class_id, MarkRecompute.term_id)
+    )
+    return result.all()
@@ -0,0 +1,268 @@
+"""Set-based computation of term mark reports.
+
+One INSERT ... SELECT builds every `mark_reports` row for a class and term:
+
+- assignment and exam marks are normalised to `weight * score / max_score`
+  and summed per student and course (`assignment_total`, `exam_total`);
+- `total` is their sum and `percentage` is `total` over the summed weights;
+- the grade is the band of the grading scale whose `min_percentage` is the
+  highest one not above the percentage (so rounding gaps between bands such
+  as 79.99/80.00 still resolve);
+- `position`/`total_students` come from RANK()/COUNT() windows partitioned
+  by course.
+
+Rows are upserted on (student_id, course_id, term_id) and reports whose
+marks have all been deleted are removed, so recomputing is idempotent.
+
+Incremental recomputes (see `services/mark_recompute.py`) pass the edited
+(student_id, course_id) keys: only those rows are re-aggregated, then
+positions are re-ranked from the stored percentages of the affected course
+partitions with a single UPDATE.
+"""
+from typing import Sequence
+
+from sqlalchemy import (
+    Float, Integer, Numeric, and_, cast, delete, exists, func, literal, null, or_, select,
+    tuple_, union_all, update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import upsert_insert
+from ..models.calendar import Term
+from ..models.marks import AssignmentMark, ExamMark, GradingBand, GradingScale, MarkReport
+
+REPORT_COLUMNS = (
+    "school_id", "student_id", "course_id", "class_id", "term_id", "academic_year_id",
+    "assignment_total", "exam_total", "total", "percentage", "grade",
+    "position", "total_students", "computed_by",
+)
+
+
+async def default_grading_scale_id(db: AsyncSession, school_id: int) -> int | None:
+    result = await db.execute(
+        select(GradingScale.id)
+        .where(
+            GradingScale.school_id == school_id,
+            GradingScale.is_active == True,
+        )
+        .order_by(GradingScale.is_default.desc(), GradingScale.id)
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+def _scope_filter(model, school_id: int, class_id: int, term_id: int, course_ids=None, keys=None):
+    conditions = [
+        model.school_id == school_id,
+        model.class_id == class_id,
+        model.term_id == term_id,
+    ]
+    if course_ids is not None:
+        conditions.append(model.course_id.in_(course_ids))
+    if keys is not None:
+        conditions.append(tuple_(model.student_id, model.course_id).in_(keys))
+    return conditions
+
+
+def _weighted_marks(model, conditions, is_exam: bool):
+    points = model.weight * cast(model.score, Float) / func.nullif(cast(model.max_score, Float), 0)
+    zero = literal(0.0)
+    assignment = (zero, zero) if is_exam else (points, model.weight)
+    exam = (points, model.weight) if is_exam else (zero, zero)
+    return select(
+        model.student_id,
+        model.course_id,
+        assignment[0].label("assignment_points"),
+        assignment[1].label("assignment_weight"),
+        exam[0].label("exam_points"),
+        exam[1].label("exam_weight"),
+    ).where(*conditions)
+
+
+def _round2(value):
+    # round(double precision, int) does not exist in PostgreSQL
+    return func.round(cast(value, Numeric), 2)
+
+
+def report_select(
+    school_id: int,
+    class_id: int,
+    term_id: int,
+    academic_year_id: int,
+    grading_scale_id: int | None,
+    computed_by: int | None = None,
+    course_ids: Sequence[int] | None = None,
+    keys: Sequence[tuple[int, int]] | None = None,
+):
+    """SELECT producing one `mark_reports` row per student and course.
+
+    Positions are only meaningful when whole course partitions are selected,
+    i.e. when `keys` is not given.
+    """
+    marks = union_all(
+        _weighted_marks(
+            AssignmentMark,
+            _scope_filter(AssignmentMark, school_id, class_id, term_id, course_ids, keys),
+            is_exam=False,
+        ),
+        _weighted_marks(
+            ExamMark,
+            _scope_filter(ExamMark, school_id, class_id, term_id, course_ids, keys),
+            is_exam=True,
+        ),
+    ).subquery("marks")
+
+    assignment_total = func.coalesce(func.sum(marks.c.assignment_points), 0.0)
+    exam_total = func.coalesce(func.sum(marks.c.exam_points), 0.0)
+    weights = func.sum(marks.c.assignment_weight) + func.sum(marks.c.exam_weight)
+    totals = (
+        select(
+            marks.c.student_id,
+            marks.c.course_id,
+            assignment_total.label("assignment_total"),
+            exam_total.label("exam_total"),
+            (assignment_total + exam_total).label("total"),
+            # Rounded before ranking, as stored, so rank_positions ranks the same values
+            _round2(func.coalesce(
+                100.0 * (assignment_total + exam_total) / func.nullif(weights, 0), 0.0
+            )).label("percentage"),
+        )
+        .group_by(marks.c.student_id, marks.c.course_id)
+        .subquery("totals")
+    )
+
+    ranked = select(
+        totals,
+        func.rank()
+        .over(partition_by=totals.c.course_id, order_by=totals.c.percentage.desc())
+        .label("position"),
+        func.count().over(partition_by=totals.c.course_id).label("total_students"),
+    ).subquery("ranked")
+
+    if grading_scale_id is None:
+        grade = null()
+    else:
+        grade = (
+            select(GradingBand.grade)
+            .where(
+                GradingBand.grading_scale_id == grading_scale_id,
+                GradingBand.min_percentage <= ranked.c.percentage,
+            )
+            .order_by(GradingBand.min_percentage.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+
+    return select(
+        literal(school_id, Integer).label("school_id"),
+        ranked.c.student_id,
+        ranked.c.course_id,
+        literal(class_id, Integer).label("class_id"),
+        literal(term_id, Integer).label("term_id"),
+        literal(academic_year_id, Integer).label("academic_year_id"),
+        _round2(ranked.c.assignment_total).label("assignment_total"),
+        _round2(ranked.c.exam_total).label("exam_total"),
+        _round2(ranked.c.total).label("total"),
+        ranked.c.percentage,
+        grade.label("grade"),
+        ranked.c.position,
+        ranked.c.total_students,
+        literal(computed_by, Integer).label("computed_by"),
+    # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+    ).where(ranked.c.student_id.isnot(None))
+
+
+async def compute_reports(
+    db: AsyncSession,
+    school_id: int,
+    class_id: int,
+    term_id: int,
+    *,
+    grading_scale_id: int | None = None,
+    computed_by: int | None = None,
+    course_ids: Sequence[int] | None = None,
+    keys: Sequence[tuple[int, int]] | None = None,
+) -> int:
+    """Recompute the reports of a class and term.
+
+    Narrow with `course_ids` (complete course partitions) or with `keys`:
+    (student_id, course_id) pairs whose marks changed; with `keys` the
+    positions of every affected course are re-ranked afterwards. Returns the
+    number of reports written; the caller commits.
+    """
+    result = await db.execute(
+        select(Term.academic_year_id).where(Term.id == term_id, Term.school_id == school_id)
+    )
+    academic_year_id = result.scalar_one_or_none()
+    if academic_year_id is None:
+        raise ValueError("Term not found")
+    if grading_scale_id is None:
+        grading_scale_id = await default_grading_scale_id(db, school_id)
+
+    source = report_select(
+        school_id, class_id, term_id, academic_year_id,
+        grading_scale_id, computed_by, course_ids, keys,
+    )
+    stmt = upsert_insert(MarkReport.__table__).from_select(REPORT_COLUMNS, source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["student_id", "course_id", "term_id"],
+        set_={
+            column: stmt.excluded[column]
+            for column in REPORT_COLUMNS
+            if column not in ("school_id", "student_id", "course_id", "term_id")
+        } | {"computed_at": func.now(), "updated_at": func.now()},
+    )
+    result = await db.execute(stmt)
+
+    await db.execute(_stale_reports(school_id, class_id, term_id, course_ids, keys))
+    if keys is not None:
+        await rank_positions(db, school_id, class_id, term_id, {course_id for _, course_id in keys})
+    return result.rowcount
+
+
+async def rank_positions(
+    db: AsyncSession,
+    school_id: int,
+    class_id: int,
+    term_id: int,
+    course_ids: Sequence[int] | set[int],
+) -> None:
+    """Re-rank stored reports within the given course partitions."""
+    if not course_ids:
+        return
+    ranked = (
+        select(
+            MarkReport.id,
+            func.rank()
+            .over(partition_by=MarkReport.course_id, order_by=MarkReport.percentage.desc())
+            .label("position"),
+            func.count().over(partition_by=MarkReport.course_id).label("total_students"),
+        )
+        .where(*_scope_filter(MarkReport, school_id, class_id, term_id, list(course_ids)))
+        .subquery("ranked")
+    )
+    await db.execute(
+        update(MarkReport)
+        .where(MarkReport.id == ranked.c.id)
+        .values(position=ranked.c.position, total_students=ranked.c.total_students)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _stale_reports(school_id: int, class_id: int, term_id: int, course_ids, keys):
+    """DELETE reports left without any assignment or exam mark."""
+
+    def has_marks(model):
+        return exists().where(
+            model.school_id == MarkReport.school_id,
+            model.class_id == MarkReport.class_id,
+            model.term_id == MarkReport.term_id,
+            model.student_id == MarkReport.student_id,
+            model.course_id == MarkReport.course_id,
+        )
+
+    conditions = [
+        *_scope_filter(MarkReport, school_id, class_id, term_id, course_ids, keys),
+        ~or_(has_marks(AssignmentMark), has_marks(ExamMark)),
+    ]
+    return delete(MarkReport).where(and_(*conditions))
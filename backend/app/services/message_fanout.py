@@ -0,0 +1,272 @@
+"""Fan-out of messages to their recipients.
+
+A message's `recipient_filter` holds its targets as JSON:
+`{"targets": [{"type": "class", "ids": [12]}, {"type": "all_staff"}]}`.
+Fan-out turns all targets into `message_recipients` rows with one
+`INSERT ... SELECT`: every target becomes a SELECT producing (type, id,
+email, phone, name); they are combined with UNION ALL and numbered per
+contact (normalized phone for SMS, lower-cased email for email, the
+person otherwise) so each contact is inserted once, and contacts the
+message already has are skipped. Nothing is loaded into Python, so a
+broadcast to every parent costs the same two statements as a single
+recipient, and re-running a fan-out only adds people who became targets
+since.
+
+Students have no contact details of their own: student, class and
+all_students targets reach the students' parents.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import String, cast, exists, func, insert, literal, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ..db.bulk import id_in
+from ..models.academics import Enrollment
+from ..models.calendar import AcademicYear
+from ..models.message import Message, MessageChannel, MessageRecipient, MessageStatus, RecipientType
+from ..models.school import Parent, ParentStudent, Staff, Student
+from ..models.user import User, user_roles
+from ..schemas.messages import FanOutOut, MessageIn, MessageOut, RecipientTarget
+
+RECIPIENT_COLUMNS = (
+    "school_id", "message_id", "recipient_type", "recipient_id",
+    "recipient_email", "recipient_phone", "recipient_name", "status",
+)
+
+
+def _recipient_type(kind: RecipientType):
+    return literal(kind, MessageRecipient.__table__.c.recipient_type.type).label("recipient_type")
+
+
+def _name(first, last):
+    return (first + " " + last).label("recipient_name")
+
+
+def _parents(school_id: int, students=None):
+    stmt = select(
+        _recipient_type(RecipientType.PARENT),
+        Parent.id.label("recipient_id"),
+        Parent.email.label("recipient_email"),
+        Parent.phone.label("recipient_phone"),
+        _name(Parent.first_name, Parent.last_name),
+    ).where(Parent.school_id == school_id)
+    if students is not None:
+        stmt = stmt.where(
+            Parent.id.in_(
+                select(ParentStudent.parent_id).where(
+                    ParentStudent.school_id == school_id, ParentStudent.student_id.in_(students)
+                )
+            )
+        )
+    return stmt
+
+
+def _staff(school_id: int, ids: list[int] | None = None):
+    stmt = select(
+        _recipient_type(RecipientType.STAFF),
+        Staff.id.label("recipient_id"),
+        Staff.email.label("recipient_email"),
+        Staff.phone.label("recipient_phone"),
+        _name(Staff.first_name, Staff.last_name),
+    ).where(Staff.school_id == school_id, Staff.status == "active")
+    return stmt.where(id_in(Staff.id, ids)) if ids is not None else stmt
+
+
+def _users(school_id: int, ids=None):
+    stmt = (
+        select(
+            _recipient_type(RecipientType.USER),
+            User.id.label("recipient_id"),
+            User.email.label("recipient_email"),
+            User.phone.label("recipient_phone"),
+            func.coalesce(Staff.first_name + " " + Staff.last_name, User.email).label("recipient_name"),
+        )
+        .outerjoin(Staff, Staff.id == User.staff_id)
+        .where(User.school_id == school_id, User.is_active == True)
+    )
+    return stmt.where(User.id.in_(ids)) if ids is not None else stmt
+
+
+def target_select(school_id: int, target: RecipientTarget):
+    """SELECT of the (type, id, email, phone, name) reached by one target."""
+    kind, ids = target.type, target.ids
+    if kind == RecipientType.PARENT:
+        return _parents(school_id).where(id_in(Parent.id, ids))
+    if kind == RecipientType.ALL_PARENTS:
+        return _parents(school_id)
+    if kind == RecipientType.STUDENT:
+        return _parents(school_id, ids)
+    if kind == RecipientType.ALL_STUDENTS:
+        return _parents(
+            school_id, select(Student.id).where(Student.school_id == school_id, Student.status == "active")
+        )
+    if kind == RecipientType.CLASS:
+        if target.academic_year_id is not None:
+            year = Enrollment.academic_year_id == target.academic_year_id
+        else:
+            year = Enrollment.academic_year_id.in_(
+                select(AcademicYear.id).where(AcademicYear.school_id == school_id, AcademicYear.is_current == True)
+            )
+        return _parents(
+            school_id,
+            select(Enrollment.student_id).where(
+                Enrollment.school_id == school_id,
+                id_in(Enrollment.class_id, ids),
+                Enrollment.status == "active",
+                year,
+            ),
+        )
+    if kind == RecipientType.STAFF:
+        return _staff(school_id, ids)
+    if kind == RecipientType.ALL_STAFF:
+        return _staff(school_id)
+    if kind == RecipientType.USER:
+        return _users(school_id, ids)
+    if kind == RecipientType.ROLE:
+        return _users(
+            school_id,
+            select(user_roles.c.user_id).where(
+                user_roles.c.school_id == school_id, user_roles.c.role_id.in_(ids)
+            ),
+        )
+    raise ValueError(f"Unsupported recipient type '{kind.value}'")
+
+
+def contact_key(channel: MessageChannel, recipient_type, recipient_id, email, phone):
+    """SQL expression identifying a recipient for deduplication on `channel`."""
+    if channel == MessageChannel.SMS:
+        normalized = func.trim(phone)
+        for separator in (" ", "-", ".", "(", ")"):
+            normalized = func.replace(normalized, separator, "")
+        return normalized
+    if channel == MessageChannel.EMAIL:
+        return func.lower(func.trim(email))
+    return cast(recipient_type, String) + ":" + cast(recipient_id, String)
+
+
+def parse_targets(recipient_filter: str | None) -> list[RecipientTarget]:
+    data: dict[str, Any] = json.loads(recipient_filter) if recipient_filter else {}
+    return [RecipientTarget(**target) for target in data.get("targets", [])]
+
+
+async def fan_out(db: AsyncSession, school_id: int, message_id: int) -> FanOutOut:
+    """Add the message's missing recipients and refresh `total_recipients`; the caller commits."""
+    result = await db.execute(
+        select(Message.channel, Message.recipient_filter).where(
+            Message.id == message_id, Message.school_id == school_id
+        )
+    )
+    message = result.one_or_none()
+    if message is None:
+        raise LookupError("Message not found")
+    targets = parse_targets(message.recipient_filter)
+    if not targets:
+        raise ValueError("Message has no recipient targets")
+
+    selects = [target_select(school_id, target) for target in targets]
+    candidates = (union_all(*selects) if len(selects) > 1 else selects[0]).subquery("candidates")
+    c = candidates.c
+    contact = contact_key(message.channel, c.recipient_type, c.recipient_id, c.recipient_email, c.recipient_phone)
+    ranked = select(
+        c.recipient_type,
+        c.recipient_id,
+        c.recipient_email,
+        c.recipient_phone,
+        c.recipient_name,
+        contact.label("contact"),
+        func.row_number().over(partition_by=contact, order_by=(c.recipient_type, c.recipient_id)).label("rank"),
+    ).subquery("ranked")
+
+    known = aliased(MessageRecipient)
+    already = exists().where(
+        known.message_id == message_id,
+        contact_key(
+            message.channel, known.recipient_type, known.recipient_id, known.recipient_email, known.recipient_phone
+        ) == ranked.c.contact,
+    )
+    result = await db.execute(
+        insert(MessageRecipient).from_select(
+            RECIPIENT_COLUMNS,
+            select(
+                literal(school_id),
+                literal(message_id),
+                ranked.c.recipient_type,
+                ranked.c.recipient_id,
+                ranked.c.recipient_email,
+                ranked.c.recipient_phone,
+                ranked.c.recipient_name,
+                literal(MessageStatus.SCHEDULED, MessageRecipient.__table__.c.status.type),
+            ).where(
+                ranked.c.rank == 1,
+                ranked.c.contact.isnot(None),
+                ranked.c.contact != "",
+                ~already,
+            ),
+        )
+    )
+    added = result.rowcount
+
+    result = await db.execute(
+        update(Message)
+        .where(Message.id == message_id)
+        .values(
+            total_recipients=select(func.count())
+            .where(MessageRecipient.message_id == message_id)
+            .scalar_subquery()
+        )
+        .returning(Message.total_recipients)
+        .execution_options(synchronize_session=False)
+    )
+    return FanOutOut(message_id=message_id, added=added, total_recipients=result.scalar_one())
+
+
+async def create_message(
+    db: AsyncSession,
+    school_id: int,
+    sender_id: int,
+    data: MessageIn,
+    *,
+    recipient_filter: dict[str, Any] | None = None,
+) -> MessageOut:
+    """Store a message for `data.targets`, scheduled for delivery, and fan it out; the caller commits.
+
+    `recipient_filter` adds extra keys to the stored filter (e.g. what the
+    message is about).
+    """
+    if not data.targets:
+        raise ValueError("At least one recipient target is required")
+    scheduled_at = data.scheduled_at or datetime.now(timezone.utc)
+    result = await db.execute(
+        insert(Message)
+        .values(
+            school_id=school_id,
+            subject=data.subject,
+            body=data.body,
+            channel=data.channel,
+            sender_id=sender_id,
+            recipient_scope="individual" if len(data.targets) == 1 and data.targets[0].ids else "group",
+            recipient_filter=json.dumps({
+                **(recipient_filter or {}),
+                "targets": [target.model_dump(mode="json", exclude_none=True) for target in data.targets],
+            }),
+            scheduled_at=scheduled_at,
+            send_immediately=data.scheduled_at is None,
+            status=MessageStatus.SCHEDULED,
+            message_type=data.message_type,
+            priority=data.priority,
+        )
+        .returning(Message.id)
+    )
+    message_id = result.scalar_one()
+    fanned = await fan_out(db, school_id, message_id)
+    return MessageOut(
+        id=message_id,
+        channel=data.channel,
+        subject=data.subject,
+        status=MessageStatus.SCHEDULED,
+        total_recipients=fanned.total_recipients,
+        scheduled_at=scheduled_at,
+    )
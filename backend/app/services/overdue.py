@@ -0,0 +1,196 @@
+"""Marks invoices and payment plan installments overdue.
+
+Runs per school from a beat task. Each run only looks at pending rows due
+between the school's checkpoint (`overdue_sweeps.swept_through`, the day of
+the previous run) and today, found through the (school_id, status,
+due_date) indexes, then moves the checkpoint to today. Rows are taken in
+batches of `overdue_sweep_batch` and flipped with one
+`UPDATE ... WHERE id = ANY(:ids) AND status = 'pending'` per batch, each
+batch in its own transaction. A crashed run is simply repeated: rows
+already marked are no longer pending and are not picked up again.
+
+An invoice becoming overdue is charged its fee structure's
+`late_fee_amount` once (as an extra invoice item, reflected in the finance
+rollups), and a fee reminder to the student's parents is queued as a
+scheduled SMS message.
+
+Rows created with a due date before the checkpoint are not revisited;
+deleting a school's `overdue_sweeps` row makes the next run rescan it.
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Any, Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..db.bulk import bulk_insert, id_in, upsert_insert
+from ..models.finance import FeeStructure, Invoice, InvoiceItem, OverdueSweep, PaymentInstallment
+from ..models.message import MessageChannel, RecipientType
+from ..schemas.messages import MessageIn, RecipientTarget
+from .finance_rollups import record_charges
+from .message_fanout import create_message
+
+LATE_FEE_DESCRIPTION = "Late payment fee"
+REMINDER_SUBJECT = "School fees overdue"
+REMINDER_BODY = (
+    "Dear parent, a school fees invoice for your child is past its due date. "
+    "Please pay the outstanding balance as soon as possible."
+)
+
+
+async def _due_ids(db: AsyncSession, model, school_id: int, since: date | None, today: date, limit: int) -> list[int]:
+    stmt = select(model.id).where(
+        model.school_id == school_id,
+        model.status == "pending",
+        model.due_date < today,
+    )
+    if since is not None:
+        stmt = stmt.where(model.due_date >= since)
+    result = await db.execute(stmt.order_by(model.due_date, model.id).limit(limit))
+    return list(result.scalars())
+
+
+async def _mark_invoices(db: AsyncSession, school_id: int, ids: Sequence[int]):
+    late_fee = func.coalesce(
+        select(FeeStructure.late_fee_amount)
+        .where(FeeStructure.id == Invoice.fee_structure_id)
+        .scalar_subquery(),
+        0,
+    )
+    result = await db.execute(
+        update(Invoice)
+        .where(id_in(Invoice.id, ids), Invoice.school_id == school_id, Invoice.status == "pending")
+        .values(
+            status="overdue",
+            subtotal=Invoice.subtotal + late_fee,
+            total_amount=Invoice.total_amount + late_fee,
+            balance=Invoice.balance + late_fee,
+        )
+        .returning(Invoice.id, Invoice.student_id, Invoice.created_by, late_fee.label("late_fee"))
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
+
+
+async def _mark_installments(db: AsyncSession, school_id: int, ids: Sequence[int]) -> int:
+    result = await db.execute(
+        update(PaymentInstallment)
+        .where(
+            id_in(PaymentInstallment.id, ids),
+            PaymentInstallment.school_id == school_id,
+            PaymentInstallment.status == "pending",
+        )
+        .values(status="overdue")
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def queue_reminders(db: AsyncSession, school_id: int, invoices: Sequence[Any]) -> int:
+    """Queue an SMS reminder to the parents of the students of newly overdue invoices.
+
+    One message per invoice issuer (its sender), fanned out to the
+    students' parents; each parent phone gets it once however many of
+    their children are overdue. Returns the number of recipients queued.
+    """
+    by_sender: dict[int, list] = {}
+    for invoice in invoices:
+        by_sender.setdefault(invoice.created_by, []).append(invoice)
+
+    queued = 0
+    for sender_id, sent in by_sender.items():
+        message = await create_message(
+            db,
+            school_id,
+            sender_id,
+            MessageIn(
+                channel=MessageChannel.SMS,
+                subject=REMINDER_SUBJECT,
+                body=REMINDER_BODY,
+                targets=[RecipientTarget(type=RecipientType.STUDENT, ids=sorted({i.student_id for i in sent}))],
+                message_type="fee_reminder",
+            ),
+            recipient_filter={"invoice_ids": [i.id for i in sent]},
+        )
+        queued += message.total_recipients
+    return queued
+
+
+async def sweep_overdue(
+    db: AsyncSession,
+    school_id: int,
+    *,
+    today: date | None = None,
+    batch_size: int | None = None,
+) -> dict[str, Any]:
+    """Mark the school's newly overdue invoices and installments; commits per batch."""
+    today = today or date.today()
+    batch_size = batch_size or settings.overdue_sweep_batch
+    result = await db.execute(
+        select(OverdueSweep.swept_through).where(OverdueSweep.school_id == school_id)
+    )
+    since = result.scalar_one_or_none()
+    if since is not None and since >= today:
+        return {"invoices": 0, "installments": 0, "late_fees": Decimal("0"), "reminders": 0}
+
+    invoices = reminders = 0
+    late_fees = Decimal("0")
+    while True:
+        ids = await _due_ids(db, Invoice, school_id, since, today, batch_size)
+        if not ids:
+            break
+        marked = await _mark_invoices(db, school_id, ids)
+        charged = [(row.id, row.late_fee) for row in marked if row.late_fee > 0]
+        if charged:
+            await bulk_insert(db, InvoiceItem.__table__, [
+                {
+                    "school_id": school_id,
+                    "invoice_id": invoice_id,
+                    "fee_item_id": None,
+                    "description": LATE_FEE_DESCRIPTION,
+                    "quantity": 1,
+                    "unit_price": fee,
+                    "total_price": fee,
+                }
+                for invoice_id, fee in charged
+            ])
+            await record_charges(db, school_id, charged)
+        if marked:
+            reminders += await queue_reminders(db, school_id, marked)
+        await db.commit()
+        invoices += len(marked)
+        late_fees += sum((fee for _, fee in charged), Decimal("0"))
+        if len(ids) < batch_size:
+            break
+
+    installments = 0
+    while True:
+        ids = await _due_ids(db, PaymentInstallment, school_id, since, today, batch_size)
+        if not ids:
+            break
+        installments += await _mark_installments(db, school_id, ids)
+        await db.commit()
+        if len(ids) < batch_size:
+            break
+
+    stmt = upsert_insert(OverdueSweep.__table__).values(
+        school_id=school_id,
+        swept_through=today,
+        invoices_marked=invoices,
+        installments_marked=installments,
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["school_id"],
+            set_={
+                "swept_through": stmt.excluded.swept_through,
+                "invoices_marked": stmt.excluded.invoices_marked,
+                "installments_marked": stmt.excluded.installments_marked,
+                "updated_at": func.now(),
+            },
+        )
+    )
+    await db.commit()
+    return {"invoices": invoices, "installments": installments, "late_fees": late_fees, "reminders": reminders}
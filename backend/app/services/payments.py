@@ -0,0 +1,357 @@
+"""Payment posting and statement reconciliation.
+
+Balances are never read, changed in Python and written back. A payment is
+applied with one `UPDATE invoices ... SET paid_amount = paid_amount + :x
+... RETURNING`, guarded so it cannot overpay or touch a cancelled invoice;
+the row lock it takes serializes concurrent cashiers on the same invoice
+until commit. The amount is then spread over the invoice's active payment
+plan installments in due-date order by a single UPDATE driven by a running
+total window, and the `Payment` row is inserted.
+
+Reconciliation reads a bank/mobile-money statement (CSV/XLSX), loads the
+school's outstanding invoices once into a dict keyed by normalized
+invoice number, and matches every line in a single pass, tracking the
+remaining balance of each invoice in memory. Matched amounts are posted
+per invoice and the payments bulk-inserted. Both paths add the payments to
+the finance rollups in the same transaction.
+"""
+import re
+import uuid
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import IO, Any, Iterable
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import bulk_insert, id_in
+from ..models.finance import Invoice, Payment, PaymentInstallment, PaymentPlan
+from ..schemas.finance import PaymentOut, ReconciliationLine, ReconciliationReport
+from .finance_rollups import record_payments
+from .invoicing import format_invoice_number
+from .student_import import iter_upload_rows
+
+OPEN_STATUSES = ("pending", "overdue")
+INVOICE_NUMBER_RE = re.compile(r"INV\W?(\d+)\W(\d+)", re.IGNORECASE)
+# Transaction ids looked up per query when de-duplicating a statement
+TRANSACTION_LOOKUP_CHUNK = 1000
+
+
+def new_payment_reference(school_id: int) -> str:
+    return f"PAY-{school_id}-{uuid.uuid4().hex[:16].upper()}"
+
+
+async def apply_to_invoice(
+    db: AsyncSession, school_id: int, invoice_id: int, amount: Decimal
+):
+    """Add `amount` to an open invoice and its installments.
+
+    Returns the updated (id, student_id, paid_amount, balance, status) row,
+    or None if the invoice is not open or `amount` exceeds its balance.
+    """
+    new_balance = Invoice.balance - amount
+    result = await db.execute(
+        update(Invoice)
+        .where(
+            Invoice.id == invoice_id,
+            Invoice.school_id == school_id,
+            Invoice.status.in_(OPEN_STATUSES),
+            Invoice.balance >= amount,
+        )
+        .values(
+            paid_amount=Invoice.paid_amount + amount,
+            balance=new_balance,
+            status=case((new_balance <= 0, "paid"), else_=Invoice.status),
+        )
+        .returning(Invoice.id, Invoice.student_id, Invoice.paid_amount, Invoice.balance, Invoice.status)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.one_or_none()
+    if row is not None:
+        await _allocate_installments(db, school_id, invoice_id, amount)
+    return row
+
+
+async def _allocate_installments(
+    db: AsyncSession, school_id: int, invoice_id: int, amount: Decimal
+) -> None:
+    remaining = PaymentInstallment.amount - PaymentInstallment.paid_amount
+    due = (
+        select(
+            PaymentInstallment.id,
+            remaining.label("remaining"),
+            # Outstanding on earlier installments
+            (
+                func.sum(remaining).over(
+                    order_by=(PaymentInstallment.due_date, PaymentInstallment.installment_number)
+                )
+                - remaining
+            ).label("before"),
+        )
+        .join(PaymentPlan, PaymentPlan.id == PaymentInstallment.payment_plan_id)
+        .where(
+            PaymentPlan.invoice_id == invoice_id,
+            PaymentPlan.school_id == school_id,
+            PaymentPlan.status == "active",
+            PaymentInstallment.paid_amount < PaymentInstallment.amount,
+        )
+        .subquery("due")
+    )
+    left = amount - due.c.before
+    allocation = case(
+        (left >= due.c.remaining, due.c.remaining),
+        else_=left,
+    )
+    await db.execute(
+        update(PaymentInstallment)
+        .where(PaymentInstallment.id == due.c.id, left > 0)
+        .values(
+            paid_amount=PaymentInstallment.paid_amount + allocation,
+            status=case(
+                (PaymentInstallment.paid_amount + allocation >= PaymentInstallment.amount, "paid"),
+                else_=PaymentInstallment.status,
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _reject_reason(db: AsyncSession, school_id: int, invoice_id: int, amount: Decimal) -> Exception:
+    result = await db.execute(
+        select(Invoice.status, Invoice.balance).where(
+            Invoice.id == invoice_id, Invoice.school_id == school_id
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        return LookupError("Invoice not found")
+    if row.status not in OPEN_STATUSES:
+        return ValueError(f"Invoice is {row.status}")
+    return ValueError(f"Payment of {amount} exceeds the invoice balance of {row.balance}")
+
+
+async def post_payment(
+    db: AsyncSession,
+    school_id: int,
+    invoice_id: int,
+    amount: Decimal,
+    received_by: int,
+    *,
+    payment_method: str,
+    payment_date: date | None = None,
+    transaction_id: str | None = None,
+    reference_number: str | None = None,
+    notes: str | None = None,
+) -> PaymentOut:
+    """Record one payment; the caller commits.
+
+    Raises LookupError if the invoice does not exist and ValueError if it is
+    not open or the amount is invalid or larger than its balance.
+    """
+    if amount <= 0:
+        raise ValueError("Payment amount must be positive")
+    invoice = await apply_to_invoice(db, school_id, invoice_id, amount)
+    if invoice is None:
+        raise await _reject_reason(db, school_id, invoice_id, amount)
+
+    payment_date = payment_date or date.today()
+    reference = new_payment_reference(school_id)
+    result = await db.execute(
+        insert(Payment)
+        .values(
+            school_id=school_id,
+            payment_reference=reference,
+            invoice_id=invoice_id,
+            student_id=invoice.student_id,
+            amount=amount,
+            payment_method=payment_method,
+            payment_date=payment_date,
+            transaction_id=transaction_id,
+            reference_number=reference_number,
+            status="completed",
+            notes=notes,
+            received_by=received_by,
+        )
+        .returning(Payment.id)
+    )
+    payment_id = result.scalar_one()
+    await record_payments(
+        db, school_id, [(invoice_id, amount, payment_date)],
+        settled=[invoice_id] if invoice.status == "paid" else [],
+    )
+    return PaymentOut(
+        id=payment_id,
+        payment_reference=reference,
+        invoice_id=invoice_id,
+        amount=amount,
+        invoice_paid_amount=invoice.paid_amount,
+        invoice_balance=invoice.balance,
+        invoice_status=invoice.status,
+    )
+
+
+def normalize_reference(value: str | None) -> str | None:
+    """Canonical invoice number found in a statement reference/narration."""
+    if not value:
+        return None
+    match = INVOICE_NUMBER_RE.search(value)
+    if match is None:
+        return None
+    return format_invoice_number(int(match.group(1)), int(match.group(2)))
+
+
+def _cell(row: dict[str, Any], *keys: str) -> str | None:
+    for key in keys:
+        value = row.get(key)
+        if value is None:
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        value = str(value).strip()
+        if value:
+            return value
+    return None
+
+
+def _line_date(row: dict[str, Any]) -> date | None:
+    value = row.get("date") or row.get("payment_date")
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    raw = _cell(row, "date", "payment_date")
+    return date.fromisoformat(raw[:10]) if raw else None
+
+
+async def reconcile_statement(
+    db: AsyncSession,
+    school_id: int,
+    received_by: int,
+    rows: Iterable[dict[str, Any]],
+    *,
+    payment_method: str,
+    dry_run: bool = False,
+) -> ReconciliationReport:
+    """Match statement lines to invoices by reference and post the matches.
+
+    Lines need `reference` (or `description`) and `amount`; `date` and
+    `transaction_id` are optional. Lines whose transaction id was already
+    posted are reported as duplicates, so a statement can be re-imported.
+    """
+    result = await db.execute(
+        select(Invoice.id, Invoice.invoice_number, Invoice.student_id, Invoice.balance).where(
+            Invoice.school_id == school_id, Invoice.status.in_(OPEN_STATUSES)
+        )
+    )
+    # Hash index: invoice number -> [id, student id, balance left]
+    open_invoices = {
+        number: [invoice_id, student_id, balance]
+        for invoice_id, number, student_id, balance in result
+    }
+    # Only this statement's transaction ids, so the lookup grows with the
+    # statement rather than with the school's payment history
+    rows = list(rows)
+    statement_transactions = sorted({
+        txn for txn in (_cell(row, "transaction_id", "transaction", "txn_id") for row in rows) if txn is not None
+    })
+    seen_transactions = set()
+    for start in range(0, len(statement_transactions), TRANSACTION_LOOKUP_CHUNK):
+        result = await db.execute(
+            select(Payment.transaction_id).where(
+                Payment.school_id == school_id,
+                id_in(Payment.transaction_id, statement_transactions[start:start + TRANSACTION_LOOKUP_CHUNK]),
+            )
+        )
+        seen_transactions.update(result.scalars())
+
+    report = ReconciliationReport(dry_run=dry_run)
+    per_invoice: dict[int, Decimal] = {}
+    payments: list[dict[str, Any]] = []
+    for line_no, row in enumerate(rows, start=2):
+        report.total_lines += 1
+        reference = _cell(row, "reference", "ref")
+        line = ReconciliationLine(row=line_no, reference=reference, status="unmatched")
+        report.lines.append(line)
+        try:
+            amount = Decimal((_cell(row, "amount", "credit") or "").replace(",", ""))
+            paid_on = _line_date(row) or date.today()
+        except (InvalidOperation, ValueError):
+            line.status, line.error = "invalid", "amount or date could not be read"
+            continue
+        line.amount = amount
+        if amount <= 0:
+            line.status, line.error = "invalid", "amount must be positive"
+            continue
+
+        transaction_id = _cell(row, "transaction_id", "transaction", "txn_id")
+        if transaction_id is not None:
+            if transaction_id in seen_transactions:
+                line.status = "duplicate"
+                continue
+            seen_transactions.add(transaction_id)
+
+        number = normalize_reference(reference) or normalize_reference(_cell(row, "description", "narration"))
+        invoice = open_invoices.get(number) if number else None
+        if invoice is None:
+            report.unmatched += 1
+            continue
+        line.invoice_id, line.invoice_number = invoice[0], number
+        if amount > invoice[2]:
+            line.status, line.error = "overpayment", f"balance is {invoice[2]}"
+            continue
+
+        invoice[2] -= amount
+        per_invoice[invoice[0]] = per_invoice.get(invoice[0], Decimal("0")) + amount
+        line.status = "matched"
+        report.matched += 1
+        report.matched_amount += amount
+        payments.append({
+            "school_id": school_id,
+            "payment_reference": new_payment_reference(school_id),
+            "invoice_id": invoice[0],
+            "student_id": invoice[1],
+            "amount": amount,
+            "payment_method": payment_method,
+            "payment_date": paid_on,
+            "transaction_id": transaction_id,
+            "reference_number": reference,
+            "status": "completed",
+            "notes": f"Statement line {line_no}",
+            "received_by": received_by,
+        })
+
+    if dry_run or not payments:
+        return report
+
+    settled = []
+    for invoice_id, amount in per_invoice.items():
+        invoice = await apply_to_invoice(db, school_id, invoice_id, amount)
+        if invoice is None:
+            # Changed since it was loaded (e.g. paid at a cashier): post nothing
+            await db.rollback()
+            raise ValueError(f"Invoice {invoice_id} changed during reconciliation; retry the import")
+        if invoice.status == "paid":
+            settled.append(invoice_id)
+    await bulk_insert(db, Payment.__table__, payments)
+    await record_payments(
+        db, school_id, [(p["invoice_id"], p["amount"], p["payment_date"]) for p in payments], settled
+    )
+    await db.commit()
+    report.posted = len(payments)
+    return report
+
+
+async def reconcile_upload(
+    db: AsyncSession,
+    school_id: int,
+    received_by: int,
+    file: IO[bytes],
+    filename: str | None,
+    *,
+    payment_method: str,
+    dry_run: bool = False,
+) -> ReconciliationReport:
+    return await reconcile_statement(
+        db, school_id, received_by, iter_upload_rows(file, filename),
+        payment_method=payment_method, dry_run=dry_run,
+    )
@@ -0,0 +1,140 @@
+"""Low and over stock alerts.
+
+`stock_alerts` holds one row per (inventory, item) whose available stock is
+at or below the item's `reorder_level` ("low") or whose stock is above its
+`max_stock_level` ("over"), so `/inventory/alerts` reads a small table of
+current problems instead of comparing every stock row with its item. The
+stock ledger refreshes the alerts of every level it changes in the same
+transaction; `rebuild_alerts`, run by the daily snapshot job, picks up
+changed reorder/max levels.
+"""
+from typing import Sequence
+
+from sqlalchemy import and_, case, delete, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import upsert_insert
+from ..models.inventory import InventoryItem, Item, StockAlert
+from ..schemas.inventory import StockLevelOut
+
+ALERT_COLUMNS = ("school_id", "inventory_id", "item_id", "kind", "current_stock", "available_stock", "threshold")
+
+
+def alert_kind(
+    current_stock: int, available_stock: int, reorder_level: int | None, max_stock_level: int | None
+) -> tuple[str, int] | None:
+    """("low" | "over", threshold) for a stock level, or None if it is fine."""
+    if reorder_level is not None and available_stock <= reorder_level:
+        return "low", reorder_level
+    if max_stock_level is not None and current_stock > max_stock_level:
+        return "over", max_stock_level
+    return None
+
+
+def _upsert(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=["inventory_id", "item_id"],
+        set_={
+            "kind": stmt.excluded.kind,
+            "current_stock": stmt.excluded.current_stock,
+            "available_stock": stmt.excluded.available_stock,
+            "threshold": stmt.excluded.threshold,
+            "updated_at": func.now(),
+        },
+    )
+
+
+async def refresh_alerts(db: AsyncSession, school_id: int, levels: Sequence[StockLevelOut]) -> None:
+    """Bring the alerts of changed stock levels up to date; the caller commits."""
+    if not levels:
+        return
+    result = await db.execute(
+        select(Item.id, Item.reorder_level, Item.max_stock_level).where(
+            Item.school_id == school_id, Item.id.in_({level.item_id for level in levels})
+        )
+    )
+    limits = {item_id: (reorder, maximum) for item_id, reorder, maximum in result}
+
+    alerts, cleared = [], []
+    for level in sorted(levels, key=lambda l: (l.inventory_id, l.item_id)):
+        found = alert_kind(level.current_stock, level.available_stock, *limits.get(level.item_id, (None, None)))
+        if found is None:
+            cleared.append((level.inventory_id, level.item_id))
+            continue
+        alerts.append({
+            "school_id": school_id,
+            "inventory_id": level.inventory_id,
+            "item_id": level.item_id,
+            "kind": found[0],
+            "current_stock": level.current_stock,
+            "available_stock": level.available_stock,
+            "threshold": found[1],
+        })
+    if cleared:
+        await db.execute(
+            delete(StockAlert).where(
+                StockAlert.school_id == school_id,
+                tuple_(StockAlert.inventory_id, StockAlert.item_id).in_(cleared),
+            )
+        )
+    if alerts:
+        await db.execute(_upsert(upsert_insert(StockAlert.__table__).values(alerts)))
+
+
+def _alerting(school_id: int):
+    low = and_(Item.reorder_level.isnot(None), InventoryItem.available_stock <= Item.reorder_level)
+    over = and_(Item.max_stock_level.isnot(None), InventoryItem.current_stock > Item.max_stock_level)
+    return (
+        select(
+            InventoryItem.school_id,
+            InventoryItem.inventory_id,
+            InventoryItem.item_id,
+            case((low, "low"), else_="over").label("kind"),
+            InventoryItem.current_stock,
+            InventoryItem.available_stock,
+            case((low, Item.reorder_level), else_=Item.max_stock_level).label("threshold"),
+        )
+        .join(Item, Item.id == InventoryItem.item_id)
+        .where(InventoryItem.school_id == school_id, or_(low, over))
+    )
+
+
+async def rebuild_alerts(db: AsyncSession, school_id: int) -> int:
+    """Recompute the school's alerts from stock levels; returns how many there are. The caller commits."""
+    alerting = _alerting(school_id)
+    await db.execute(
+        delete(StockAlert).where(
+            StockAlert.school_id == school_id,
+            tuple_(StockAlert.inventory_id, StockAlert.item_id).not_in(
+                alerting.with_only_columns(InventoryItem.inventory_id, InventoryItem.item_id)
+            ),
+        )
+    )
+    result = await db.execute(_upsert(upsert_insert(StockAlert.__table__).from_select(ALERT_COLUMNS, alerting)))
+    return result.rowcount
+
+
+async def list_alerts(
+    db: AsyncSession, school_id: int, inventory_id: int | None = None, kind: str | None = None
+) -> list[dict]:
+    stmt = (
+        select(
+            StockAlert.inventory_id,
+            StockAlert.item_id,
+            Item.sku,
+            Item.name,
+            StockAlert.kind,
+            StockAlert.current_stock,
+            StockAlert.available_stock,
+            StockAlert.threshold,
+            StockAlert.created_at.label("since"),
+        )
+        .join(Item, Item.id == StockAlert.item_id)
+        .where(StockAlert.school_id == school_id)
+    )
+    if inventory_id is not None:
+        stmt = stmt.where(StockAlert.inventory_id == inventory_id)
+    if kind is not None:
+        stmt = stmt.where(StockAlert.kind == kind)
+    result = await db.execute(stmt.order_by(StockAlert.kind, StockAlert.inventory_id, Item.name))
+    return [dict(row._mapping) for row in result]
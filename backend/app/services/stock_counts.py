@@ -0,0 +1,255 @@
+"""Physical stock counts recorded as stock adjustments.
+
+A count sheet (JSON lines or a CSV/XLSX upload with `sku`/`barcode` and
+`quantity` columns) is matched to items and diffed against the
+inventory's stock in a single SELECT, so every system quantity comes from
+the same snapshot. The sheet becomes a draft `StockAdjustment` whose items
+are bulk-inserted. Approving it posts one adjustment movement per
+difference through the stock ledger, all in the approval's transaction.
+"""
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import IO, Any, Iterable
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import bulk_insert, id_in
+from ..models.inventory import InventoryItem, Item, StockAdjustment, StockAdjustmentItem
+from ..schemas.inventory import CountLineIn, MovementIn, PostMovementsOut, StockCountIn, StockCountOut
+from .stock_ledger import check_inventories, post_movements
+from .student_import import iter_upload_rows
+
+
+def new_adjustment_number(school_id: int) -> str:
+    return f"ADJ-{school_id}-{uuid.uuid4().hex[:12].upper()}"
+
+
+def _cell(row: dict[str, Any], key: str) -> str | None:
+    value = row.get(key)
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip() or None
+
+
+def parse_count_sheet(rows: Iterable[dict[str, Any]]) -> tuple[list[CountLineIn], list[str]]:
+    """Count lines and row errors of an uploaded sheet."""
+    lines, errors = [], []
+    for row_no, row in enumerate(rows, start=2):
+        sku, barcode = _cell(row, "sku"), _cell(row, "barcode")
+        raw = _cell(row, "quantity") or _cell(row, "count")
+        if sku is None and barcode is None and raw is None:
+            continue
+        try:
+            quantity = Decimal(raw or "")
+        except ArithmeticError:
+            quantity = None
+        if quantity is None or quantity != quantity.to_integral_value():
+            errors.append(f"Row {row_no}: quantity '{raw}' is not a whole number")
+            continue
+        lines.append(CountLineIn(sku=sku, barcode=barcode, quantity=int(quantity)))
+    return lines, errors
+
+
+async def create_stock_count(
+    db: AsyncSession,
+    school_id: int,
+    count: StockCountIn,
+    created_by: int,
+    errors: list[str] | None = None,
+) -> StockCountOut:
+    """Diff a count sheet against stock and save it as a draft adjustment; the caller commits."""
+    errors = list(errors or [])
+    await check_inventories(db, school_id, {count.inventory_id})
+    lines = []
+    for position, line in enumerate(count.lines, start=1):
+        if not line.sku and not line.barcode:
+            errors.append(f"Line {position}: sku or barcode is required")
+        elif line.quantity < 0:
+            errors.append(f"Line {position}: quantity must not be negative")
+        else:
+            lines.append(line)
+    if count.full_count and errors:
+        # Items on rejected lines would be zeroed as uncounted
+        raise ValueError("Full count has rejected lines: " + "; ".join(errors[:10]))
+    if not lines and not count.full_count:
+        raise ValueError("Count sheet has no valid lines")
+
+    skus = sorted({line.sku for line in lines if line.sku})
+    barcodes = sorted({line.barcode for line in lines if line.barcode and not line.sku})
+    matched = []
+    if skus:
+        matched.append(id_in(Item.sku, skus))
+    if barcodes:
+        matched.append(id_in(Item.barcode, barcodes))
+    if count.full_count:
+        matched.append(InventoryItem.current_stock != 0)
+    result = await db.execute(
+        select(Item.id, Item.sku, Item.barcode, Item.unit_cost, func.coalesce(InventoryItem.current_stock, 0))
+        .outerjoin(
+            InventoryItem,
+            and_(
+                InventoryItem.item_id == Item.id,
+                InventoryItem.inventory_id == count.inventory_id,
+                InventoryItem.school_id == school_id,
+            ),
+        )
+        .where(Item.school_id == school_id, or_(*matched))
+    )
+    by_sku, by_barcode, system = {}, {}, {}
+    for item_id, sku, barcode, unit_cost, stock in result:
+        by_sku[sku] = item_id
+        if barcode:
+            by_barcode[barcode] = item_id
+        system[item_id] = (stock, unit_cost)
+
+    physical: dict[int, int] = {}
+    unmatched = []
+    for line in lines:
+        item_id = by_sku.get(line.sku) if line.sku else by_barcode.get(line.barcode)
+        if item_id is None:
+            unmatched.append(line.sku or line.barcode)
+            continue
+        # The same item may be counted on several shelves
+        physical[item_id] = physical.get(item_id, 0) + line.quantity
+    if count.full_count:
+        for item_id in system.keys() - physical.keys():
+            physical[item_id] = 0
+
+    items, total_value, differences = [], Decimal("0"), 0
+    for item_id, counted in sorted(physical.items()):
+        stock, unit_cost = system[item_id]
+        difference = counted - stock
+        value_change = (unit_cost or Decimal("0")) * difference
+        total_value += value_change
+        differences += difference != 0
+        items.append({
+            "school_id": school_id,
+            "item_id": item_id,
+            "system_quantity": stock,
+            "physical_quantity": counted,
+            "difference": difference,
+            "unit_cost": unit_cost,
+            "value_change": value_change,
+        })
+
+    number = new_adjustment_number(school_id)
+    result = await db.execute(
+        insert(StockAdjustment)
+        .values(
+            school_id=school_id,
+            inventory_id=count.inventory_id,
+            adjustment_number=number,
+            adjustment_type=count.adjustment_type,
+            description=count.description,
+            total_value_change=total_value,
+            status="draft",
+            created_by=created_by,
+        )
+        .returning(StockAdjustment.id)
+    )
+    adjustment_id = result.scalar_one()
+    for item in items:
+        item["adjustment_id"] = adjustment_id
+    await bulk_insert(db, StockAdjustmentItem.__table__, items)
+    return StockCountOut(
+        adjustment_id=adjustment_id,
+        adjustment_number=number,
+        status="draft",
+        counted_items=len(items),
+        differences=differences,
+        total_value_change=total_value,
+        unmatched=unmatched,
+        errors=errors,
+    )
+
+
+async def create_stock_count_upload(
+    db: AsyncSession,
+    school_id: int,
+    inventory_id: int,
+    file: IO[bytes],
+    filename: str | None,
+    created_by: int,
+    *,
+    full_count: bool = False,
+    description: str | None = None,
+) -> StockCountOut:
+    lines, errors = parse_count_sheet(iter_upload_rows(file, filename))
+    count = StockCountIn(inventory_id=inventory_id, full_count=full_count, description=description, lines=lines)
+    return await create_stock_count(db, school_id, count, created_by, errors)
+
+
+async def approve_stock_count(
+    db: AsyncSession, school_id: int, adjustment_id: int, approved_by: int
+) -> PostMovementsOut:
+    """Post a draft count's differences as adjustment movements; the caller commits.
+
+    Raises LookupError if the adjustment does not exist and ValueError if it
+    was already posted or stock moved so that a difference can no longer be
+    taken out.
+    """
+    now = datetime.now(timezone.utc)
+    result = await db.execute(
+        update(StockAdjustment)
+        .where(
+            StockAdjustment.id == adjustment_id,
+            StockAdjustment.school_id == school_id,
+            StockAdjustment.status == "draft",
+        )
+        .values(status="posted", approved_by=approved_by, approved_at=now)
+        .returning(StockAdjustment.inventory_id, StockAdjustment.adjustment_number)
+        .execution_options(synchronize_session=False)
+    )
+    adjustment = result.one_or_none()
+    if adjustment is None:
+        result = await db.execute(
+            select(StockAdjustment.status).where(
+                StockAdjustment.id == adjustment_id, StockAdjustment.school_id == school_id
+            )
+        )
+        found = result.scalar_one_or_none()
+        if found is None:
+            raise LookupError("Stock adjustment not found")
+        raise ValueError(f"Stock adjustment is already {found}")
+
+    result = await db.execute(
+        select(StockAdjustmentItem.item_id, StockAdjustmentItem.difference, StockAdjustmentItem.unit_cost).where(
+            StockAdjustmentItem.adjustment_id == adjustment_id,
+            StockAdjustmentItem.difference != 0,
+        )
+    )
+    movements = [
+        MovementIn(
+            movement_type="adjustment",
+            item_id=item_id,
+            inventory_id=adjustment.inventory_id,
+            quantity=difference,
+            unit_cost=unit_cost,
+            reason=f"Stock count {adjustment.adjustment_number}",
+            reference_type="adjustment",
+            reference_id=adjustment_id,
+            reference_number=adjustment.adjustment_number,
+        )
+        for item_id, difference, unit_cost in result
+    ]
+    posted = PostMovementsOut(movements=0, stock=[])
+    if movements:
+        posted = await post_movements(db, school_id, movements, approved_by, movement_date=now)
+
+    await db.execute(
+        update(InventoryItem)
+        .where(
+            InventoryItem.school_id == school_id,
+            InventoryItem.inventory_id == adjustment.inventory_id,
+            InventoryItem.item_id.in_(
+                select(StockAdjustmentItem.item_id).where(StockAdjustmentItem.adjustment_id == adjustment_id)
+            ),
+        )
+        .values(last_counted_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return posted
@@ -0,0 +1,275 @@
+"""Stock ledger: posts stock movements and keeps inventory levels in sync.
+
+A batch of movements (in, out, transfer, adjustment) is posted in the
+caller's transaction. Movements are netted per (inventory, item) first, so
+each affected `inventory_items` row takes exactly one
+`UPDATE ... SET current_stock = current_stock + :delta ... RETURNING`.
+Decrements carry the guard `available_stock >= :needed` in the same
+statement: a row that would go negative simply matches nothing, and the
+batch is rejected without reading stock levels beforehand. Rows are
+updated in (inventory, item) order so concurrent batches lock them in the
+same order and cannot deadlock. A transfer is an out of one inventory and
+an in of another, both in the same batch and therefore the same
+transaction. `StockMovement` rows are bulk-inserted afterwards, and the
+low/over stock alerts of the changed levels refreshed.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterable, Sequence
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import bulk_insert, is_postgres, upsert_insert
+from ..models.inventory import Inventory, InventoryItem, Item, StockMovement
+from ..schemas.inventory import DeliveryNoteIn, MovementIn, PostMovementsOut, StockLevelOut
+from .stock_alerts import refresh_alerts
+
+MOVEMENT_TYPES = ("in", "out", "transfer", "adjustment")
+
+
+def _check(movement: MovementIn) -> None:
+    if movement.movement_type not in MOVEMENT_TYPES:
+        raise ValueError(f"Unknown movement type '{movement.movement_type}'")
+    if movement.movement_type == "adjustment":
+        if movement.quantity == 0:
+            raise ValueError("Adjustment quantity must not be zero")
+    elif movement.quantity <= 0:
+        raise ValueError("Movement quantity must be positive")
+    if movement.movement_type == "transfer":
+        if movement.to_inventory_id is None:
+            raise ValueError("Transfer needs to_inventory_id")
+        if movement.to_inventory_id == movement.inventory_id:
+            raise ValueError("Transfer source and destination are the same inventory")
+
+
+def _legs(movement: MovementIn) -> list[tuple[int, int]]:
+    """(inventory id, signed quantity) changes made by one movement."""
+    if movement.movement_type == "in":
+        return [(movement.inventory_id, movement.quantity)]
+    if movement.movement_type == "out":
+        return [(movement.inventory_id, -movement.quantity)]
+    if movement.movement_type == "transfer":
+        return [(movement.inventory_id, -movement.quantity), (movement.to_inventory_id, movement.quantity)]
+    return [(movement.inventory_id, movement.quantity)]
+
+
+async def _unit_costs(db: AsyncSession, school_id: int, item_ids: set[int]) -> dict[int, Decimal | None]:
+    result = await db.execute(
+        select(Item.id, Item.unit_cost).where(Item.school_id == school_id, Item.id.in_(item_ids))
+    )
+    costs = dict(result.all())
+    missing = item_ids - costs.keys()
+    if missing:
+        raise LookupError(f"Unknown items: {sorted(missing)[:10]}")
+    return costs
+
+
+async def check_inventories(db: AsyncSession, school_id: int, inventory_ids: set[int]) -> None:
+    result = await db.execute(
+        select(Inventory.id).where(
+            Inventory.school_id == school_id,
+            Inventory.id.in_(inventory_ids),
+            Inventory.is_active == True,
+        )
+    )
+    missing = inventory_ids - set(result.scalars())
+    if missing:
+        raise LookupError(f"Unknown or inactive inventories: {sorted(missing)}")
+
+
+async def apply_stock_deltas(
+    db: AsyncSession, school_id: int, deltas: dict[tuple[int, int], int], moved_at: datetime
+) -> list[StockLevelOut]:
+    """Add signed quantities to (inventory id, item id) stock levels.
+
+    Raises ValueError if a level would go below what is available; the
+    caller must then roll back.
+    """
+    added = [key for key, delta in deltas.items() if delta > 0]
+    if added:
+        # Items received into an inventory for the first time
+        await db.execute(
+            upsert_insert(InventoryItem.__table__)
+            .values([
+                {
+                    "school_id": school_id,
+                    "inventory_id": inventory_id,
+                    "item_id": item_id,
+                    "current_stock": 0,
+                    "reserved_stock": 0,
+                    "available_stock": 0,
+                }
+                for inventory_id, item_id in sorted(added)
+            ])
+            .on_conflict_do_nothing(index_elements=["inventory_id", "item_id"])
+        )
+
+    levels = []
+    for (inventory_id, item_id), delta in sorted(deltas.items()):
+        if delta == 0:
+            continue
+        stmt = (
+            update(InventoryItem)
+            .where(
+                InventoryItem.school_id == school_id,
+                InventoryItem.inventory_id == inventory_id,
+                InventoryItem.item_id == item_id,
+            )
+            .values(
+                current_stock=InventoryItem.current_stock + delta,
+                available_stock=InventoryItem.available_stock + delta,
+                last_movement_at=moved_at,
+            )
+            .returning(
+                InventoryItem.inventory_id,
+                InventoryItem.item_id,
+                InventoryItem.current_stock,
+                InventoryItem.available_stock,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if delta < 0:
+            stmt = stmt.where(InventoryItem.available_stock >= -delta)
+        row = (await db.execute(stmt)).one_or_none()
+        if row is None:
+            raise ValueError(
+                f"Insufficient stock of item {item_id} in inventory {inventory_id}: {-delta} needed"
+            )
+        levels.append(StockLevelOut(**row._mapping))
+    await refresh_alerts(db, school_id, levels)
+    return levels
+
+
+async def post_movements(
+    db: AsyncSession,
+    school_id: int,
+    movements: Sequence[MovementIn],
+    moved_by: int,
+    *,
+    movement_date: datetime | None = None,
+) -> PostMovementsOut:
+    """Post a batch of movements atomically; the caller commits (or rolls back on error).
+
+    Raises LookupError for unknown items/inventories and ValueError for
+    invalid movements or insufficient stock.
+    """
+    if not movements:
+        raise ValueError("No movements to post")
+    for movement in movements:
+        _check(movement)
+    await check_inventories(
+        db,
+        school_id,
+        {m.inventory_id for m in movements} | {m.to_inventory_id for m in movements if m.to_inventory_id},
+    )
+    costs = await _unit_costs(db, school_id, {m.item_id for m in movements})
+
+    moved_at = datetime.now(timezone.utc)
+    movement_date = movement_date or moved_at
+    deltas: dict[tuple[int, int], int] = {}
+    rows = []
+    for movement in movements:
+        unit_cost = movement.unit_cost if movement.unit_cost is not None else costs[movement.item_id]
+        for inventory_id, quantity in _legs(movement):
+            key = (inventory_id, movement.item_id)
+            deltas[key] = deltas.get(key, 0) + quantity
+            rows.append({
+                "school_id": school_id,
+                "item_id": movement.item_id,
+                "inventory_id": inventory_id,
+                "movement_type": movement.movement_type,
+                "quantity": quantity,
+                "unit_cost": unit_cost,
+                "total_cost": unit_cost * abs(quantity) if unit_cost is not None else None,
+                "reference_type": movement.reference_type or (
+                    "transfer" if movement.movement_type == "transfer" else None
+                ),
+                "reference_id": movement.reference_id,
+                "reference_number": movement.reference_number,
+                "reason": movement.reason,
+                "notes": movement.notes,
+                "moved_by": moved_by,
+                "movement_date": movement_date,
+            })
+
+    levels = await apply_stock_deltas(db, school_id, deltas, moved_at)
+    await bulk_insert(db, StockMovement.__table__, rows)
+    return PostMovementsOut(movements=len(rows), stock=levels)
+
+
+async def _resolve_items(db: AsyncSession, school_id: int, skus: Iterable[str], barcodes: Iterable[str]):
+    skus, barcodes = set(skus), set(barcodes)
+    if not skus and not barcodes:
+        return {}, {}
+    result = await db.execute(
+        select(Item.id, Item.sku, Item.barcode).where(
+            Item.school_id == school_id,
+            or_(Item.sku.in_(skus), Item.barcode.in_(barcodes)),
+        )
+    )
+    by_sku, by_barcode = {}, {}
+    for item_id, sku, barcode in result:
+        by_sku[sku] = item_id
+        if barcode:
+            by_barcode[barcode] = item_id
+    return by_sku, by_barcode
+
+
+async def post_delivery(
+    db: AsyncSession, school_id: int, note: DeliveryNoteIn, received_by: int
+) -> PostMovementsOut:
+    """Receive every line of a delivery note into one inventory; the caller commits.
+
+    Lines name items by id, SKU or barcode. A delivery note number can only
+    be posted once per inventory.
+    """
+    if not note.lines:
+        raise ValueError("Delivery note has no lines")
+    if is_postgres():
+        # Held until commit, so a concurrent post of the same note waits and then sees it
+        await db.execute(select(func.pg_advisory_xact_lock(
+            func.hashtext(f"delivery-note:{school_id}:{note.inventory_id}:{note.delivery_note_number}")
+        )))
+    result = await db.execute(
+        select(StockMovement.id)
+        .where(
+            StockMovement.school_id == school_id,
+            StockMovement.inventory_id == note.inventory_id,
+            StockMovement.reference_type == "purchase",
+            StockMovement.reference_number == note.delivery_note_number,
+        )
+        .limit(1)
+    )
+    if result.first() is not None:
+        raise ValueError(f"Delivery note {note.delivery_note_number} was already posted")
+
+    by_sku, by_barcode = await _resolve_items(
+        db,
+        school_id,
+        (line.sku for line in note.lines if line.item_id is None and line.sku),
+        (line.barcode for line in note.lines if line.item_id is None and not line.sku and line.barcode),
+    )
+    reason = f"Delivery note {note.delivery_note_number}"
+    if note.supplier:
+        reason = f"{reason} from {note.supplier}"
+    movements, unknown = [], []
+    for line in note.lines:
+        item_id = line.item_id or by_sku.get(line.sku) or by_barcode.get(line.barcode)
+        if item_id is None:
+            unknown.append(line.sku or line.barcode or "(no item)")
+            continue
+        movements.append(MovementIn(
+            movement_type="in",
+            item_id=item_id,
+            inventory_id=note.inventory_id,
+            quantity=line.quantity,
+            unit_cost=line.unit_cost,
+            reason=reason[:255],
+            reference_type="purchase",
+            reference_number=note.delivery_note_number,
+            notes=note.notes,
+        ))
+    if unknown:
+        raise LookupError(f"Unknown items: {unknown[:10]}")
+    return await post_movements(db, school_id, movements, received_by, movement_date=note.movement_date)
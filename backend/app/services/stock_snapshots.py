@@ -0,0 +1,118 @@
+"""Daily stock valuation and movement snapshots.
+
+One `stock_snapshots` row per inventory and day records the closing
+position (items held, units and value at item unit cost) and that day's
+movement totals. Valuation and movement history reports read these rows
+instead of summing `stock_movements` or valuing every stock row live.
+
+The closing position of a past day is today's stock minus the movements
+dated after it, so a snapshot taken (or retaken) late still shows that
+day's close; the daily job runs just after midnight, when that correction
+is only a few movements. Values use current unit costs.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import upsert_insert
+from ..models.inventory import InventoryItem, Item, StockMovement, StockSnapshot
+
+SNAPSHOT_MEASURES = (
+    "item_count", "units", "stock_value",
+    "movement_count", "units_in", "units_out", "value_in", "value_out",
+)
+
+
+def _day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+async def take_snapshot(db: AsyncSession, school_id: int, day: date) -> int:
+    """Store (or replace) the school's snapshots for `day`; returns the number of inventories. The caller commits."""
+    start, end = _day_bounds(day)
+
+    later = (
+        select(
+            StockMovement.inventory_id,
+            StockMovement.item_id,
+            func.sum(StockMovement.quantity).label("quantity"),
+        )
+        .where(StockMovement.school_id == school_id, StockMovement.movement_date >= end)
+        .group_by(StockMovement.inventory_id, StockMovement.item_id)
+        .subquery("later")
+    )
+    closing = InventoryItem.current_stock - func.coalesce(later.c.quantity, 0)
+    positions = await db.execute(
+        select(
+            InventoryItem.inventory_id,
+            func.sum(case((closing > 0, 1), else_=0)).label("item_count"),
+            func.sum(closing).label("units"),
+            func.sum(closing * func.coalesce(Item.unit_cost, 0)).label("stock_value"),
+        )
+        .join(Item, Item.id == InventoryItem.item_id)
+        .outerjoin(
+            later,
+            and_(later.c.inventory_id == InventoryItem.inventory_id, later.c.item_id == InventoryItem.item_id),
+        )
+        .where(InventoryItem.school_id == school_id)
+        .group_by(InventoryItem.inventory_id)
+    )
+
+    incoming = StockMovement.quantity > 0
+    movements = await db.execute(
+        select(
+            StockMovement.inventory_id,
+            func.count().label("movement_count"),
+            func.sum(case((incoming, StockMovement.quantity), else_=0)).label("units_in"),
+            func.sum(case((incoming, 0), else_=-StockMovement.quantity)).label("units_out"),
+            func.sum(case((incoming, func.coalesce(StockMovement.total_cost, 0)), else_=0)).label("value_in"),
+            func.sum(case((incoming, 0), else_=func.coalesce(StockMovement.total_cost, 0))).label("value_out"),
+        )
+        .where(
+            StockMovement.school_id == school_id,
+            StockMovement.movement_date >= start,
+            StockMovement.movement_date < end,
+        )
+        .group_by(StockMovement.inventory_id)
+    )
+
+    rows: dict[int, dict] = {}
+    for result in (positions, movements):
+        for row in result:
+            values = dict(row._mapping)
+            rows.setdefault(values.pop("inventory_id"), {}).update(values)
+    if not rows:
+        return 0
+
+    stmt = upsert_insert(StockSnapshot.__table__).values([
+        {
+            "school_id": school_id,
+            "inventory_id": inventory_id,
+            "day": day,
+            **{name: values.get(name) or 0 for name in SNAPSHOT_MEASURES},
+        }
+        for inventory_id, values in sorted(rows.items())
+    ])
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["school_id", "inventory_id", "day"],
+            set_={name: stmt.excluded[name] for name in SNAPSHOT_MEASURES},
+        )
+    )
+    return len(rows)
+
+
+async def list_snapshots(
+    db: AsyncSession, school_id: int, start: date, end: date, inventory_id: int | None = None
+) -> list[StockSnapshot]:
+    stmt = select(StockSnapshot).where(
+        StockSnapshot.school_id == school_id,
+        StockSnapshot.day >= start,
+        StockSnapshot.day <= end,
+    )
+    if inventory_id is not None:
+        stmt = stmt.where(StockSnapshot.inventory_id == inventory_id)
+    result = await db.execute(stmt.order_by(StockSnapshot.day, StockSnapshot.inventory_id))
+    return list(result.scalars())
@@ -0,0 +1,354 @@
+"""Bulk student onboarding from CSV/XLSX uploads.
+
+Rows are streamed from the upload, validated in chunks and written with a
+few multi-row statements per chunk (students, parents, parent links and
+current-year enrollments). The whole import runs in one transaction: if any
+row is invalid, or the import is a dry run, nothing is committed and the
+per-row report is returned as-is.
+"""
+import csv
+import io
+from datetime import date, datetime
+from typing import IO, Any, Iterable, Iterator
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import bulk_insert
+from ..models.academics import Class, Enrollment
+from ..models.calendar import AcademicYear
+from ..models.school import Parent, ParentStudent, Student
+from ..schemas.people import StudentImportReport, StudentImportRowError
+
+CHUNK_SIZE = 1000
+
+GENDERS = {"m": "male", "male": "male", "f": "female", "female": "female", "other": "other"}
+
+
+def _normalize_header(value: Any) -> str:
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+def _iter_csv(file: IO[bytes]) -> Iterator[dict[str, Any]]:
+    wrapper = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(wrapper)
+        header = [_normalize_header(h) for h in next(reader, [])]
+        for values in reader:
+            yield dict(zip(header, values))
+    finally:
+        # Leave the underlying upload open for the caller to close
+        wrapper.detach()
+
+
+def _iter_xlsx(file: IO[bytes]) -> Iterator[dict[str, Any]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise ValueError("XLSX import requires openpyxl to be installed") from exc
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_normalize_header(h) for h in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_upload_rows(file: IO[bytes], filename: str | None) -> Iterator[dict[str, Any]]:
+    """Yield one dict per data row, keyed by normalized header name."""
+    if (filename or "").lower().endswith((".xlsx", ".xlsm")):
+        return _iter_xlsx(file)
+    return _iter_csv(file)
+
+
+def _chunks(rows: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    chunk: list[Any] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _text(row: dict[str, Any], key: str) -> str | None:
+    value = row.get(key)
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def _date(row: dict[str, Any], key: str, errors: list[str]) -> date | None:
+    value = row.get(key)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    raw = _text(row, key)
+    if raw is None:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        errors.append(f"{key}: expected YYYY-MM-DD, got '{raw}'")
+        return None
+
+
+def _parent_key(phone: str | None, email: str | None) -> str | None:
+    if phone:
+        return f"phone:{phone}"
+    if email:
+        return f"email:{email.lower()}"
+    return None
+
+
+class StudentImporter:
+    """Validates and writes one uploaded roster for a school."""
+
+    def __init__(self, db: AsyncSession, school_id: int, dry_run: bool = False):
+        self.db = db
+        self.school_id = school_id
+        self.dry_run = dry_run
+        self.report = StudentImportReport(dry_run=dry_run)
+        self.class_ids: dict[str, int] = {}
+        self.academic_year_id: int | None = None
+        self.seen_admission_nos: set[str] = set()
+        self.parent_ids: dict[str, int] = {}
+
+    async def _load_lookups(self) -> None:
+        result = await self.db.execute(
+            select(Class.id, Class.name).where(
+                Class.school_id == self.school_id, Class.status == "active"
+            )
+        )
+        for class_id, name in result:
+            self.class_ids[name.strip().lower()] = class_id
+            self.class_ids[str(class_id)] = class_id
+
+        result = await self.db.execute(
+            select(AcademicYear.id).where(
+                AcademicYear.school_id == self.school_id, AcademicYear.is_current == True
+            )
+        )
+        self.academic_year_id = result.scalars().first()
+
+    def _validate(self, line: int, row: dict[str, Any]) -> dict[str, Any] | None:
+        errors: list[str] = []
+
+        first_name = _text(row, "first_name")
+        last_name = _text(row, "last_name")
+        if not first_name:
+            errors.append("first_name is required")
+        if not last_name:
+            errors.append("last_name is required")
+
+        gender = _text(row, "gender")
+        if gender is not None:
+            gender = GENDERS.get(gender.lower())
+            if gender is None:
+                errors.append(f"gender: unknown value '{_text(row, 'gender')}'")
+
+        admission_no = _text(row, "admission_no")
+        if admission_no is not None:
+            if admission_no in self.seen_admission_nos:
+                errors.append(f"admission_no '{admission_no}' is repeated in the file")
+            self.seen_admission_nos.add(admission_no)
+
+        class_id = None
+        class_ref = _text(row, "class")
+        if class_ref is not None:
+            class_id = self.class_ids.get(class_ref.lower())
+            if class_id is None:
+                errors.append(f"class '{class_ref}' not found")
+            elif self.academic_year_id is None:
+                errors.append("No current academic year set")
+
+        parent_phone = _text(row, "parent_phone")
+        parent_email = _text(row, "parent_email")
+        parent_first_name = _text(row, "parent_first_name")
+        parent_last_name = _text(row, "parent_last_name")
+        parent_key = _parent_key(parent_phone, parent_email)
+        if (parent_first_name or parent_last_name) and parent_key is None:
+            errors.append("parent_phone or parent_email is required to link a parent")
+
+        student = {
+            "school_id": self.school_id,
+            "first_name": first_name,
+            "last_name": last_name,
+            "gender": gender,
+            "dob": _date(row, "dob", errors),
+            "admission_no": admission_no,
+            "admission_date": _date(row, "admission_date", errors),
+            "status": "active",
+        }
+
+        if errors:
+            self.report.errors.append(StudentImportRowError(row=line, errors=errors))
+            return None
+
+        return {
+            "line": line,
+            "student": student,
+            "class_id": class_id,
+            "parent_key": parent_key,
+            "parent": {
+                "school_id": self.school_id,
+                "first_name": parent_first_name or "",
+                "last_name": parent_last_name or "",
+                "phone": parent_phone,
+                "email": parent_email,
+                "occupation": _text(row, "parent_occupation"),
+            },
+            "relationship_type": _text(row, "parent_relationship") or "parent",
+        }
+
+    async def _reject_existing_admission_nos(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        numbers = [r["student"]["admission_no"] for r in rows if r["student"]["admission_no"]]
+        if not numbers:
+            return rows
+        result = await self.db.execute(
+            select(Student.admission_no).where(Student.admission_no.in_(numbers))
+        )
+        taken = set(result.scalars())
+        if not taken:
+            return rows
+        kept = []
+        for r in rows:
+            number = r["student"]["admission_no"]
+            if number in taken:
+                self.report.errors.append(StudentImportRowError(
+                    row=r["line"], errors=[f"admission_no '{number}' already exists"]
+                ))
+            else:
+                kept.append(r)
+        return kept
+
+    async def _resolve_parents(self, rows: list[dict[str, Any]]) -> None:
+        """Map every parent key in the chunk to a parent id, creating new parents in bulk."""
+        pending = {
+            r["parent_key"]: r["parent"]
+            for r in rows
+            if r["parent_key"] and r["parent_key"] not in self.parent_ids
+        }
+        if not pending:
+            return
+
+        phones = [p["phone"] for p in pending.values() if p["phone"]]
+        emails = [p["email"].lower() for p in pending.values() if p["email"]]
+        result = await self.db.execute(
+            select(Parent.id, Parent.phone, Parent.email).where(
+                Parent.school_id == self.school_id,
+                or_(Parent.phone.in_(phones), func.lower(Parent.email).in_(emails)),
+            )
+        )
+        for parent_id, phone, email in result:
+            for key in (_parent_key(phone, None), _parent_key(None, email)):
+                if key in pending:
+                    self.parent_ids[key] = parent_id
+                    pending.pop(key)
+
+        if not pending:
+            return
+        keys = list(pending)
+        ids = await bulk_insert(
+            self.db, Parent.__table__, [pending[k] for k in keys], with_ids=True
+        )
+        self.parent_ids.update(zip(keys, ids))
+        self.report.parents_created += len(ids)
+
+    async def _write(self, rows: list[dict[str, Any]]) -> None:
+        # Admission numbers are unique across all schools, but the RLS-scoped
+        # pre-check only sees this school's students; a number held by another
+        # school is skipped here and reported instead of aborting the import.
+        student_ids = await bulk_insert(
+            self.db, Student.__table__, [r["student"] for r in rows],
+            with_ids=True, skip_conflicts=["admission_no"],
+        )
+        taken = [r for r, student_id in zip(rows, student_ids) if student_id is None]
+        for r in taken:
+            self.report.errors.append(StudentImportRowError(
+                row=r["line"],
+                errors=[f"admission_no '{r['student']['admission_no']}' already exists"],
+            ))
+        if taken:
+            self.report.valid_rows -= len(taken)
+            return
+
+        links = []
+        enrollments = []
+        for r, student_id in zip(rows, student_ids):
+            if r["parent_key"]:
+                links.append({
+                    "school_id": self.school_id,
+                    "parent_id": self.parent_ids[r["parent_key"]],
+                    "student_id": student_id,
+                    "relationship_type": r["relationship_type"],
+                    "is_primary": True,
+                })
+            if r["class_id"] is not None:
+                enrollments.append({
+                    "school_id": self.school_id,
+                    "student_id": student_id,
+                    "class_id": r["class_id"],
+                    "academic_year_id": self.academic_year_id,
+                    "status": "active",
+                })
+
+        await bulk_insert(self.db, ParentStudent.__table__, links)
+        await bulk_insert(self.db, Enrollment.__table__, enrollments)
+        self.report.imported += len(student_ids)
+        self.report.parent_links += len(links)
+        self.report.enrollments += len(enrollments)
+
+    async def run(self, rows: Iterable[dict[str, Any]]) -> StudentImportReport:
+        await self._load_lookups()
+
+        numbered = enumerate(rows, start=2)  # line 1 is the header
+        for chunk in _chunks(numbered, CHUNK_SIZE):
+            valid = []
+            for line, row in chunk:
+                if not any(v not in (None, "") for v in row.values()):
+                    continue  # blank line
+                self.report.total_rows += 1
+                cleaned = self._validate(line, row)
+                if cleaned is not None:
+                    valid.append(cleaned)
+
+            valid = await self._reject_existing_admission_nos(valid)
+            self.report.valid_rows += len(valid)
+
+            # Once any row has failed the import will be rolled back, so
+            # later chunks are only validated.
+            if self.dry_run or self.report.errors or not valid:
+                continue
+            await self._resolve_parents(valid)
+            await self._write(valid)
+
+        self.report.errors.sort(key=lambda e: e.row)
+        if self.dry_run or self.report.errors:
+            await self.db.rollback()
+            self.report.imported = 0
+            self.report.parents_created = 0
+            self.report.parent_links = 0
+            self.report.enrollments = 0
+        else:
+            await self.db.commit()
+        return self.report
+
+
+async def import_students(
+    db: AsyncSession,
+    school_id: int,
+    file: IO[bytes],
+    filename: str | None,
+    dry_run: bool = False,
+) -> StudentImportReport:
+    importer = StudentImporter(db, school_id, dry_run=dry_run)
+    return await importer.run(iter_upload_rows(file, filename))
@@ -0,0 +1,324 @@
+"""ICS and PDF exports of the active timetable of a class, teacher or room.
+
+An export is identified by a SHA-256 over everything it renders (entries
+with their period times, course/class/teacher/room names and the term
+dates). Rendered files are stored under `timetable_export_dir` by that
+hash and reused until the content changes; the hash doubles as the ETag.
+
+The hash of each (school, term, kind, id) is also cached in-process for
+`timetable_export_ttl` seconds and dropped when this process commits a
+timetable change, so a conditional request whose If-None-Match still
+matches is answered without touching the database.
+
+ICS feeds use floating local times (no TZID): schools set period times in
+their own local time and calendar apps show them as-is. Feeds can be
+shared through a signed URL (`feed_token`) since calendar apps cannot send
+auth headers.
+"""
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import os
+from datetime import date, timedelta
+from typing import Any
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..models.academics import Class, Course
+from ..models.calendar import Term
+from ..models.school import Staff
+from ..models.timetable import Period, Room, Timetable, TimetableEntry
+
+EXPORT_KINDS = ("class", "teacher", "room")
+FORMATS = {"ics": "text/calendar; charset=utf-8", "pdf": "application/pdf"}
+# Bump when the rendering changes so stored files are regenerated
+RENDER_VERSION = "1"
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+class Schedule:
+    __slots__ = ("kind", "title", "term_name", "term_start", "term_end", "rows", "fingerprint")
+
+    def __init__(self, kind: str, title: str, term: Any, rows: list):
+        self.kind = kind
+        self.title = title
+        self.term_name = term.name
+        self.term_start = term.start_date
+        self.term_end = term.end_date
+        self.rows = rows
+        payload = json.dumps(
+            [RENDER_VERSION, kind, title, term.name, term.start_date, term.end_date,
+             [tuple(row) for row in rows]],
+            default=str,
+        )
+        self.fingerprint = hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _title(db: AsyncSession, school_id: int, kind: str, resource_id: int) -> str | None:
+    if kind == "class":
+        stmt = select(Class.name).where(Class.id == resource_id, Class.school_id == school_id)
+    elif kind == "teacher":
+        stmt = select(Staff.first_name + " " + Staff.last_name).where(
+            Staff.id == resource_id, Staff.school_id == school_id
+        )
+    else:
+        stmt = select(Room.name).where(Room.id == resource_id, Room.school_id == school_id)
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def load_schedule(
+    db: AsyncSession, school_id: int, term_id: int, kind: str, resource_id: int
+) -> Schedule:
+    """Entries of the term's active timetables for one class, teacher or room.
+
+    Raises LookupError if the term or resource does not exist.
+    """
+    if kind not in EXPORT_KINDS:
+        raise LookupError(f"Unknown export kind '{kind}'")
+    result = await db.execute(
+        select(Term.name, Term.start_date, Term.end_date).where(
+            Term.id == term_id, Term.school_id == school_id
+        )
+    )
+    term = result.one_or_none()
+    title = await _title(db, school_id, kind, resource_id)
+    if term is None or title is None:
+        raise LookupError("Term or timetable owner not found")
+
+    stmt = (
+        select(
+            TimetableEntry.id.label("entry_id"),
+            Period.weekday,
+            Period.start_time,
+            Period.end_time,
+            Course.code.label("course_code"),
+            Course.name.label("course_name"),
+            Class.name.label("class_name"),
+            (Staff.first_name + " " + Staff.last_name).label("teacher_name"),
+            Room.name.label("room_name"),
+        )
+        .join(Timetable, Timetable.id == TimetableEntry.timetable_id)
+        .join(Period, Period.id == TimetableEntry.period_id)
+        .join(Course, Course.id == TimetableEntry.course_id)
+        .join(Class, Class.id == Timetable.class_id)
+        .join(Staff, Staff.id == TimetableEntry.staff_id)
+        .outerjoin(Room, Room.id == TimetableEntry.room_id)
+        .where(
+            TimetableEntry.school_id == school_id,
+            Timetable.term_id == term_id,
+            Timetable.status == "active",
+        )
+        .order_by(Period.weekday, Period.start_time, TimetableEntry.id)
+    )
+    if kind == "class":
+        stmt = stmt.where(Timetable.class_id == resource_id)
+    elif kind == "teacher":
+        stmt = stmt.where(TimetableEntry.staff_id == resource_id)
+    else:
+        stmt = stmt.where(TimetableEntry.room_id == resource_id)
+    result = await db.execute(stmt)
+    return Schedule(kind, title, term, result.all())
+
+
+def _describe(schedule: Schedule, row) -> tuple[str, str]:
+    """Event summary and the detail line for the other party."""
+    if schedule.kind == "class":
+        return row.course_name, row.teacher_name
+    if schedule.kind == "teacher":
+        return f"{row.course_name} ({row.class_name})", row.class_name
+    return f"{row.course_name} ({row.class_name})", row.teacher_name
+
+
+def _ics_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets (RFC 5545 3.1)."""
+    parts, current, size = [], "", 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            parts.append(current)
+            current, size = " ", 1
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n".join(parts)
+
+
+def render_ics(schedule: Schedule) -> bytes:
+    if schedule.term_start is None or schedule.term_end is None:
+        raise ValueError("The term needs start and end dates for a calendar feed")
+    start: date = schedule.term_start
+    stamp = f"{start:%Y%m%d}T000000Z"
+    until = f"{schedule.term_end:%Y%m%d}T235959"
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Inkingi//Timetable//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ics_text(f'{schedule.title} - {schedule.term_name}')}",
+    ]
+    for row in schedule.rows:
+        first = start + timedelta(days=(row.weekday - start.weekday()) % 7)
+        if first > schedule.term_end:
+            continue
+        summary, detail = _describe(schedule, row)
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:timetable-entry-{row.entry_id}@inkingi",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{first:%Y%m%d}T{row.start_time:%H%M%S}",
+            f"DTEND:{first:%Y%m%d}T{row.end_time:%H%M%S}",
+            f"RRULE:FREQ=WEEKLY;UNTIL={until}",
+            f"SUMMARY:{_ics_text(summary)}",
+            f"DESCRIPTION:{_ics_text(detail)}",
+        ]
+        if row.room_name:
+            lines.append(f"LOCATION:{_ics_text(row.room_name)}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode()
+
+
+def render_pdf(schedule: Schedule) -> bytes:
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+        from xml.sax.saxutils import escape
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise ValueError("PDF export requires reportlab to be installed") from exc
+
+    styles = getSampleStyleSheet()
+    days = sorted({row.weekday for row in schedule.rows}) or [0, 1, 2, 3, 4]
+    times = sorted({(row.start_time, row.end_time) for row in schedule.rows})
+    cells: dict[tuple, list[str]] = {}
+    for row in schedule.rows:
+        summary, detail = _describe(schedule, row)
+        text = f"<b>{escape(row.course_code)}</b><br/>{escape(detail)}"
+        if row.room_name and schedule.kind != "room":
+            text += f"<br/>{escape(row.room_name)}"
+        cells.setdefault((row.start_time, row.end_time, row.weekday), []).append(text)
+
+    data = [[""] + [WEEKDAYS[d] for d in days]]
+    for start_time, end_time in times:
+        data.append(
+            [f"{start_time:%H:%M}-{end_time:%H:%M}"]
+            + [
+                Paragraph("<br/>".join(cells.get((start_time, end_time, d), [])), styles["BodyText"])
+                for d in days
+            ]
+        )
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(
+        buffer, pagesize=landscape(A4), title=f"{schedule.title} - {schedule.term_name}"
+    )
+    document.build([
+        Paragraph(escape(schedule.title), styles["Title"]),
+        Paragraph(escape(schedule.term_name), styles["Normal"]),
+        table,
+    ])
+    return buffer.getvalue()
+
+
+RENDERERS = {"ics": render_ics, "pdf": render_pdf}
+
+
+def _write_atomic(path: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+async def rendered_path(schedule: Schedule, fmt: str) -> str:
+    """Path of the rendered export, rendering it only if this content is new."""
+    path = os.path.join(settings.timetable_export_dir, f"{schedule.fingerprint}.{fmt}")
+    if not os.path.exists(path):
+        content = await asyncio.to_thread(RENDERERS[fmt], schedule)
+        await asyncio.to_thread(_write_atomic, path, content)
+    return path
+
+
+def etag_for(fingerprint: str, fmt: str) -> str:
+    return f'"{fingerprint[:32]}-{fmt}"'
+
+
+_fingerprints = TTLCache(maxsize=10000, ttl=settings.timetable_export_ttl)
+
+
+def cached_fingerprint(school_id: int, term_id: int, kind: str, resource_id: int) -> str | None:
+    return _fingerprints.get((school_id, term_id, kind, resource_id))
+
+
+def remember_fingerprint(schedule: Schedule, school_id: int, term_id: int, resource_id: int) -> None:
+    _fingerprints.set((school_id, term_id, schedule.kind, resource_id), schedule.fingerprint)
+
+
+def invalidate_exports(school_id: int) -> None:
+    for key in _fingerprints.keys():
+        if key[0] == school_id:
+            _fingerprints.delete(key)
+
+
+def feed_token(school_id: int, term_id: int, kind: str, resource_id: int) -> str:
+    payload = f"{school_id}.{term_id}.{kind}.{resource_id}"
+    signature = hmac.new(settings.secret_key.encode(), payload.encode(), hashlib.sha256)
+    return f"{payload}.{signature.hexdigest()[:32]}"
+
+
+def parse_feed_token(token: str) -> tuple[int, int, str, int] | None:
+    parts = token.split(".")
+    if len(parts) != 5:
+        return None
+    payload, signature = ".".join(parts[:4]), parts[4]
+    expected = hmac.new(settings.secret_key.encode(), payload.encode(), hashlib.sha256)
+    if not hmac.compare_digest(expected.hexdigest()[:32], signature):
+        return None
+    school_id, term_id, kind, resource_id = parts[:4]
+    try:
+        return int(school_id), int(term_id), kind, int(resource_id)
+    except ValueError:
+        return None
+
+
+EXPORTED_MODELS = (Timetable, TimetableEntry, Period, Room, Course, Class, Staff, Term)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_export_changes(session, flush_context):
+    schools = session.info.setdefault("timetable_exports_dirty", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, EXPORTED_MODELS):
+            schools.add(obj.school_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_export_changes(session):
+    for school_id in session.info.pop("timetable_exports_dirty", ()):
+        invalidate_exports(school_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_export_changes(session):
+    session.info.pop("timetable_exports_dirty", None)
@@ -0,0 +1,293 @@
+"""Timetable generation: loads a school's periods, rooms, class sizes and
+teacher availability, runs `timetable_solver.solve` and saves one draft
+`Timetable` per class with its entries.
+
+Teachers and rooms already taken by the term's active timetables of classes
+outside the request are kept out of the periods they occupy and of every
+period overlapping them.
+"""
+from typing import Any, Callable, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.bulk import bulk_insert
+from ..models.academics import CourseTeacher, Enrollment
+from ..models.calendar import Term
+from ..models.timetable import Period, Room, TeacherAvailability, Timetable, TimetableEntry
+from .timetable_index import build_occupancy
+from .timetable_solver import Requirement, Solution, solve
+
+# Rooms used when a requirement names no room type
+GENERAL_ROOM_TYPES = (None, "classroom")
+
+
+async def _teaching_periods(db: AsyncSession, school_id: int) -> list[tuple[int, int, Any, Any]]:
+    result = await db.execute(
+        select(Period.id, Period.weekday, Period.start_time, Period.end_time)
+        .where(
+            Period.school_id == school_id,
+            Period.is_active == True,
+            func.coalesce(Period.period_type, "regular") == "regular",
+        )
+        .order_by(Period.weekday, Period.start_time)
+    )
+    return result.all()
+
+
+async def _default_teachers(db: AsyncSession, school_id: int, course_ids: set[int]) -> dict[int, int]:
+    """Course id -> staff id for courses with exactly one assigned teacher."""
+    result = await db.execute(
+        select(CourseTeacher.course_id, func.min(CourseTeacher.staff_id))
+        .where(CourseTeacher.school_id == school_id, CourseTeacher.course_id.in_(course_ids))
+        .group_by(CourseTeacher.course_id)
+        .having(func.count(func.distinct(CourseTeacher.staff_id)) == 1)
+    )
+    return dict(result.all())
+
+
+async def _class_sizes(
+    db: AsyncSession, school_id: int, academic_year_id: int, class_ids: set[int]
+) -> dict[int, int]:
+    result = await db.execute(
+        select(Enrollment.class_id, func.count())
+        .where(
+            Enrollment.school_id == school_id,
+            Enrollment.academic_year_id == academic_year_id,
+            Enrollment.class_id.in_(class_ids),
+            Enrollment.status == "active",
+        )
+        .group_by(Enrollment.class_id)
+    )
+    return dict(result.all())
+
+
+async def _teacher_periods(
+    db: AsyncSession, school_id: int, staff_ids: set[int], periods
+) -> dict[int, set[int]]:
+    """Periods each teacher can take, for teachers with availability rows.
+
+    A teacher with any "available" window is limited to periods inside one;
+    periods overlapping an "unavailable" window are always excluded.
+    """
+    result = await db.execute(
+        select(
+            TeacherAvailability.staff_id,
+            TeacherAvailability.weekday,
+            TeacherAvailability.start_time,
+            TeacherAvailability.end_time,
+            TeacherAvailability.availability_type,
+        ).where(
+            TeacherAvailability.school_id == school_id,
+            TeacherAvailability.staff_id.in_(staff_ids),
+        )
+    )
+    windows: dict[int, dict[str, list]] = {}
+    for staff_id, weekday, start, end, kind in result:
+        windows.setdefault(staff_id, {}).setdefault(kind, []).append((weekday, start, end))
+
+    allowed: dict[int, set[int]] = {}
+    for staff_id, by_kind in windows.items():
+        available = by_kind.get("available")
+        unavailable = by_kind.get("unavailable", [])
+        allowed[staff_id] = {
+            period_id
+            for period_id, weekday, start, end in periods
+            if (
+                available is None
+                or any(d == weekday and s <= start and end <= e for d, s, e in available)
+            )
+            and not any(d == weekday and s < end and start < e for d, s, e in unavailable)
+        }
+    return allowed
+
+
+async def _candidate_rooms(
+    db: AsyncSession, school_id: int
+) -> list[tuple[int, int | None, str | None]]:
+    result = await db.execute(
+        select(Room.id, Room.capacity, Room.room_type)
+        .where(Room.school_id == school_id, Room.is_active == True)
+        # Best fit first: smallest room that holds the class
+        .order_by(Room.capacity.is_(None), Room.capacity, Room.id)
+    )
+    return result.all()
+
+
+async def _taken_elsewhere(
+    db: AsyncSession, school_id: int, term_id: int, class_ids: set[int]
+) -> tuple[dict[int, tuple[int, ...]], dict[int, set[int]], dict[int, set[int]]]:
+    """Period overlaps, and the periods in which each teacher and room is taken.
+
+    Taken periods come from the term's active timetables of classes not in
+    `class_ids` (the request replaces those of its own classes) and include
+    every period overlapping an occupied one.
+    """
+    occupancy = await build_occupancy(db, school_id, term_id)
+    staff: dict[int, set[int]] = {}
+    rooms: dict[int, set[int]] = {}
+    for resources, period_id in occupancy.entries.values():
+        held = dict(resources)
+        if held["class"] in class_ids:
+            continue
+        blocked = occupancy.overlaps.get(period_id, (period_id,))
+        staff.setdefault(held["staff"], set()).update(blocked)
+        if "room" in held:
+            rooms.setdefault(held["room"], set()).update(blocked)
+    return occupancy.overlaps, staff, rooms
+
+
+async def build_problem(
+    db: AsyncSession, school_id: int, term_id: int, requirements: Sequence[dict[str, Any]]
+) -> tuple[
+    int, list[tuple[int, int]], list[Requirement], dict[int, set[int]],
+    dict[int, tuple[int, ...]], dict[int, set[int]],
+]:
+    """Turn requested course hours into solver input.
+
+    Each requirement is a dict with class_id, course_id, periods_per_week and
+    optional staff_id and room_type. Returns the term's academic year id,
+    the periods, the requirements, per-teacher allowed periods, period
+    overlaps and the periods in which rooms are already taken.
+    """
+    result = await db.execute(
+        select(Term.academic_year_id).where(Term.id == term_id, Term.school_id == school_id)
+    )
+    academic_year_id = result.scalar_one_or_none()
+    if academic_year_id is None:
+        raise ValueError("Term not found")
+    if not requirements:
+        raise ValueError("No course requirements given")
+
+    periods = await _teaching_periods(db, school_id)
+    if not periods:
+        raise ValueError("No active teaching periods defined")
+
+    class_ids = {r["class_id"] for r in requirements}
+    defaults = await _default_teachers(db, school_id, {r["course_id"] for r in requirements})
+    sizes = await _class_sizes(db, school_id, academic_year_id, class_ids)
+    rooms = await _candidate_rooms(db, school_id)
+
+    solver_requirements = []
+    for r in requirements:
+        if r["periods_per_week"] < 1:
+            raise ValueError(f"periods_per_week must be positive for course {r['course_id']}")
+        staff_id = r.get("staff_id") or defaults.get(r["course_id"])
+        if staff_id is None:
+            raise ValueError(
+                f"Course {r['course_id']} for class {r['class_id']} has no single assigned teacher; "
+                "pass staff_id"
+            )
+        room_ids: list[int] = []
+        if rooms:
+            room_types = (r["room_type"],) if r.get("room_type") else GENERAL_ROOM_TYPES
+            size = sizes.get(r["class_id"], 0)
+            room_ids = [
+                room_id
+                for room_id, capacity, room_type in rooms
+                if room_type in room_types and (capacity is None or capacity >= size)
+            ]
+            if not room_ids:
+                raise ValueError(
+                    f"No {r.get('room_type') or 'classroom'} room holds class {r['class_id']} "
+                    f"({size} students)"
+                )
+        solver_requirements.append(
+            Requirement(r["class_id"], r["course_id"], staff_id, r["periods_per_week"], room_ids)
+        )
+
+    staff_ids = {r.staff_id for r in solver_requirements}
+    teacher_periods = await _teacher_periods(db, school_id, staff_ids, periods)
+    overlaps, busy_staff, busy_rooms = await _taken_elsewhere(db, school_id, term_id, class_ids)
+    all_periods = {period_id for period_id, _, _, _ in periods}
+    for staff_id in staff_ids & busy_staff.keys():
+        teacher_periods[staff_id] = teacher_periods.get(staff_id, all_periods) - busy_staff[staff_id]
+    slots = [(period_id, weekday) for period_id, weekday, _, _ in periods]
+    return academic_year_id, slots, solver_requirements, teacher_periods, overlaps, busy_rooms
+
+
+async def save_timetables(
+    db: AsyncSession,
+    school_id: int,
+    term_id: int,
+    academic_year_id: int,
+    created_by: int,
+    name: str,
+    requirements: Sequence[Requirement],
+    solution: Solution,
+) -> dict[int, int]:
+    """Store the solution as one draft timetable per class; returns class id -> timetable id."""
+    timetables = {
+        class_id: Timetable(
+            school_id=school_id,
+            class_id=class_id,
+            term_id=term_id,
+            academic_year_id=academic_year_id,
+            name=name,
+            status="draft",
+            created_by=created_by,
+        )
+        for class_id in dict.fromkeys(r.class_id for r in requirements)
+    }
+    db.add_all(timetables.values())
+    await db.flush()
+
+    rows = []
+    for index, period_id, room_id in solution.placements:
+        requirement = requirements[index]
+        rows.append({
+            "school_id": school_id,
+            "timetable_id": timetables[requirement.class_id].id,
+            "period_id": period_id,
+            "course_id": requirement.course_id,
+            "staff_id": requirement.staff_id,
+            "room_id": room_id,
+        })
+    await bulk_insert(db, TimetableEntry.__table__, rows)
+    await db.commit()
+    return {class_id: timetable.id for class_id, timetable in timetables.items()}
+
+
+async def generate_timetables(
+    db: AsyncSession,
+    school_id: int,
+    term_id: int,
+    created_by: int,
+    requirements: Sequence[dict[str, Any]],
+    *,
+    name: str | None = None,
+    time_limit: float = 10.0,
+    progress: Callable[[int, int], None] | None = None,
+) -> dict[str, Any]:
+    academic_year_id, periods, solver_requirements, teacher_periods, overlaps, busy_rooms = (
+        await build_problem(db, school_id, term_id, requirements)
+    )
+    solution = solve(
+        periods, solver_requirements, teacher_periods,
+        overlaps=overlaps, busy_rooms=busy_rooms, time_limit=time_limit, progress=progress,
+    )
+    timetable_ids = await save_timetables(
+        db, school_id, term_id, academic_year_id, created_by,
+        name or "Generated timetable", solver_requirements, solution,
+    )
+
+    missing: dict[int, int] = {}
+    for index in solution.unplaced:
+        missing[index] = missing.get(index, 0) + 1
+    return {
+        "timetables": [
+            {"class_id": class_id, "timetable_id": timetable_id}
+            for class_id, timetable_id in timetable_ids.items()
+        ],
+        "placed": len(solution.placements),
+        "unplaced": [
+            {
+                "class_id": solver_requirements[index].class_id,
+                "course_id": solver_requirements[index].course_id,
+                "staff_id": solver_requirements[index].staff_id,
+                "periods": count,
+            }
+            for index, count in missing.items()
+        ],
+        "elapsed": round(solution.elapsed, 3),
+    }
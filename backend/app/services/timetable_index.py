@@ -0,0 +1,200 @@
+"""In-memory occupancy index for timetable clash checks.
+
+For each (school, term) the entries of the active timetables are indexed by
+(kind, resource id, period id), kind being "class", "staff" or "room".
+Periods that overlap in time on the same weekday are precomputed, so a
+clash check is a handful of dict lookups regardless of how many entries the
+term holds.
+
+Indexes are cached per process. Entry inserts, edits and deletes made
+through the ORM are applied to cached indexes on commit; timetable status
+changes and period edits drop the affected indexes so they are rebuilt on
+next use. Other workers pick changes up within `timetable_index_ttl`
+seconds; code writing entries of active timetables with Core statements
+must call `invalidate_occupancy` itself.
+"""
+from typing import Iterable
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..models.timetable import Period, Timetable, TimetableEntry
+
+ACTIVE_STATUS = "active"
+
+
+class OccupancyIndex:
+    __slots__ = ("overlaps", "timetables", "entries", "slots")
+
+    def __init__(self, overlaps: dict[int, tuple[int, ...]], timetables: dict[int, int]):
+        # period id -> ids of periods overlapping it (itself included)
+        self.overlaps = overlaps
+        # active timetable id -> class id
+        self.timetables = timetables
+        # entry id -> ((kind, resource id), ...), period id
+        self.entries: dict[int, tuple[tuple[tuple[str, int], ...], int]] = {}
+        # (kind, resource id, period id) -> entry ids
+        self.slots: dict[tuple[str, int, int], set[int]] = {}
+
+    def add(self, entry_id: int, timetable_id: int, period_id: int, staff_id: int, room_id: int | None) -> None:
+        # Also drops the entry when it moved to a timetable outside this index
+        self.remove(entry_id)
+        class_id = self.timetables.get(timetable_id)
+        if class_id is None:
+            return
+        resources = [("class", class_id), ("staff", staff_id)]
+        if room_id is not None:
+            resources.append(("room", room_id))
+        self.entries[entry_id] = (tuple(resources), period_id)
+        for kind, resource_id in resources:
+            self.slots.setdefault((kind, resource_id, period_id), set()).add(entry_id)
+
+    def remove(self, entry_id: int) -> None:
+        indexed = self.entries.pop(entry_id, None)
+        if indexed is None:
+            return
+        resources, period_id = indexed
+        for kind, resource_id in resources:
+            key = (kind, resource_id, period_id)
+            holders = self.slots.get(key)
+            if holders is not None:
+                holders.discard(entry_id)
+                if not holders:
+                    del self.slots[key]
+
+    def clashes(
+        self,
+        period_id: int,
+        class_id: int,
+        staff_id: int,
+        room_id: int | None = None,
+        ignore: Iterable[int] = (),
+    ) -> list[tuple[str, int]]:
+        """(kind, entry id) of indexed entries clashing with a proposed lesson."""
+        ignore = set(ignore)
+        resources = [("class", class_id), ("staff", staff_id)]
+        if room_id is not None:
+            resources.append(("room", room_id))
+        found = []
+        for other_period in self.overlaps.get(period_id, (period_id,)):
+            for kind, resource_id in resources:
+                for entry_id in self.slots.get((kind, resource_id, other_period), ()):
+                    if entry_id not in ignore:
+                        found.append((kind, entry_id))
+        return found
+
+
+def _period_overlaps(periods) -> dict[int, tuple[int, ...]]:
+    by_day: dict[int, list] = {}
+    for period_id, weekday, start, end in periods:
+        by_day.setdefault(weekday, []).append((period_id, start, end))
+    overlaps = {}
+    for day_periods in by_day.values():
+        for period_id, start, end in day_periods:
+            overlaps[period_id] = tuple(
+                other for other, other_start, other_end in day_periods
+                if other_start < end and start < other_end
+            ) or (period_id,)
+    return overlaps
+
+
+async def build_occupancy(db: AsyncSession, school_id: int, term_id: int) -> OccupancyIndex:
+    """Load the index for one term with three queries."""
+    result = await db.execute(
+        select(Period.id, Period.weekday, Period.start_time, Period.end_time).where(
+            Period.school_id == school_id, Period.is_active == True
+        )
+    )
+    overlaps = _period_overlaps(result.all())
+
+    result = await db.execute(
+        select(Timetable.id, Timetable.class_id).where(
+            Timetable.school_id == school_id,
+            Timetable.term_id == term_id,
+            Timetable.status == ACTIVE_STATUS,
+        )
+    )
+    index = OccupancyIndex(overlaps, dict(result.all()))
+    if not index.timetables:
+        return index
+
+    result = await db.execute(
+        select(
+            TimetableEntry.id,
+            TimetableEntry.timetable_id,
+            TimetableEntry.period_id,
+            TimetableEntry.staff_id,
+            TimetableEntry.room_id,
+        ).where(
+            TimetableEntry.school_id == school_id,
+            TimetableEntry.timetable_id.in_(index.timetables),
+        )
+    )
+    for row in result:
+        index.add(*row)
+    return index
+
+
+_cache = TTLCache(maxsize=settings.timetable_index_size, ttl=settings.timetable_index_ttl)
+
+
+async def get_occupancy(db: AsyncSession, school_id: int, term_id: int) -> OccupancyIndex:
+    index = _cache.get((school_id, term_id))
+    if index is None:
+        index = await build_occupancy(db, school_id, term_id)
+        _cache.set((school_id, term_id), index)
+    return index
+
+
+def invalidate_occupancy(school_id: int, term_id: int | None = None) -> None:
+    """Drop the index of one term, or of every term of the school if None."""
+    for key in _cache.keys():
+        if key[0] == school_id and (term_id is None or key[1] == term_id):
+            _cache.delete(key)
+
+
+def _cached_for_school(school_id: int) -> list[OccupancyIndex]:
+    indexes = (_cache.peek(key) for key in _cache.keys() if key[0] == school_id)
+    return [index for index in indexes if index is not None]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_timetable_changes(session, flush_context):
+    changes = session.info.setdefault("timetable_changes", [])
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, TimetableEntry):
+            changes.append(("entry", obj.school_id, obj.id, obj.timetable_id, obj.period_id, obj.staff_id, obj.room_id))
+        elif isinstance(obj, Timetable):
+            changes.append(("drop", obj.school_id, obj.term_id))
+        elif isinstance(obj, Period):
+            changes.append(("drop", obj.school_id, None))
+    for obj in session.deleted:
+        if isinstance(obj, TimetableEntry):
+            changes.append(("delete", obj.school_id, obj.id))
+        elif isinstance(obj, Timetable):
+            changes.append(("drop", obj.school_id, obj.term_id))
+        elif isinstance(obj, Period):
+            changes.append(("drop", obj.school_id, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_timetable_changes(session):
+    changes = session.info.pop("timetable_changes", None)
+    for change in changes or ():
+        kind, school_id = change[0], change[1]
+        if kind == "drop":
+            invalidate_occupancy(school_id, change[2])
+            continue
+        for index in _cached_for_school(school_id):
+            if kind == "entry":
+                index.add(*change[2:])
+            else:
+                index.remove(change[2])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_timetable_changes(session):
+    session.info.pop("timetable_changes", None)
@@ -0,0 +1,305 @@
+"""Weekly timetable solver.
+
+Works on plain integers and has no database dependency. Periods are
+numbered 0..S-1 and every class, teacher and room carries a bitmask of the
+periods it occupies (bit s set = busy in period s), so checking a placement
+is a few ANDs. Periods that overlap in time (parallel period sets) conflict
+with each other: a busy mask is widened to every period it overlaps before
+it is tested. Each requirement ("class X takes course Y with teacher Z for
+N periods a week") is expanded into N lessons.
+
+Lessons are placed most-constrained first (fewest allowed periods, busiest
+teacher and class), preferring days on which the same class/course has no
+lesson yet. A lesson with no free period is forced into the period where it
+clashes with the fewest placed lessons; those are ejected and re-queued,
+and a short tabu list stops them from moving straight back. Search stops
+when everything is placed or the time/iteration budget runs out, in which
+case the remaining lessons are reported as unplaced.
+"""
+import random
+import time
+from collections import deque
+from typing import Callable, Iterable, Iterator, Sequence
+
+TABU_TENURE = 10
+PROGRESS_EVERY = 250
+
+
+class Requirement:
+    __slots__ = ("class_id", "course_id", "staff_id", "periods", "room_ids")
+
+    def __init__(
+        self,
+        class_id: int,
+        course_id: int,
+        staff_id: int,
+        periods: int,
+        room_ids: Sequence[int] = (),
+    ):
+        self.class_id = class_id
+        self.course_id = course_id
+        self.staff_id = staff_id
+        self.periods = periods
+        # Acceptable rooms, best fit first; empty when no room is needed
+        self.room_ids = tuple(room_ids)
+
+
+class Solution:
+    __slots__ = ("placements", "unplaced", "iterations", "elapsed")
+
+    def __init__(
+        self,
+        placements: list[tuple[int, int, int | None]],
+        unplaced: list[int],
+        iterations: int,
+        elapsed: float,
+    ):
+        # (requirement index, period id, room id)
+        self.placements = placements
+        # One requirement index per lesson that could not be placed
+        self.unplaced = unplaced
+        self.iterations = iterations
+        self.elapsed = elapsed
+
+    @property
+    def complete(self) -> bool:
+        return not self.unplaced
+
+
+def _bits(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _index(values) -> dict[int, int]:
+    return {value: i for i, value in enumerate(dict.fromkeys(values))}
+
+
+def solve(
+    periods: Sequence[tuple[int, int]],
+    requirements: Sequence[Requirement],
+    teacher_periods: dict[int, set[int]] | None = None,
+    *,
+    overlaps: dict[int, Iterable[int]] | None = None,
+    busy_rooms: dict[int, set[int]] | None = None,
+    time_limit: float = 10.0,
+    max_iterations: int | None = None,
+    seed: int = 0,
+    progress: Callable[[int, int], None] | None = None,
+) -> Solution:
+    """Place every lesson of `requirements` into `periods`.
+
+    `periods` lists (period_id, weekday) in timetable order.
+    `teacher_periods` maps staff ids to the period ids they can teach;
+    teachers not listed are available in every period. `overlaps` maps
+    period ids to the period ids overlapping them in time; periods not
+    listed only conflict with themselves. `busy_rooms` maps room ids to the
+    period ids in which they are already taken. `progress` is called with
+    (placed, total) lessons every few hundred steps.
+    """
+    started = time.monotonic()
+    rng = random.Random(seed)
+    slot_count = len(periods)
+    full = (1 << slot_count) - 1
+    slot_of_period = {period_id: s for s, (period_id, _) in enumerate(periods)}
+
+    def slot_mask(period_ids: Iterable[int]) -> int:
+        mask = 0
+        for period_id in period_ids:
+            if period_id in slot_of_period:
+                mask |= 1 << slot_of_period[period_id]
+        return mask
+
+    # Slots each slot conflicts with, itself included
+    conflicts = [
+        slot_mask((overlaps or {}).get(period_id, ())) | 1 << s for s, (period_id, _) in enumerate(periods)
+    ]
+    overlapping = any(mask != 1 << s for s, mask in enumerate(conflicts))
+
+    def blocked(mask: int) -> int:
+        """Slots conflicting with any slot of `mask`."""
+        if not overlapping:
+            return mask
+        widened = 0
+        for s in _bits(mask):
+            widened |= conflicts[s]
+        return widened
+
+    day_masks: dict[int, int] = {}
+    for s, (_, weekday) in enumerate(periods):
+        day_masks[weekday] = day_masks.get(weekday, 0) | (1 << s)
+    slot_day = [weekday for _, weekday in periods]
+
+    class_index = _index(r.class_id for r in requirements)
+    teacher_index = _index(r.staff_id for r in requirements)
+    room_index = _index(room_id for r in requirements for room_id in r.room_ids)
+    room_ids = list(room_index)
+
+    teacher_allowed = [full] * len(teacher_index)
+    for staff_id, period_ids in (teacher_periods or {}).items():
+        if staff_id in teacher_index:
+            teacher_allowed[teacher_index[staff_id]] = slot_mask(period_ids)
+    room_taken = [slot_mask((busy_rooms or {}).get(room_id, ())) for room_id in room_ids]
+
+    # Lessons, one per period a requirement asks for
+    lesson_req: list[int] = []
+    for r, requirement in enumerate(requirements):
+        lesson_req.extend([r] * requirement.periods)
+    lesson_count = len(lesson_req)
+    lesson_class = [class_index[requirements[r].class_id] for r in lesson_req]
+    lesson_teacher = [teacher_index[requirements[r].staff_id] for r in lesson_req]
+    lesson_rooms = [tuple(room_index[i] for i in requirements[r].room_ids) for r in lesson_req]
+    lesson_allowed = [teacher_allowed[t] for t in lesson_teacher]
+    for u, rooms in enumerate(lesson_rooms):
+        if rooms:
+            # Slots in which every acceptable room is already taken
+            taken = full
+            for room in rooms:
+                taken &= room_taken[room]
+            lesson_allowed[u] &= ~taken
+
+    class_busy = [0] * len(class_index)
+    teacher_busy = [0] * len(teacher_index)
+    room_busy = [0] * len(room_index)
+    class_at = [[-1] * slot_count for _ in class_index]
+    teacher_at = [[-1] * slot_count for _ in teacher_index]
+    room_at = [[-1] * slot_count for _ in room_index]
+    # Lessons of each requirement per weekday, to spread them over the week
+    req_days = [dict.fromkeys(day_masks, 0) for _ in requirements]
+    slot_of = [-1] * lesson_count
+    room_of = [-1] * lesson_count
+
+    def place(u: int, s: int, room: int) -> None:
+        bit = 1 << s
+        c, t = lesson_class[u], lesson_teacher[u]
+        class_busy[c] |= bit
+        teacher_busy[t] |= bit
+        class_at[c][s] = u
+        teacher_at[t][s] = u
+        if room >= 0:
+            room_busy[room] |= bit
+            room_at[room][s] = u
+        req_days[lesson_req[u]][slot_day[s]] += 1
+        slot_of[u], room_of[u] = s, room
+
+    def remove(u: int) -> None:
+        s, room = slot_of[u], room_of[u]
+        bit = ~(1 << s)
+        c, t = lesson_class[u], lesson_teacher[u]
+        class_busy[c] &= bit
+        teacher_busy[t] &= bit
+        class_at[c][s] = -1
+        teacher_at[t][s] = -1
+        if room >= 0:
+            room_busy[room] &= bit
+            room_at[room][s] = -1
+        req_days[lesson_req[u]][slot_day[s]] -= 1
+        slot_of[u], room_of[u] = -1, -1
+
+    def free_room(u: int, s: int) -> int:
+        for room in lesson_rooms[u]:
+            if not (room_busy[room] & conflicts[s] or room_taken[room] >> s & 1):
+                return room
+        return -1
+
+    def free_slots(u: int) -> int:
+        free = lesson_allowed[u] & ~blocked(class_busy[lesson_class[u]])
+        free &= ~blocked(teacher_busy[lesson_teacher[u]])
+        if lesson_rooms[u]:
+            rooms_free = 0
+            for room in lesson_rooms[u]:
+                rooms_free |= ~(blocked(room_busy[room]) | room_taken[room])
+            free &= rooms_free
+        return free & full
+
+    def pick(u: int, free: int) -> int:
+        days = req_days[lesson_req[u]]
+        unused = 0
+        for weekday, count in days.items():
+            if not count:
+                unused |= day_masks[weekday]
+        candidates = list(_bits(free & unused or free))
+        return rng.choice(candidates)
+
+    def occupants(at: list[int], s: int) -> set[int]:
+        return {at[other] for other in _bits(conflicts[s]) if at[other] >= 0}
+
+    def clashes(u: int, s: int) -> set[int]:
+        found = occupants(class_at[lesson_class[u]], s) | occupants(teacher_at[lesson_teacher[u]], s)
+        if lesson_rooms[u] and free_room(u, s) < 0:
+            # Free the best-fit room unless the clashing lessons already
+            # vacate one; rooms taken before solving cannot be freed
+            held = [
+                occupants(room_at[room], s)
+                for room in lesson_rooms[u]
+                if not room_taken[room] >> s & 1
+            ]
+            if not any(holders <= found for holders in held):
+                found |= held[0]
+        return found
+
+    load_teacher = [0] * len(teacher_index)
+    load_class = [0] * len(class_index)
+    for u in range(lesson_count):
+        load_teacher[lesson_teacher[u]] += 1
+        load_class[lesson_class[u]] += 1
+    order = sorted(
+        (u for u in range(lesson_count) if lesson_allowed[u]),
+        key=lambda u: (
+            lesson_allowed[u].bit_count() - load_teacher[lesson_teacher[u]],
+            len(lesson_rooms[u]) or len(room_index) + 1,
+            -load_class[lesson_class[u]],
+            lesson_req[u],
+        ),
+    )
+    impossible = [u for u in range(lesson_count) if not lesson_allowed[u]]
+
+    queue = deque(order)
+    tabu: dict[tuple[int, int], int] = {}
+    limit = max_iterations if max_iterations is not None else 200 * max(lesson_count, 1)
+    iteration = 0
+    deadline = started + time_limit
+    while queue and iteration < limit:
+        iteration += 1
+        if iteration % PROGRESS_EVERY == 0:
+            if progress is not None:
+                progress(lesson_count - len(queue) - len(impossible), lesson_count)
+            if time.monotonic() > deadline:
+                break
+
+        u = queue.popleft()
+        free = free_slots(u)
+        if free:
+            s = pick(u, free)
+            place(u, s, free_room(u, s))
+            continue
+
+        best, best_cost, best_clashes = -1, None, ()
+        for s in _bits(lesson_allowed[u]):
+            if tabu.get((u, s), 0) > iteration:
+                continue
+            found = clashes(u, s)
+            cost = len(found) + rng.random()
+            if best_cost is None or cost < best_cost:
+                best, best_cost, best_clashes = s, cost, found
+        if best < 0:
+            best = rng.choice(list(_bits(lesson_allowed[u])))
+            best_clashes = clashes(u, best)
+        for v in best_clashes:
+            tabu[(v, slot_of[v])] = iteration + TABU_TENURE
+            remove(v)
+            queue.append(v)
+        place(u, best, free_room(u, best))
+
+    if progress is not None:
+        progress(lesson_count - len(queue) - len(impossible), lesson_count)
+
+    placements = [
+        (lesson_req[u], periods[slot_of[u]][0], room_ids[room_of[u]] if room_of[u] >= 0 else None)
+        for u in range(lesson_count)
+        if slot_of[u] >= 0
+    ]
+    unplaced = sorted(lesson_req[u] for u in (*queue, *impossible))
+    return Solution(placements, unplaced, iteration, time.monotonic() - started)
@@ -0,0 +1,13 @@
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from .. import models  # noqa: F401  (registers every mapper for relationship lookups)
+from ..core.config import settings
+from ..db.tenant import make_tenant_sessionmaker, tenant_connect_args
+
+# Tasks run each job in its own event loop, so connections must not outlive it
+engine = create_async_engine(
+    settings.database_url, poolclass=NullPool, connect_args=tenant_connect_args(settings.database_url)
+)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+TenantSessionLocal = make_tenant_sessionmaker(engine)
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import date
+from typing import Any
+
+from sqlalchemy import select
+
+from ..celery_app import celery_app
+from ..db.tenant import tenant_scope
+from ..models.calendar import AcademicYear
+from ..models.school import School
+from ..services.finance_rollups import rebuild_rollups
+from ..services.invoicing import generate_invoices as run_invoice_generation
+from ..services.overdue import sweep_overdue
+from .db import SessionLocal, TenantSessionLocal
+
+
+async def _generate_invoices(task, school_id: int, created_by: int, payload: dict[str, Any]) -> dict[str, Any]:
+    def progress(done: int, total: int) -> None:
+        task.update_state(
+            state="PROGRESS", meta={"school_id": school_id, "done": done, "total": total}
+        )
+
+    async with tenant_scope(TenantSessionLocal, school_id) as db:
+        result = await run_invoice_generation(
+            db,
+            school_id,
+            payload["term_id"],
+            created_by,
+            due_date=date.fromisoformat(payload["due_date"]),
+            issue_date=date.fromisoformat(payload["issue_date"]) if payload.get("issue_date") else None,
+            class_id=payload.get("class_id"),
+            include_optional=payload.get("include_optional", False),
+            progress=progress,
+        )
+    return {"school_id": school_id, **result}
+
+
+@celery_app.task(bind=True)
+def generate_invoices(self, school_id: int, created_by: int, payload: dict[str, Any]) -> dict[str, Any]:
+    """Invoice a term's enrolled students; reports PROGRESS with done/total invoices."""
+    return asyncio.run(_generate_invoices(self, school_id, created_by, payload))
+
+
+async def _reconcile_rollups() -> dict[str, int]:
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(AcademicYear.school_id, AcademicYear.id).where(AcademicYear.is_current == True)
+        )
+        years = result.all()
+
+    rows = 0
+    for school_id, academic_year_id in years:
+        # One transaction per school year: dashboards never see a half-built year
+        async with tenant_scope(TenantSessionLocal, school_id) as db:
+            rows += await rebuild_rollups(db, school_id, academic_year_id)
+            await db.commit()
+    return {"academic_years": len(years), "rows": rows}
+
+
+@celery_app.task
+def reconcile_finance_rollups() -> dict[str, int]:
+    """Rebuild the finance rollups of every current academic year (nightly)."""
+    return asyncio.run(_reconcile_rollups())
+
+
+async def _sweep_overdue() -> dict[str, Any]:
+    async with SessionLocal() as db:
+        school_ids = list((await db.execute(select(School.id).order_by(School.id))).scalars())
+
+    totals = {"schools": len(school_ids), "invoices": 0, "installments": 0, "reminders": 0}
+    for school_id in school_ids:
+        async with tenant_scope(TenantSessionLocal, school_id) as db:
+            swept = await sweep_overdue(db, school_id)
+        for key in ("invoices", "installments", "reminders"):
+            totals[key] += swept[key]
+    return totals
+
+
+@celery_app.task
+def sweep_overdue_fees() -> dict[str, Any]:
+    """Mark newly overdue invoices/installments, charge late fees and queue reminders."""
+    return asyncio.run(_sweep_overdue())
+
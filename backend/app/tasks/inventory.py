@@ -0,0 +1,30 @@
+import asyncio
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from ..celery_app import celery_app
+from ..db.tenant import tenant_scope
+from ..models.school import School
+from ..services.stock_alerts import rebuild_alerts
+from ..services.stock_snapshots import take_snapshot
+from .db import SessionLocal, TenantSessionLocal
+
+
+async def _snapshot(day: date) -> dict[str, int]:
+    async with SessionLocal() as db:
+        school_ids = list((await db.execute(select(School.id).order_by(School.id))).scalars())
+
+    totals = {"schools": len(school_ids), "snapshots": 0, "alerts": 0}
+    for school_id in school_ids:
+        async with tenant_scope(TenantSessionLocal, school_id) as db:
+            totals["snapshots"] += await take_snapshot(db, school_id, day)
+            totals["alerts"] += await rebuild_alerts(db, school_id)
+            await db.commit()
+    return totals
+
+
+@celery_app.task
+def snapshot_inventories(day: str | None = None) -> dict[str, int]:
+    """Store each inventory's valuation and movements for `day` (ISO date, default yesterday) and rebuild stock alerts."""
+    return asyncio.run(_snapshot(date.fromisoformat(day) if day else date.today() - timedelta(days=1)))
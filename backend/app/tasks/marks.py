@@ -0,0 +1,16 @@
+import asyncio
+
+from ..celery_app import celery_app
+from ..services.mark_recompute import drain_recomputes
+from .db import SessionLocal
+
+
+async def _recompute() -> int:
+    async with SessionLocal() as db:
+        return await drain_recomputes(db)
+
+
+@celery_app.task
+def recompute_mark_reports() -> int:
+    """Recompute the mark reports queued by mark edits."""
+    return asyncio.run(_recompute())
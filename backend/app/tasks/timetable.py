@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any
+
+from ..celery_app import celery_app
+from ..db.tenant import tenant_scope
+from ..services.timetable_generator import generate_timetables
+from .db import TenantSessionLocal
+
+
+async def _generate(task, school_id: int, created_by: int, payload: dict[str, Any]) -> dict[str, Any]:
+    def progress(done: int, total: int) -> None:
+        task.update_state(
+            state="PROGRESS", meta={"school_id": school_id, "done": done, "total": total}
+        )
+
+    async with tenant_scope(TenantSessionLocal, school_id) as db:
+        result = await generate_timetables(
+            db,
+            school_id,
+            payload["term_id"],
+            created_by,
+            payload["requirements"],
+            name=payload.get("name"),
+            time_limit=payload.get("time_limit", 10.0),
+            progress=progress,
+        )
+    return {"school_id": school_id, **result}
+
+
+@celery_app.task(bind=True)
+def generate_timetable(self, school_id: int, created_by: int, payload: dict[str, Any]) -> dict[str, Any]:
+    """Generate draft timetables for a term; reports PROGRESS with done/total lessons."""
+    return asyncio.run(_generate(self, school_id, created_by, payload))
@@ -0,0 +1,107 @@
+"""Timetable solver on a synthetic school.
+
+Builds a school with `--classes` classes over a 5-day week of 8 periods.
+Each class takes 10 courses (34 periods a week) in its home room, science
+needs one of a few shared labs, each teacher covers one subject for up to
+six classes and a fifth of the teachers are unavailable one day a week.
+`--parallel` adds a second set of periods offset by half a period, each
+overlapping two periods of the first set:
+
+    python benchmarks/timetable_solver.py --classes 60 --parallel
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.timetable_solver import Requirement, solve  # noqa: E402
+
+DAYS = 5
+PERIODS_PER_DAY = 8
+# (subject, periods per week, needs a lab)
+SUBJECTS = [
+    ("math", 5, False), ("english", 5, False), ("science", 4, True),
+    ("kinyarwanda", 4, False), ("french", 3, False), ("history", 3, False),
+    ("geography", 3, False), ("ict", 3, False), ("arts", 2, False), ("sport", 2, False),
+]
+CLASSES_PER_TEACHER = 6
+
+
+def build_periods(parallel: bool):
+    periods = [(d * PERIODS_PER_DAY + p + 1, d) for d in range(DAYS) for p in range(PERIODS_PER_DAY)]
+    overlaps = {}
+    if parallel:
+        for period_id, day in list(periods):
+            shifted = 1000 + period_id
+            periods.append((shifted, day))
+            # Starts half-way through period_id and ends half-way through the next one
+            following = [period_id + 1] if (period_id - 1) % PERIODS_PER_DAY < PERIODS_PER_DAY - 1 else []
+            overlaps[shifted] = {shifted, period_id, *following}
+            overlaps.setdefault(period_id, {period_id}).add(shifted)
+            for other in following:
+                overlaps.setdefault(other, {other}).add(shifted)
+        periods.sort(key=lambda period: (period[1], period[0] % 1000, period[0]))
+    return periods, overlaps
+
+
+def build_school(classes: int, seed: int, parallel: bool = False):
+    rng = random.Random(seed)
+    periods, overlaps = build_periods(parallel)
+    labs_needed = -(-classes * sum(h for _, h, lab in SUBJECTS if lab) // (DAYS * PERIODS_PER_DAY - 6))
+    labs = [10_000 + i for i in range(labs_needed)]
+
+    requirements = []
+    teacher_periods = {}
+    staff_id = 0
+    for course_id, (_, hours, lab) in enumerate(SUBJECTS, start=1):
+        for class_id in range(1, classes + 1):
+            if (class_id - 1) % CLASSES_PER_TEACHER == 0:
+                staff_id += 1
+                if rng.random() < 0.2:
+                    day_off = rng.randrange(DAYS)
+                    teacher_periods[staff_id] = {pid for pid, day in periods if day != day_off}
+            rooms = labs if lab else [class_id]
+            requirements.append(Requirement(class_id, course_id, staff_id, hours, rooms))
+    return periods, overlaps, requirements, teacher_periods
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--classes", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--time-limit", type=float, default=10.0)
+    parser.add_argument("--parallel", action="store_true")
+    args = parser.parse_args()
+
+    periods, overlaps, requirements, teacher_periods = build_school(args.classes, args.seed, args.parallel)
+    solution = solve(
+        periods, requirements, teacher_periods,
+        overlaps=overlaps, time_limit=args.time_limit, seed=args.seed,
+    )
+    lessons = sum(r.periods for r in requirements)
+    print(
+        f"classes={args.classes} lessons={lessons} placed={len(solution.placements)} "
+        f"unplaced={len(solution.unplaced)} iterations={solution.iterations} "
+        f"elapsed={solution.elapsed:.2f}s"
+    )
+
+    # Independent check of the hard constraints
+    seen = set()
+    for r, period_id, room_id in solution.placements:
+        req = requirements[r]
+        for key in (("class", req.class_id), ("staff", req.staff_id), ("room", room_id)):
+            if key[1] is None:
+                continue
+            for other in overlaps.get(period_id, (period_id,)):
+                assert (key, other) not in seen, f"double booking {key} in periods {period_id} and {other}"
+            seen.add((key, period_id))
+        allowed = teacher_periods.get(req.staff_id)
+        assert allowed is None or period_id in allowed, "teacher unavailable"
+        assert room_id in req.room_ids
+    print("constraints ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 from typing import Optional, Annotated
+import uuid
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from app.core.database import get_async_session
-from app.core.security import decode_token
-from app.models.user import User
+from app.core import tokens
+from app.core.identity import get_user_snapshot, get_school_by_id, get_school_by_slug
+from app.models.user import User, UserStatus
 from app.models.school import School
 
 # Security scheme
@@ -16,11 +17,14 @@ async def get_current_user(
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
     db: AsyncSession = Depends(get_async_session)
 ) -> User:
-    """Get the current authenticated user from JWT token"""
-    token = credentials.credentials
-    
-    # Decode token
-    payload = decode_token(token)
+    """Get the current authenticated user from JWT token
+
+    A token that verifies and is not revoked belongs to an active user (see
+    app.core.tokens), so the user is built from its claims without touching
+    Redis or the database. It is a read-only User carrying id, school_id and
+    email only; load anything else with get_user_snapshot.
+    """
+    payload = tokens.validate(credentials.credentials)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -28,39 +32,30 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Check token type
-    if payload.get("type") != "access":
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token type",
-        )
-    
-    # Get user from database
-    user_id = payload.get("sub")
-    if not user_id:
+    try:
+        user_id = uuid.UUID(payload["sub"])
+        school_id = uuid.UUID(payload["school_id"])
+    except (KeyError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token payload",
         )
     
-    result = await db.execute(
-        select(User).where(User.id == user_id)
-    )
-    user = result.scalar_one_or_none()
+    if not tokens.revocations.loaded:
+        # Revocations never loaded (Redis unreachable): check the status instead
+        snapshot = await get_user_snapshot(db, str(user_id))
+        if not snapshot:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        if snapshot.user.status != UserStatus.ACTIVE:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="User account is not active",
+            )
     
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
-    
-    if user.status != "active":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User account is not active",
-        )
-    
-    return user
+    return User(id=user_id, school_id=school_id, email=payload.get("email"), status=UserStatus.ACTIVE)
 
 
 async def get_current_active_user(
@@ -81,18 +76,18 @@ async def get_current_school(
     current_user: User = Depends(get_current_user)
 ) -> Optional[School]:
     """Get the current school from tenant context"""
-    # Get tenant slug from request state (set by middleware)
+    # School id resolved by TenantMiddleware from the tenant registry
+    tenant_id = getattr(request.state, "tenant_id", None)
     tenant_slug = getattr(request.state, "tenant_slug", None)
     
-    if not tenant_slug:
+    if tenant_id:
+        school = await get_school_by_id(db, uuid.UUID(tenant_id))
+    elif tenant_slug:
+        # Registry not loaded yet: look the slug up
+        school = await get_school_by_slug(db, tenant_slug)
+    else:
         # Try to get from user's school
-        return await db.get(School, current_user.school_id)
-    
-    # Get school by slug
-    result = await db.execute(
-        select(School).where(School.slug == tenant_slug)
-    )
-    school = result.scalar_one_or_none()
+        return await get_school_by_id(db, current_user.school_id)
     
     if not school:
         raise HTTPException(
@@ -1,68 +1,54 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
-import time
-import redis.asyncio as redis
-from app.core.config import settings
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.rate_limit import RateLimiter, quotas_for
 
+# Paths not rate limited
+SKIP_PATHS = ("/health", "/metrics")
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware using Redis"""
+
+class RateLimitMiddleware:
+    """Rate limiting middleware: per-user/IP, per-tenant and per-route quotas (see app.core.rate_limit)
+
+    Plain ASGI: reads the Authorization header from the scope and adds the
+    rate limit headers to the response start message, so responses (streaming
+    ones included) pass through untouched.
+    """
     
-    def __init__(self, app):
-        super().__init__(app)
-        self.redis_client = None
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.limiter = RateLimiter()
+        
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"].startswith(SKIP_PATHS):
+            await self.app(scope, receive, send)
+            return
         
-    async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for certain paths
-        skip_paths = ["/health", "/metrics"]
-        if any(request.url.path.startswith(path) for path in skip_paths):
-            return await call_next(request)
+        # Identify the client by its (verified) token, else by IP address
+        token = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, credentials = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer":
+                    token = credentials
+                break
+        client = scope.get("client")
+        quotas = quotas_for(scope["path"], client[0] if client else "unknown", token)
         
-        # Initialize Redis client if not already done
-        if not self.redis_client:
-            try:
-                self.redis_client = await redis.from_url(settings.REDIS_URL)
-            except Exception:
-                # If Redis is not available, skip rate limiting
-                return await call_next(request)
+        result = await self.limiter.check(quotas)
+        if not result.allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Rate limit exceeded. Please try again later."},
+                headers=result.headers(),
+            )
+            await response(scope, receive, send)
+            return
         
-        # Get client identifier (IP address or user ID)
-        client_id = request.client.host if request.client else "unknown"
+        headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in result.headers().items()]
         
-        # Create rate limit key
-        key = f"rate_limit:{client_id}:{int(time.time() // settings.RATE_LIMIT_PERIOD)}"
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *headers]
+            await send(message)
         
-        try:
-            # Check and increment counter
-            current = await self.redis_client.incr(key)
-            
-            # Set expiry on first request
-            if current == 1:
-                await self.redis_client.expire(key, settings.RATE_LIMIT_PERIOD)
-            
-            # Check if limit exceeded
-            if current > settings.RATE_LIMIT_REQUESTS:
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Rate limit exceeded. Please try again later."},
-                    headers={
-                        "X-RateLimit-Limit": str(settings.RATE_LIMIT_REQUESTS),
-                        "X-RateLimit-Remaining": "0",
-                        "X-RateLimit-Reset": str(int(time.time()) + settings.RATE_LIMIT_PERIOD),
-                    },
-                )
-            
-            # Process request
-            response = await call_next(request)
-            
-            # Add rate limit headers
-            response.headers["X-RateLimit-Limit"] = str(settings.RATE_LIMIT_REQUESTS)
-            response.headers["X-RateLimit-Remaining"] = str(settings.RATE_LIMIT_REQUESTS - current)
-            response.headers["X-RateLimit-Reset"] = str(int(time.time()) + settings.RATE_LIMIT_PERIOD)
-            
-            return response
-            
-        except Exception:
-            # If Redis fails, allow the request
-            return await call_next(request)
\ No newline at end of file
+        await self.app(scope, receive, send_with_headers)
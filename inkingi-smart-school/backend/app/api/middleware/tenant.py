@@ -1,37 +1,89 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Optional, Tuple
 from starlette.responses import JSONResponse
-import re
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.config import settings
+from app.core.tenants import Tenant, tenant_registry
 
+# Paths served without a tenant; "/" only matches exactly
+SKIP_PATHS = (
+    "/health", "/metrics", "/api/v1/auth/login", "/api/v1/auth/register",
+    f"{settings.API_PREFIX}/docs", f"{settings.API_PREFIX}/redoc", f"{settings.API_PREFIX}/openapi.json",
+)
+# Subdomains that are not tenants
+RESERVED_SUBDOMAINS = {"www", "api", "app"}
+BASE_DOMAINS = [domain.strip().lower() for domain in settings.TENANT_BASE_DOMAINS.split(",") if domain.strip()]
 
-class TenantMiddleware(BaseHTTPMiddleware):
-    """Extract and validate tenant from subdomain or header"""
+
+def tenant_from_headers(headers) -> Tuple[Optional[Tenant], Optional[str]]:
+    """(registered tenant, requested slug) for a request
+
+    The tenant is looked up by custom domain, then by the subdomain of a
+    TENANT_BASE_DOMAINS domain (school1.app.com) or, for any other host, the
+    X-Tenant-ID header. The slug is None when the request names no tenant.
+    """
+    host = header = None
+    for name, value in headers:
+        if name == b"host":
+            host = value.decode("latin-1").rsplit(":", 1)[0].lower()
+        elif name == b"x-tenant-id":
+            header = value.decode("latin-1")
     
-    async def dispatch(self, request: Request, call_next):
-        # Skip tenant check for certain paths
-        skip_paths = ["/", "/health", "/metrics", "/api/v1/auth/login", "/api/v1/auth/register"]
-        if any(request.url.path.startswith(path) for path in skip_paths):
-            return await call_next(request)
-        
-        # Try to extract tenant from subdomain
-        host = request.headers.get("host", "")
-        tenant_slug = None
-        
-        # Check subdomain (e.g., school1.app.com)
-        if "." in host:
-            subdomain = host.split(".")[0]
-            if subdomain and subdomain not in ["www", "api", "app"]:
-                tenant_slug = subdomain
+    if host:
+        tenant = tenant_registry.by_host(host)
+        if tenant:
+            return tenant, tenant.slug
+    
+    slug = None
+    if host:
+        for base in BASE_DOMAINS:
+            subdomain = host[:-len(base) - 1] if host.endswith("." + base) else ""
+            if subdomain and "." not in subdomain and subdomain not in RESERVED_SUBDOMAINS:
+                slug = subdomain
+                break
+    if not slug:
+        slug = header
+    return (tenant_registry.get(slug) if slug else None), slug
+
+
+class TenantMiddleware:
+    """Extract and validate tenant from custom domain, subdomain or header
+
+    Plain ASGI: parses the raw headers in the scope and resolves the tenant
+    from the in-process registry (see app.core.tenants), rejecting unknown
+    and suspended schools before any database work. The slug and school id
+    go into the scope state, read as `request.state.tenant_slug` and
+    `request.state.tenant_id`.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if path == "/" or path.startswith(SKIP_PATHS):
+            await self.app(scope, receive, send)
+            return
         
-        # Check X-Tenant-ID header (for API clients)
-        if not tenant_slug:
-            tenant_slug = request.headers.get("x-tenant-id")
+        tenant, slug = tenant_from_headers(scope["headers"])
+        state = scope.setdefault("state", {})
+        state["tenant_slug"] = slug
+        state["tenant_id"] = None
         
-        # Store in request state for later use
-        request.state.tenant_slug = tenant_slug
+        # Without a loaded registry, leave the lookup to get_current_school
+        if slug and tenant_registry.loaded:
+            if tenant is None:
+                response = JSONResponse(status_code=404, content={"detail": "School not found"})
+                await response(scope, receive, send)
+                return
+            if tenant.blocked:
+                response = JSONResponse(status_code=403, content={"detail": "School account is not active"})
+                await response(scope, receive, send)
+                return
+            state["tenant_id"] = tenant.school_id
         
         # For now, we'll allow requests without tenant for development
         # In production, you'd want to enforce this for tenant-specific endpoints
-        
-        response = await call_next(request)
-        return response
\ No newline at end of file
+        await self.app(scope, receive, send)
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
+from fastapi.security import HTTPAuthorizationCredentials
+from app.api.deps import security
+from app.core import tokens
+from app.core.config import settings
 from app.core.database import get_async_session
-from app.core.security import verify_password, get_password_hash, create_access_token, create_refresh_token
+from app.core.rate_limit import login_limiter, login_quotas
+from app.core.security import verify_and_update_password, hash_password, create_access_token, create_refresh_token
 from app.models.user import User
 from app.models.school import School
 from app.schemas.auth import LoginRequest, LoginResponse, RegisterRequest, RegisterResponse, RefreshTokenRequest
 from datetime import datetime
+from typing import Optional
 import uuid
 
 router = APIRouter()
@@ -15,9 +21,20 @@ router = APIRouter()
 @router.post("/login", response_model=LoginResponse)
 async def login(
     request: LoginRequest,
+    http_request: Request,
     db: AsyncSession = Depends(get_async_session)
 ):
     """Login with email and password"""
+    if settings.RATE_LIMIT_ENABLED:
+        client_ip = http_request.client.host if http_request.client else "unknown"
+        attempt = await login_limiter.check(login_quotas(request.email, client_ip))
+        if not attempt.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many sign-in attempts. Please try again later.",
+                headers=attempt.headers()
+            )
+    
     # Find user by email and school
     query = select(User).where(User.email == request.email)
     if request.school_slug:
@@ -37,7 +54,10 @@ async def login(
     user = result.scalar_one_or_none()
     
     # Verify user and password
-    if not user or not verify_password(request.password, user.password_hash):
+    verified, new_hash = (
+        await verify_and_update_password(request.password, user.password_hash) if user else (False, None)
+    )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -50,8 +70,12 @@ async def login(
             detail="User account is not active"
         )
     
-    # Update last login
+    # Update last login; upgrade the hash if its parameters are outdated.
+    # The upgrade is a Core UPDATE so the ORM listener does not take it for
+    # a password change and revoke the user's tokens (see app.core.tokens).
     user.last_login_at = datetime.utcnow()
+    if new_hash:
+        await db.execute(update(User).where(User.id == user.id).values(password_hash=new_hash))
     await db.commit()
     
     # Create tokens
@@ -125,7 +149,7 @@ async def register(
         school_id=school.id,
         email=request.email,
         phone=request.phone,
-        password_hash=get_password_hash(request.password),
+        password_hash=await hash_password(request.password),
         first_name=request.first_name,
         last_name=request.last_name,
         status="active"
@@ -159,11 +183,9 @@ async def refresh_token(
     db: AsyncSession = Depends(get_async_session)
 ):
     """Refresh access token using refresh token"""
-    from app.core.security import decode_token
-    
-    # Decode refresh token
-    payload = decode_token(request.refresh_token)
-    if not payload or payload.get("type") != "refresh":
+    # Decode refresh token; revoked ones (logout, deactivation) are rejected
+    payload = tokens.validate(request.refresh_token, "refresh")
+    if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token"
@@ -193,4 +215,16 @@ async def refresh_token(
     return {
         "access_token": access_token,
         "token_type": "bearer"
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: Optional[RefreshTokenRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Revoke the presented access token and, if given, the refresh token"""
+    for token, token_type in ((credentials.credentials, "access"), (request and request.refresh_token, "refresh")):
+        payload = tokens.validate(token, token_type) if token else None
+        if payload and payload.get("jti"):
+            await tokens.revoke_token(payload)
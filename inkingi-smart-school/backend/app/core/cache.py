@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import redis.asyncio as redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# redis.asyncio connections belong to the event loop that opened them, so
+# each loop gets its own client: the app's, and any asyncio.run() in a
+# Celery task or script (see run_sync)
+_redis_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, redis.Redis]" = weakref.WeakKeyDictionary()
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def get_redis() -> redis.Redis:
+    """Async Redis client for the running event loop (connections are pooled)"""
+    loop = asyncio.get_running_loop()
+    client = _redis_clients.get(loop)
+    if client is None:
+        client = _redis_clients[loop] = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return client
+
+
+def run_sync(coro: Awaitable[Any]) -> None:
+    """Run a coroutine using get_redis() from sync code, closing its client afterwards"""
+    async def run():
+        try:
+            await coro
+        finally:
+            client = _redis_clients.pop(asyncio.get_running_loop(), None)
+            if client is not None:
+                await client.aclose()
+
+    asyncio.run(run())
+
+
+def publish_after_commit(session_key: str, publish: Callable[[Any], Awaitable[None]]) -> None:
+    """Call `publish(session.info[session_key])` once a transaction that collected something commits
+
+    ORM listeners collect changes into `session.info[session_key]` during
+    flush; they are dropped on rollback. In the app `publish` runs as a task
+    on the running loop; in sync code (Celery workers, scripts) it runs to
+    completion before the commit returns.
+    """
+
+    @event.listens_for(Session, "after_commit")
+    def _after_commit(session):
+        collected = session.info.pop(session_key, None)
+        if not collected:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            run_sync(publish(collected))
+        else:
+            # The loop keeps only weak references to tasks
+            task = loop.create_task(publish(collected))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+    @event.listens_for(Session, "after_rollback")
+    def _after_rollback(session):
+        session.info.pop(session_key, None)
+
+
+class LRUCache:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TwoTierCache:
+    """In-process LRU in front of Redis.
+
+    Values must be JSON-serializable. Redis errors are logged and treated as
+    misses so a Redis outage degrades to the database, never to a 500.
+    Invalidation deletes the Redis key and broadcasts the key so every
+    process drops its local copy (see `run_invalidation_listener`).
+    """
+
+    _registry: Dict[str, "TwoTierCache"] = {}
+
+    def __init__(self, namespace: str, maxsize: int, local_ttl: float, redis_ttl: int):
+        self.namespace = namespace
+        self.local = LRUCache(maxsize=maxsize, ttl=local_ttl)
+        self.redis_ttl = redis_ttl
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        TwoTierCache._registry[namespace] = self
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        try:
+            raw = await get_redis().get(self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"Cache read failed for {self.namespace}:{key}: {e}")
+            raw = None
+
+        if raw is None:
+            self.misses += 1
+            return None
+
+        value = json.loads(raw)
+        self.local.set(key, value)
+        self.redis_hits += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+        try:
+            await get_redis().set(self._redis_key(key), json.dumps(value), ex=self.redis_ttl)
+        except Exception as e:
+            logger.warning(f"Cache write failed for {self.namespace}:{key}: {e}")
+
+    async def invalidate(self, *keys: str) -> None:
+        for key in keys:
+            self.local.delete(key)
+        if not keys:
+            return
+        try:
+            client = get_redis()
+            await client.delete(*(self._redis_key(k) for k in keys))
+            for key in keys:
+                await client.publish(INVALIDATION_CHANNEL, self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for {self.namespace}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "local_size": len(self.local),
+        }
+
+    @classmethod
+    def all_stats(cls) -> Dict[str, Dict[str, Any]]:
+        return {name: cache.stats() for name, cache in cls._registry.items()}
+
+    @classmethod
+    def evict_local(cls, redis_key: str) -> None:
+        for namespace, cache in cls._registry.items():
+            prefix = f"{namespace}:"
+            if redis_key.startswith(prefix):
+                cache.local.delete(redis_key[len(prefix):])
+
+
+async def run_channel_listener(
+    channel: str,
+    apply: Callable[[str], None],
+    load: Optional[Callable[[], Awaitable[None]]] = None,
+    reload_seconds: Optional[float] = None,
+) -> None:
+    """Call `apply` with every message published on `channel`. Runs until cancelled.
+
+    `load`, a full reload of whatever the messages update, runs after each
+    (re)subscribe, so nothing published while disconnected is missed, and
+    then every `reload_seconds`.
+    """
+    while True:
+        try:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(channel)
+                # Load after subscribing so no change falls in between
+                if load is not None:
+                    await load()
+                reload_at = time.monotonic() + reload_seconds if load is not None and reload_seconds else None
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get("type") == "message":
+                        apply(message["data"])
+                    if reload_at is not None and time.monotonic() >= reload_at:
+                        await load()
+                        reload_at = time.monotonic() + reload_seconds
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Listener on {channel} failed, reconnecting: {e}")
+            await asyncio.sleep(5)
+
+
+async def run_invalidation_listener() -> None:
+    """Drop local entries invalidated by other processes. Runs until cancelled."""
+    await run_channel_listener(INVALIDATION_CHANNEL, TwoTierCache.evict_local)
+
+
+class CacheStatsCollector:
+    """Prometheus collector exposing hit/miss counters for every TwoTierCache"""
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+        hits = CounterMetricFamily(
+            "inkingi_cache_hits", "Cache hits by tier", labels=["cache", "tier"]
+        )
+        misses = CounterMetricFamily("inkingi_cache_misses", "Cache misses", labels=["cache"])
+        size = GaugeMetricFamily(
+            "inkingi_cache_local_entries", "Entries in the in-process tier", labels=["cache"]
+        )
+        for name, cache in TwoTierCache._registry.items():
+            hits.add_metric([name, "local"], cache.local_hits)
+            hits.add_metric([name, "redis"], cache.redis_hits)
+            misses.add_metric([name], cache.misses)
+            size.add_metric([name], len(cache.local))
+        yield hits
+        yield misses
+        yield size
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl, field_validator
 
@@ -22,15 +22,44 @@ class Settings(BaseSettings):
     REDIS_URL: str
     REDIS_CACHE_TTL: int = 3600
     
+    # Identity cache (user/school/role snapshots for auth dependencies)
+    IDENTITY_CACHE_MAXSIZE: int = 10000
+    IDENTITY_CACHE_LOCAL_TTL: int = 30
+    IDENTITY_CACHE_REDIS_TTL: int = 300
+    # Full reload of the in-process tenant registry (changes also arrive via pub/sub)
+    TENANT_REGISTRY_RELOAD_SECONDS: int = 300
+    # Domains whose subdomains are school slugs ("app.com": school1.app.com);
+    # other hosts name a tenant only as a registered custom domain
+    TENANT_BASE_DOMAINS: str = ""  # Comma-separated
+    
     # Celery
     CELERY_BROKER_URL: str
     CELERY_RESULT_BACKEND: str
     
+    # Fees marked overdue per UPDATE (and transaction) by the overdue sweeper
+    OVERDUE_SWEEP_BATCH: int = 1000
+    # A school's first sweep only looks this many days back; older unpaid fees
+    # are left unmarked instead of all being charged and reminded at once
+    OVERDUE_FIRST_SWEEP_DAYS: int = 30
+    
     # JWT
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Rotation: "kid:secret,kid:secret"; tokens are signed with JWT_ACTIVE_KID
+    # (JWT_SECRET_KEY, without a kid, when unset)
+    JWT_SIGNING_KEYS: str = ""
+    JWT_ACTIVE_KID: Optional[str] = None
+    # Decoded-token cache and revocation mirror (see app.core.tokens)
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    TOKEN_CACHE_TTL: int = 300
+    REVOCATION_RELOAD_SECONDS: int = 300
+    
+    # Password hashing (runs on a thread pool; excess logins get a 503)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
     
     # Email
     SMTP_HOST: str
@@ -39,11 +68,27 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str
     EMAIL_FROM: str
     EMAIL_FROM_NAME: str
+    SMTP_USE_TLS: bool = True
+    SMTP_POOL_SIZE: int = 4  # Authenticated connections kept per worker process
+    SMTP_RATE_LIMIT: float = 10.0  # Messages per second per provider and worker process; 0 = unlimited
+    EMAIL_BATCH_SIZE: int = 100  # Messages sent per task over one connection
+    EMAIL_MAX_ATTEMPTS: int = 3
+    EMAIL_DISPATCH_LIMIT: int = 600  # Recipients claimed per school per minute (~SMTP_RATE_LIMIT * 60); more wait for the next run
     
     # SMS
+    SMS_PROVIDER: str = "twilio"  # twilio, africastalking, fake
+    SMS_SENDER_ID: Optional[str] = None
     TWILIO_ACCOUNT_SID: Optional[str] = None
     TWILIO_AUTH_TOKEN: Optional[str] = None
     TWILIO_PHONE_NUMBER: Optional[str] = None
+    AFRICASTALKING_USERNAME: Optional[str] = None
+    AFRICASTALKING_API_KEY: Optional[str] = None
+    SMS_RATE_LIMIT: float = 5.0  # Messages per second per sender number and worker process; 0 = unlimited
+    SMS_HTTP_POOL_SIZE: int = 20  # Provider connections kept per worker process
+    SMS_BATCH_SIZE: int = 500  # Recipients per task
+    SMS_MAX_ATTEMPTS: int = 3
+    SMS_DISPATCH_LIMIT: int = 300  # Recipients claimed per school per minute (~SMS_RATE_LIMIT * 60); more wait for the next run
+    SMS_SEGMENT_COST: float = 0.0  # Provider price of one segment, for estimates
     
     # AI
     OPENAI_API_KEY: Optional[str] = None
@@ -62,10 +107,17 @@ class Settings(BaseSettings):
     SENTRY_DSN: Optional[str] = None
     PROMETHEUS_ENABLED: bool = True
     
-    # Rate Limiting
+    # Rate Limiting (requests per RATE_LIMIT_PERIOD seconds; see app.core.rate_limit)
     RATE_LIMIT_ENABLED: bool = True
-    RATE_LIMIT_REQUESTS: int = 100
+    RATE_LIMIT_REQUESTS: int = 100  # Per client IP, anonymous requests
     RATE_LIMIT_PERIOD: int = 60
+    RATE_LIMIT_USER_REQUESTS: int = 300
+    RATE_LIMIT_TENANT_REQUESTS: int = 3000
+    # Path prefix -> requests, per user or IP, on top of the quotas above
+    RATE_LIMIT_ROUTE_QUOTAS: Dict[str, int] = {"/api/v1/auth/register": 20}
+    # Login attempts per submitted account and client IP, so users behind one NAT don't share a bucket
+    RATE_LIMIT_LOGIN_REQUESTS: int = 10
+    RATE_LIMIT_LOCAL_MAXSIZE: int = 10000  # Keys tracked by the in-process pre-limiter
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -1,10 +1,11 @@
 from typing import AsyncGenerator, Optional
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from sqlalchemy import create_engine, MetaData, event
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
+from sqlalchemy import create_engine, MetaData, event, text
 from sqlalchemy.pool import NullPool
 from .config import settings
+import uuid
 
 
 # Custom naming convention for constraints
@@ -83,32 +84,69 @@ def get_sync_session():
         db.close()
 
 
+TENANT_GUC_SQL = text("SELECT set_config('app.tenant_id', :tenant_id, true)")
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_tenant_guc(session, transaction, connection):
+    """Re-apply the tenant GUC at the start of every transaction.
+
+    `set_config(..., true)` is transaction-local, so it is discarded on
+    commit/rollback without a RESET round-trip, works behind pgbouncer
+    transaction pooling, and is restored here when a route commits and keeps
+    using the session.
+    """
+    tenant_id = session.info.get("tenant_id")
+    if tenant_id is not None and connection.dialect.name == "postgresql":
+        connection.execute(TENANT_GUC_SQL, {"tenant_id": tenant_id})
+
+
+def _tenant_value(tenant_id) -> str:
+    # Fail closed on anything that is not a tenant UUID
+    return str(uuid.UUID(str(tenant_id)))
+
+
+async def _enter_tenant(session: AsyncSession, tenant_id) -> Optional[str]:
+    previous = session.sync_session.info.get("tenant_id")
+    value = _tenant_value(tenant_id)
+    session.sync_session.info["tenant_id"] = value
+    if session.in_transaction():
+        # Already inside a transaction: after_begin has passed, set it now
+        await session.execute(TENANT_GUC_SQL, {"tenant_id": value})
+    return previous
+
+
+def _exit_tenant(session: AsyncSession, previous: Optional[str]) -> None:
+    if previous is None:
+        session.sync_session.info.pop("tenant_id", None)
+    else:
+        session.sync_session.info["tenant_id"] = previous
+
+
 class TenantContext:
     """Context manager for setting tenant context in PostgreSQL"""
     
     def __init__(self, session: AsyncSession, tenant_id: Optional[str] = None):
         self.session = session
         self.tenant_id = tenant_id
+        self._previous = None
     
     async def __aenter__(self):
         if self.tenant_id:
-            await self.session.execute(
-                f"SET LOCAL app.tenant_id = '{self.tenant_id}'"
-            )
+            self._previous = await _enter_tenant(self.session, self.tenant_id)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.tenant_id:
-            await self.session.execute("RESET app.tenant_id")
+            _exit_tenant(self.session, self._previous)
 
 
 @asynccontextmanager
 async def with_tenant(session: AsyncSession, tenant_id: Optional[str] = None):
-    """Set tenant context for the session"""
-    if tenant_id:
-        await session.execute(f"SET LOCAL app.tenant_id = '{tenant_id}'")
+    """Set tenant context for the session (every transaction inside the block)"""
+    previous = await _enter_tenant(session, tenant_id) if tenant_id else None
     try:
         yield session
     finally:
         if tenant_id:
-            await session.execute("RESET app.tenant_id")
\ No newline at end of file
+            _exit_tenant(session, previous)
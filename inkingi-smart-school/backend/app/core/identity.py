@@ -0,0 +1,186 @@
+"""Cached identity lookups (user, roles and school) for request dependencies.
+
+Snapshots are plain column dicts, so cached users and schools come back as
+transient ORM instances: fine for reading attributes, but they are not
+attached to any session and must not be modified or refreshed.
+"""
+import enum
+import uuid
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import object_session
+
+from app.core.cache import TwoTierCache, publish_after_commit
+from app.core.config import settings
+from app.models.school import School
+from app.models.user import Role, User, UserRole
+
+# Never copy secrets into Redis
+USER_SNAPSHOT_EXCLUDE = {"password_hash", "two_factor_secret"}
+
+user_cache = TwoTierCache(
+    "identity:user",
+    maxsize=settings.IDENTITY_CACHE_MAXSIZE,
+    local_ttl=settings.IDENTITY_CACHE_LOCAL_TTL,
+    redis_ttl=settings.IDENTITY_CACHE_REDIS_TTL,
+)
+school_cache = TwoTierCache(
+    "identity:school",
+    maxsize=settings.IDENTITY_CACHE_MAXSIZE,
+    local_ttl=settings.IDENTITY_CACHE_LOCAL_TTL,
+    redis_ttl=settings.IDENTITY_CACHE_REDIS_TTL,
+)
+
+
+def _dump(obj: Any, exclude: Set[str] = frozenset()) -> Dict[str, Any]:
+    data = {}
+    for column in obj.__table__.columns:
+        if column.key in exclude:
+            continue
+        value = getattr(obj, column.key)
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, enum.Enum):
+            value = value.value
+        data[column.key] = value
+    return data
+
+
+def _python_type(column) -> Optional[type]:
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _load(model: type, data: Dict[str, Any]) -> Any:
+    values = {}
+    for column in model.__table__.columns:
+        if column.key not in data:
+            continue
+        value = data[column.key]
+        python_type = _python_type(column)
+        if value is not None and python_type is not None:
+            if python_type is uuid.UUID:
+                value = uuid.UUID(value)
+            elif python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif isinstance(python_type, type) and issubclass(python_type, enum.Enum):
+                value = python_type(value)
+        values[column.key] = value
+    return model(**values)
+
+
+class UserSnapshot:
+    def __init__(self, user: User, roles: List[str]):
+        self.user = user
+        self.roles = roles
+
+
+async def get_user_snapshot(db: AsyncSession, user_id: str) -> Optional[UserSnapshot]:
+    """Resolve a user and their role names, from cache when possible"""
+    cached = await user_cache.get(user_id)
+    if cached is None:
+        user = await db.get(User, uuid.UUID(user_id))
+        if not user:
+            return None
+        result = await db.execute(
+            select(Role.name)
+            .join(UserRole, UserRole.role_id == Role.id)
+            .where(UserRole.user_id == user.id, UserRole.school_id == user.school_id)
+        )
+        cached = {
+            "user": _dump(user, USER_SNAPSHOT_EXCLUDE),
+            "roles": sorted(result.scalars().all()),
+        }
+        await user_cache.set(user_id, cached)
+    return UserSnapshot(_load(User, cached["user"]), cached["roles"])
+
+
+async def _get_school(db: AsyncSession, key: str, query) -> Optional[School]:
+    cached = await school_cache.get(key)
+    if cached is None:
+        result = await db.execute(query)
+        school = result.scalar_one_or_none()
+        if not school:
+            return None
+        cached = _dump(school)
+        await school_cache.set(key, cached)
+    return _load(School, cached)
+
+
+async def get_school_by_slug(db: AsyncSession, slug: str) -> Optional[School]:
+    return await _get_school(db, f"slug:{slug}", select(School).where(School.slug == slug))
+
+
+async def get_school_by_id(db: AsyncSession, school_id: uuid.UUID) -> Optional[School]:
+    return await _get_school(db, f"id:{school_id}", select(School).where(School.id == school_id))
+
+
+async def invalidate_user(user_id: Any) -> None:
+    await user_cache.invalidate(str(user_id))
+
+
+async def invalidate_school(school_id: Any = None, slug: Optional[str] = None) -> None:
+    keys = []
+    if school_id is not None:
+        keys.append(f"id:{school_id}")
+    if slug:
+        keys.append(f"slug:{slug}")
+    await school_cache.invalidate(*keys)
+
+
+def identity_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {"user": user_cache.stats(), "school": school_cache.stats()}
+
+
+# Invalidate automatically whenever a user, role assignment or school is
+# written through the ORM: collect the keys during flush and drop them once
+# the transaction commits.
+
+def _mark_dirty(target: Any, kind: str, *values: Any) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    session.info.setdefault("identity_dirty", set()).update((kind, v) for v in values)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    _mark_dirty(target, "user", str(target.id))
+
+
+@event.listens_for(UserRole, "after_insert")
+@event.listens_for(UserRole, "after_update")
+@event.listens_for(UserRole, "after_delete")
+def _user_role_changed(mapper, connection, target):
+    _mark_dirty(target, "user", str(target.user_id))
+
+
+@event.listens_for(School, "after_update")
+@event.listens_for(School, "after_delete")
+def _school_changed(mapper, connection, target):
+    # Drop the old slug too when a school is renamed
+    previous = inspect(target).attrs.slug.history.deleted
+    slugs = {target.slug, *(s for s in previous if s)}
+    _mark_dirty(target, "school", f"id:{target.id}", *(f"slug:{s}" for s in slugs))
+
+
+async def _invalidate_keys(dirty: Set[tuple]) -> None:
+    user_keys = [key for kind, key in dirty if kind == "user"]
+    school_keys = [key for kind, key in dirty if kind == "school"]
+    if user_keys:
+        await user_cache.invalidate(*user_keys)
+    if school_keys:
+        await school_cache.invalidate(*school_keys)
+
+
+publish_after_commit("identity_dirty", _invalidate_keys)
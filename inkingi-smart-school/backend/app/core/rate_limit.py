@@ -0,0 +1,208 @@
+"""Request rate limiting: GCRA quotas in Redis behind an in-process pre-limiter.
+
+Each request is checked against several quotas at once, each a number of
+requests per RATE_LIMIT_PERIOD:
+
+- per user (RATE_LIMIT_USER_REQUESTS), or per client IP for anonymous
+  requests (RATE_LIMIT_REQUESTS)
+- per tenant (RATE_LIMIT_TENANT_REQUESTS), shared by all users of a school
+- per route class (RATE_LIMIT_ROUTE_QUOTAS: path prefix -> requests), per
+  user or IP, for endpoints such as registration that need a tighter limit
+
+Login attempts are also limited per submitted account and client IP
+(RATE_LIMIT_LOGIN_REQUESTS, checked by the login route, which has the
+account), so one school's users behind a NAT each get their own attempts
+while guessing one account's password stays throttled.
+
+The quotas use GCRA (a token bucket kept as one "theoretical arrival time"
+per key), so a key is a single Redis string and limits refill smoothly
+instead of resetting at window edges. One Lua script checks every quota of
+a request and only consumes from them if all allow it: one round-trip per
+request, atomic across workers, on Redis's clock.
+
+`LocalLimiter` runs the same algorithm in-process first. A process never sees
+more than the global traffic, so a local denial is always correct and costs
+no round-trip; when Redis denies, the key is blocked locally until the
+retry time, so a client hammering past its limit is turned away without
+Redis. If Redis fails the local limits still apply, and Redis is skipped
+for a few seconds instead of adding a timeout to every request.
+"""
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+
+from app.core import tokens
+from app.core.cache import get_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds to skip Redis after a failed check
+REDIS_BACKOFF = 5.0
+
+# KEYS: one per quota. ARGV: emission interval and burst tolerance in ms per key.
+# Returns {allowed, index of the tightest quota, remaining, retry after ms, reset after ms}.
+GCRA_SCRIPT = """
+redis.replicate_commands()
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local allowed, tightest, remaining, retry_after, reset_after = 1, 1, -1, 0, 0
+local tats = {}
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[2 * i - 1])
+    local tolerance = tonumber(ARGV[2 * i])
+    local tat = tonumber(redis.call('GET', key) or now)
+    if tat < now then tat = now end
+    local new_tat = tat + interval
+    local allow_at = new_tat - tolerance
+    if now < allow_at then
+        if allowed == 1 or allow_at - now > retry_after then
+            tightest, retry_after, reset_after = i, allow_at - now, tat - now
+        end
+        allowed, remaining = 0, 0
+    elseif allowed == 1 then
+        local left = math.floor((now - allow_at) / interval)
+        if remaining < 0 or left < remaining then
+            tightest, remaining, reset_after = i, left, new_tat - now
+        end
+    end
+    tats[i] = new_tat
+end
+if allowed == 1 then
+    for i, key in ipairs(KEYS) do
+        redis.call('SET', key, tats[i], 'PX', tats[i] - now)
+    end
+end
+return {allowed, tightest, remaining, retry_after, reset_after}
+"""
+
+
+class Quota(NamedTuple):
+    key: str
+    requests: int
+    period: float
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.requests
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until the request would be allowed
+    reset_after: float  # seconds until the quota is full again
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(int(time.time() + math.ceil(self.reset_after))),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+
+class LocalLimiter:
+    """GCRA over an in-process map of key -> theoretical arrival time"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+
+    def check(self, quotas: List[Quota]) -> RateLimitResult:
+        """Consume one request from every quota if all allow it"""
+        now = time.monotonic()
+        result, new_tats = None, []
+        for quota in quotas:
+            tat = max(self._tats.get(quota.key, now), now)
+            new_tat = tat + quota.interval
+            allow_at = new_tat - quota.period
+            if now < allow_at:
+                denied = RateLimitResult(False, quota.requests, 0, allow_at - now, tat - now)
+                if result is None or result.allowed or denied.retry_after > result.retry_after:
+                    result = denied
+            elif result is None or result.allowed:
+                remaining = int((now - allow_at) // quota.interval)
+                if result is None or remaining < result.remaining:
+                    result = RateLimitResult(True, quota.requests, remaining, 0.0, new_tat - now)
+            new_tats.append(new_tat)
+        if result.allowed:
+            for quota, new_tat in zip(quotas, new_tats):
+                self._set(quota.key, new_tat)
+        return result
+
+    def block(self, quota: Quota, retry_after: float) -> None:
+        """Deny `quota` locally for `retry_after` seconds"""
+        self._set(quota.key, time.monotonic() + retry_after + quota.period - quota.interval)
+
+    def _set(self, key: str, tat: float) -> None:
+        self._tats[key] = tat
+        self._tats.move_to_end(key)
+        while len(self._tats) > self.maxsize:
+            self._tats.popitem(last=False)
+
+
+class RateLimiter:
+    def __init__(self, local_maxsize: int = settings.RATE_LIMIT_LOCAL_MAXSIZE):
+        self.local = LocalLimiter(local_maxsize)
+        self._script = None
+        self._redis_down_until = 0.0
+
+    async def check(self, quotas: List[Quota]) -> RateLimitResult:
+        result = self.local.check(quotas)
+        if not result.allowed or time.monotonic() < self._redis_down_until:
+            return result
+        try:
+            if self._script is None:
+                self._script = get_redis().register_script(GCRA_SCRIPT)
+            args = []
+            for quota in quotas:
+                args += [max(1, int(quota.interval * 1000)), int(quota.period * 1000)]
+            allowed, tightest, remaining, retry_after, reset_after = await self._script(
+                keys=[quota.key for quota in quotas], args=args
+            )
+        except Exception as e:
+            logger.warning(f"Rate limit check failed, using local limits for {REDIS_BACKOFF}s: {e}")
+            self._redis_down_until = time.monotonic() + REDIS_BACKOFF
+            return result
+        quota = quotas[tightest - 1]
+        if not allowed:
+            self.local.block(quota, retry_after / 1000)
+        return RateLimitResult(bool(allowed), quota.requests, remaining, retry_after / 1000, reset_after / 1000)
+
+
+def quotas_for(path: str, client_ip: str, bearer_token: Optional[str] = None) -> List[Quota]:
+    """Quotas a request counts against, keyed by user (or IP), tenant and route class"""
+    period = settings.RATE_LIMIT_PERIOD
+    claims = tokens.decode(bearer_token) if bearer_token else None
+    if claims and claims.get("sub"):
+        client = f"user:{claims['sub']}"
+        quotas = [Quota(f"rl:{client}", settings.RATE_LIMIT_USER_REQUESTS, period)]
+        if claims.get("school_id"):
+            quotas.append(Quota(f"rl:tenant:{claims['school_id']}", settings.RATE_LIMIT_TENANT_REQUESTS, period))
+    else:
+        client = f"ip:{client_ip}"
+        quotas = [Quota(f"rl:{client}", settings.RATE_LIMIT_REQUESTS, period)]
+    for prefix, requests in settings.RATE_LIMIT_ROUTE_QUOTAS.items():
+        if path.startswith(prefix):
+            quotas.append(Quota(f"rl:route:{prefix}:{client}", requests, period))
+    return quotas
+
+
+def login_quotas(account: str, client_ip: str) -> List[Quota]:
+    """Quota of login attempts for one account from one client IP"""
+    return [
+        Quota(
+            f"rl:login:{account.strip().lower()}:ip:{client_ip}",
+            settings.RATE_LIMIT_LOGIN_REQUESTS,
+            settings.RATE_LIMIT_PERIOD,
+        )
+    ]
+
+
+login_limiter = RateLimiter()
@@ -0,0 +1,152 @@
+"""In-process tenant registry: slug or custom domain -> (school id, status).
+
+Every process keeps the whole map in memory (a few small strings per
+school), loads it at start-up and every TENANT_REGISTRY_RELOAD_SECONDS, and
+applies changes published on TENANT_CHANNEL whenever a school is created,
+updated (renamed, suspended, ...) or deleted through the ORM. TenantMiddleware
+resolves each request's tenant from it, so unknown and suspended tenants are
+rejected before any database work, and dependencies get the school id from
+`request.state.tenant_id` instead of looking the slug up.
+
+Until the first load succeeds `loaded` is False and callers fall back to
+the database.
+"""
+import json
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+
+from app.core.cache import get_redis, publish_after_commit, run_channel_listener
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.school import School, SchoolStatus
+
+logger = logging.getLogger(__name__)
+
+TENANT_CHANNEL = "tenants:changes"
+
+# Tenants whose requests are refused
+BLOCKED_STATUSES = {SchoolStatus.SUSPENDED.value, SchoolStatus.INACTIVE.value}
+
+
+class Tenant(NamedTuple):
+    school_id: str
+    slug: str
+    domain: Optional[str]
+    status: str
+
+    @property
+    def blocked(self) -> bool:
+        return self.status in BLOCKED_STATUSES
+
+
+def _status(value: Any) -> str:
+    return value.value if isinstance(value, SchoolStatus) else str(value)
+
+
+class TenantRegistry:
+    def __init__(self):
+        self.by_id: Dict[str, Tenant] = {}
+        self.by_slug: Dict[str, Tenant] = {}
+        self.by_domain: Dict[str, Tenant] = {}
+        self.loaded = False
+
+    def by_host(self, host: str) -> Optional[Tenant]:
+        return self.by_domain.get(host.lower())
+
+    def get(self, slug: str) -> Optional[Tenant]:
+        return self.by_slug.get(slug.lower())
+
+    def _add(self, tenant: Tenant) -> None:
+        self.by_id[tenant.school_id] = tenant
+        self.by_slug[tenant.slug.lower()] = tenant
+        if tenant.domain:
+            self.by_domain[tenant.domain.lower()] = tenant
+
+    def _remove(self, school_id: str) -> None:
+        old = self.by_id.pop(school_id, None)
+        if old is None:
+            return
+        self.by_slug.pop(old.slug.lower(), None)
+        if old.domain:
+            self.by_domain.pop(old.domain.lower(), None)
+
+    def apply(self, change: Dict[str, Any]) -> None:
+        self._remove(change["school_id"])
+        if not change.get("deleted"):
+            self._add(Tenant(change["school_id"], change["slug"], change["domain"], change["status"]))
+
+    async def load(self) -> None:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(School.id, School.slug, School.custom_domain, School.status))
+            rows = result.all()
+        registry = TenantRegistry()
+        for school_id, slug, domain, status in rows:
+            registry._add(Tenant(str(school_id), slug, domain, _status(status)))
+        # Swap in whole so lookups never see a half-loaded map
+        self.by_id, self.by_slug, self.by_domain = registry.by_id, registry.by_slug, registry.by_domain
+        self.loaded = True
+
+
+tenant_registry = TenantRegistry()
+
+
+async def run_tenant_listener() -> None:
+    """Keep the tenant registry current. Runs until cancelled."""
+    await run_channel_listener(
+        TENANT_CHANNEL,
+        lambda data: tenant_registry.apply(json.loads(data)),
+        tenant_registry.load,
+        settings.TENANT_REGISTRY_RELOAD_SECONDS,
+    )
+
+
+# Publish every school written through the ORM once the transaction commits.
+
+def _mark_changed(target: School, deleted: bool = False) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    change = {
+        "school_id": str(target.id),
+        "slug": target.slug,
+        "domain": target.custom_domain,
+        "status": _status(target.status),
+        "deleted": deleted,
+    }
+    session.info.setdefault("tenant_changes", {})[change["school_id"]] = change
+
+
+@event.listens_for(School, "after_insert")
+def _school_created(mapper, connection, target):
+    _mark_changed(target)
+
+
+@event.listens_for(School, "after_update")
+def _school_changed(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.status.history.has_changes() or state.attrs.slug.history.has_changes() \
+            or state.attrs.custom_domain.history.has_changes():
+        _mark_changed(target)
+
+
+@event.listens_for(School, "after_delete")
+def _school_deleted(mapper, connection, target):
+    _mark_changed(target, deleted=True)
+
+
+async def _publish(changes: Dict[str, Dict[str, Any]]) -> None:
+    changes = list(changes.values())
+    for change in changes:
+        tenant_registry.apply(change)
+    try:
+        client = get_redis()
+        for change in changes:
+            await client.publish(TENANT_CHANNEL, json.dumps(change))
+    except Exception as e:
+        logger.error(f"Tenant change publish failed: {e}")
+
+
+publish_after_commit("tenant_changes", _publish)
@@ -0,0 +1,201 @@
+"""JWT signing and validation without a database round-trip.
+
+- Signing keys: JWT_SIGNING_KEYS holds `kid:secret` pairs and tokens are
+  signed with JWT_ACTIVE_KID, its kid in the header. To rotate, add a new
+  key, make it active, and drop the old one once its tokens have expired.
+  Tokens without a kid (issued before rotation existed) are checked against
+  JWT_SECRET_KEY.
+- Decoded tokens are kept in an in-process LRU keyed by the token's SHA-256,
+  so a busy client's token is verified once per TOKEN_CACHE_TTL, not on
+  every request.
+- Revocations live in Redis: a hash of user id -> "not before" timestamp
+  (tokens of that user issued earlier are rejected; set when an account is
+  deactivated or its password changes) and a sorted set of revoked token
+  ids scored by expiry (logout). Every process mirrors both in memory,
+  reloads them on start and every REVOCATION_RELOAD_SECONDS, and applies
+  changes published on REVOCATION_CHANNEL as they happen.
+
+A token that verifies and is not revoked therefore belongs to an active
+user, and `get_current_user` needs neither Redis nor the database. While
+the mirror has never loaded (Redis down since start-up) callers fall back
+to checking the user's status.
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Set
+
+from jose import JWTError, jwt
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+from app.core.cache import LRUCache, get_redis, publish_after_commit, run_channel_listener
+from app.core.config import settings
+from app.models.user import User, UserStatus
+
+logger = logging.getLogger(__name__)
+
+REVOKED_USERS_KEY = "auth:revoked_users"
+REVOKED_TOKENS_KEY = "auth:revoked_tokens"
+REVOCATION_CHANNEL = "auth:revocations"
+LEGACY_KID = None
+
+
+def _signing_keys() -> Dict[Optional[str], str]:
+    keys = {LEGACY_KID: settings.JWT_SECRET_KEY}
+    for pair in settings.JWT_SIGNING_KEYS.split(","):
+        kid, _, secret = pair.strip().partition(":")
+        if kid and secret:
+            keys[kid] = secret
+    return keys
+
+
+SIGNING_KEYS = _signing_keys()
+ACTIVE_KID = settings.JWT_ACTIVE_KID if settings.JWT_ACTIVE_KID in SIGNING_KEYS else LEGACY_KID
+
+
+def encode_token(claims: Dict[str, Any], expires_delta: timedelta, token_type: str) -> str:
+    """Sign `claims` with the active key, adding exp, iat, jti and type"""
+    now = datetime.utcnow()
+    to_encode = {
+        **claims,
+        "exp": now + expires_delta,
+        "iat": now,
+        "jti": uuid.uuid4().hex,
+        "type": token_type,
+    }
+    headers = {"kid": ACTIVE_KID} if ACTIVE_KID is not None else None
+    return jwt.encode(to_encode, SIGNING_KEYS[ACTIVE_KID], algorithm=settings.JWT_ALGORITHM, headers=headers)
+
+
+_decoded = LRUCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+def decode(token: str) -> Optional[Dict[str, Any]]:
+    """Verified claims of a token, or None; cached by token hash"""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = _decoded.get(key)
+    if payload is not None:
+        # The LRU TTL may outlive the token itself
+        return payload if payload.get("exp", 0) > time.time() else None
+    try:
+        secret = SIGNING_KEYS.get(jwt.get_unverified_header(token).get("kid"))
+        if secret is None:
+            return None
+        payload = jwt.decode(token, secret, algorithms=[settings.JWT_ALGORITHM])
+    except JWTError:
+        return None
+    _decoded.set(key, payload)
+    return payload
+
+
+class RevocationList:
+    """In-memory mirror of the Redis revocation hash and sorted set"""
+
+    def __init__(self):
+        self.users: Dict[str, float] = {}  # user id -> not before (epoch seconds)
+        self.tokens: Dict[str, float] = {}  # jti -> expiry
+        self.loaded = False
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        not_before = self.users.get(str(payload.get("sub")))
+        if not_before is not None and payload.get("iat", 0) < not_before:
+            return True
+        return payload.get("jti") in self.tokens
+
+    def apply(self, change: Dict[str, Any]) -> None:
+        if "jti" in change:
+            self.tokens[change["jti"]] = change["exp"]
+        else:
+            self.users[change["user"]] = change["not_before"]
+
+    async def load(self) -> None:
+        client = get_redis()
+        now = time.time()
+        # Entries older than the longest token lifetime can no longer match anything
+        oldest = now - timedelta(days=settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS).total_seconds()
+        users = await client.hgetall(REVOKED_USERS_KEY)
+        stale = [user for user, not_before in users.items() if float(not_before) < oldest]
+        if stale:
+            await client.hdel(REVOKED_USERS_KEY, *stale)
+        await client.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", now)
+        tokens = await client.zrange(REVOKED_TOKENS_KEY, 0, -1, withscores=True)
+        self.users = {user: float(ts) for user, ts in users.items() if float(ts) >= oldest}
+        self.tokens = dict(tokens)
+        self.loaded = True
+
+
+revocations = RevocationList()
+
+
+def validate(token: str, token_type: str = "access") -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unrevoked token of `token_type`, or None"""
+    payload = decode(token)
+    if payload is None or payload.get("type") != token_type or not payload.get("sub"):
+        return None
+    if revocations.is_revoked(payload):
+        return None
+    return payload
+
+
+async def _publish(change: Dict[str, Any]) -> None:
+    revocations.apply(change)
+    try:
+        await get_redis().publish(REVOCATION_CHANNEL, json.dumps(change))
+    except Exception as e:
+        logger.warning(f"Revocation publish failed: {e}")
+
+
+async def revoke_user_tokens(user_id: Any) -> None:
+    """Reject every token of the user issued until now"""
+    # Whole seconds, like iat; a token issued in this second is revoked too
+    change = {"user": str(user_id), "not_before": float(int(time.time()) + 1)}
+    await get_redis().hset(REVOKED_USERS_KEY, change["user"], change["not_before"])
+    await _publish(change)
+
+
+async def revoke_token(payload: Dict[str, Any]) -> None:
+    """Reject one token (logout) until it expires"""
+    change = {"jti": payload["jti"], "exp": float(payload["exp"])}
+    await get_redis().zadd(REVOKED_TOKENS_KEY, {change["jti"]: change["exp"]})
+    await _publish(change)
+
+
+async def run_revocation_listener() -> None:
+    """Keep the local revocation mirror current. Runs until cancelled."""
+    await run_channel_listener(
+        REVOCATION_CHANNEL,
+        lambda data: revocations.apply(json.loads(data)),
+        revocations.load,
+        settings.REVOCATION_RELOAD_SECONDS,
+    )
+
+
+# Revoke automatically when a user is deactivated or changes password
+# through the ORM, once the transaction commits. Reactivation restores
+# nothing: the user logs in again for fresh tokens. Hash upgrades on login
+# are written with a Core UPDATE and never reach this listener.
+
+@event.listens_for(User, "after_update")
+def _user_changed(mapper, connection, target):
+    state = inspect(target)
+    deactivated = state.attrs.status.history.has_changes() and target.status != UserStatus.ACTIVE
+    if not deactivated and not state.attrs.password_hash.history.has_changes():
+        return
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("token_revocations", set()).add(str(target.id))
+
+
+async def _apply_revocations(user_ids: Set[str]) -> None:
+    for user_id in user_ids:
+        try:
+            await revoke_user_tokens(user_id)
+        except Exception as e:
+            logger.error(f"Token revocation failed for user {user_id}: {e}")
+
+
+publish_after_commit("token_revocations", _apply_revocations)
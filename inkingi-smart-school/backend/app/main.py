@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,9 +6,14 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
-from prometheus_client import make_asgi_app
+from prometheus_client import REGISTRY, make_asgi_app
 
 from app.core.config import settings
+from app.core.cache import CacheStatsCollector, run_invalidation_listener
+from app.core.hashing import HashingBusy
+from app.core.security import password_hasher
+from app.core.tokens import run_revocation_listener
+from app.core.tenants import run_tenant_listener, tenant_registry
 from app.api.middleware.tenant import TenantMiddleware
 from app.api.middleware.rate_limit import RateLimitMiddleware
 from app.api.v1 import api_router
@@ -28,10 +34,25 @@ async def lifespan(app: FastAPI):
             environment=settings.APP_ENV,
         )
     
+    # Keep local identity caches in sync with invalidations from other workers
+    invalidation_listener = asyncio.create_task(run_invalidation_listener())
+    # Mirror token revocations locally so auth checks skip Redis and the database
+    revocation_listener = asyncio.create_task(run_revocation_listener())
+    # Warm the tenant registry so the first requests resolve without the database
+    try:
+        await tenant_registry.load()
+    except Exception as e:
+        print(f"Tenant registry not loaded, resolving tenants from the database: {e}")
+    tenant_listener = asyncio.create_task(run_tenant_listener())
+    
     yield
     
     # Shutdown
     print("Shutting down...")
+    invalidation_listener.cancel()
+    revocation_listener.cancel()
+    tenant_listener.cancel()
+    password_hasher.shutdown()
 
 
 # Create FastAPI app
@@ -67,6 +88,7 @@ if settings.RATE_LIMIT_ENABLED:
 
 # Mount Prometheus metrics endpoint
 if settings.PROMETHEUS_ENABLED:
+    REGISTRY.register(CacheStatsCollector())
     metrics_app = make_asgi_app()
     app.mount("/metrics", metrics_app)
 
@@ -88,6 +110,15 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# Too many logins queued on this worker
+@app.exception_handler(HashingBusy)
+async def hashing_busy_handler(request: Request, exc: HashingBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many sign-in attempts right now. Please try again shortly."},
+        headers={"Retry-After": "1"},
+    )
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
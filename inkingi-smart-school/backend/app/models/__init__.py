@@ -6,9 +6,9 @@ from .student import Student, Parent, StudentParent
 from .academic import AcademicYear, Term, Class, ClassTeacher, Enrollment, Course, CourseTeacher
 from .timetable import Period, Room, TimetableEntry
 from .marks import Assignment, Exam, AssignmentMark, ExamMark, ReportCard
-from .fees import FeeStructure, FeeCategory, StudentFee, Payment
+from .fees import FeeStructure, FeeCategory, StudentFee, Payment, OverdueSweep
 from .inventory import Warehouse, InventoryCategory, InventoryItem, StockMovement
-from .communication import Message, Notification
+from .communication import Message, MessageRecipient, Notification
 
 __all__ = [
     "BaseModel",
@@ -43,10 +43,12 @@ __all__ = [
     "FeeCategory",
     "StudentFee",
     "Payment",
+    "OverdueSweep",
     "Warehouse",
     "InventoryCategory",
     "InventoryItem",
     "StockMovement",
     "Message",
+    "MessageRecipient",
     "Notification",
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Enum as SQLEnum, JSON
+from sqlalchemy import Column, String, Text, ForeignKey, DateTime, Enum as SQLEnum, JSON, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.models.base import TenantModel
@@ -71,6 +71,30 @@ class Message(TenantModel):
         return f"<Message {self.message_type} - {self.subject}>"
 
 
+class MessageRecipient(TenantModel):
+    """One delivery of a message to one address, written back by the delivery workers"""
+    __tablename__ = "message_recipients"
+    __table_args__ = (
+        # Workers claim QUEUED rows per school and channel
+        Index("ix_message_recipients_school_channel_status", "school_id", "channel", "status"),
+    )
+    
+    message_id = Column(UUID(as_uuid=True), ForeignKey("messages.id", ondelete="CASCADE"), nullable=False, index=True)
+    channel = Column(SQLEnum(MessageType), nullable=False)
+    address = Column(String(255), nullable=False)  # Email address or phone number
+    
+    # Delivery
+    status = Column(SQLEnum(MessageStatus), default=MessageStatus.QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    provider_message_id = Column(String(255), nullable=True)
+    segments = Column(Integer, nullable=True)  # SMS parts billed, counted when queued
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<MessageRecipient {self.channel} {self.address} - {self.status}>"
+
+
 class Notification(TenantModel):
     __tablename__ = "notifications"
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, Date, Text, Enum as SQLEnum, UniqueConstraint
+from sqlalchemy import Column, String, Float, ForeignKey, Date, Text, Enum as SQLEnum, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.models.base import TenantModel
@@ -83,6 +83,8 @@ class StudentFee(TenantModel):
     __tablename__ = "student_fees"
     __table_args__ = (
         UniqueConstraint("student_id", "fee_structure_id", name="uq_student_fee"),
+        # Overdue sweeps: unpaid fees by due date per school
+        Index("ix_student_fees_school_paid_due", "school_id", "is_paid", "due_date"),
     )
     
     student_id = Column(UUID(as_uuid=True), ForeignKey("students.id"), nullable=False)
@@ -99,6 +101,10 @@ class StudentFee(TenantModel):
     is_paid = Column(String, default="false", nullable=False)
     paid_date = Column(Date, nullable=True)
     
+    # Set by the overdue sweeper, which also adds the structure's late fee once
+    overdue_since = Column(Date, nullable=True)
+    late_fee_charged = Column(Float, default=0, nullable=False)
+    
     # Relationships
     student = relationship("Student", back_populates="fees")
     fee_structure = relationship("FeeStructure", back_populates="student_fees")
@@ -108,6 +114,19 @@ class StudentFee(TenantModel):
         return f"<StudentFee {self.student_id} - {self.amount}>"
 
 
+class OverdueSweep(TenantModel):
+    """Per-school checkpoint of the overdue sweeper: fees due before `swept_through` are done."""
+    __tablename__ = "overdue_sweeps"
+    __table_args__ = (
+        UniqueConstraint("school_id", name="uq_overdue_sweep_school"),
+    )
+    
+    swept_through = Column(Date, nullable=False)
+    
+    def __repr__(self):
+        return f"<OverdueSweep {self.school_id} - {self.swept_through}>"
+
+
 class Payment(TenantModel):
     __tablename__ = "payments"
     
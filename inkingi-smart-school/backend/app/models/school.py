@@ -16,6 +16,7 @@ class School(BaseModel):
     
     name = Column(String(255), nullable=False)
     slug = Column(String(100), unique=True, nullable=False, index=True)
+    custom_domain = Column(String(255), unique=True, nullable=True, index=True)  # e.g. portal.school.rw
     status = Column(SQLEnum(SchoolStatus), default=SchoolStatus.PENDING, nullable=False)
     verified_at = Column(DateTime(timezone=True), nullable=True)
     
@@ -11,6 +11,7 @@ celery_app = Celery(
         "app.workers.tasks.sms",
         "app.workers.tasks.reports",
         "app.workers.tasks.ai",
+        "app.workers.tasks.fees",
     ]
 )
 
@@ -34,10 +35,18 @@ celery_app.conf.beat_schedule = {
         "task": "app.workers.tasks.email.send_pending_emails",
         "schedule": 60.0,  # Every minute
     },
+    "send-pending-sms": {
+        "task": "app.workers.tasks.sms.send_pending_sms",
+        "schedule": 60.0,  # Every minute
+    },
     "generate-daily-reports": {
         "task": "app.workers.tasks.reports.generate_daily_reports",
         "schedule": 86400.0,  # Every day
     },
+    "sweep-overdue-fees": {
+        "task": "app.workers.tasks.fees.sweep_overdue_fees",
+        "schedule": 3600.0,  # Every hour; each run only scans fees due since the last one
+    },
     "cleanup-old-notifications": {
         "task": "app.workers.tasks.cleanup.cleanup_old_notifications",
         "schedule": 3600.0,  # Every hour
@@ -0,0 +1,23 @@
+from typing import Optional
+
+
+class Delivery:
+    """Outcome of sending one message to one address"""
+    __slots__ = ("address", "error", "retry", "provider_message_id")
+
+    def __init__(
+        self,
+        address: str,
+        error: Optional[str] = None,
+        retry: bool = False,
+        provider_message_id: Optional[str] = None,
+    ):
+        self.address = address
+        self.error = error
+        # Failed for a reason unrelated to the message (connection, throttling): worth another attempt
+        self.retry = retry
+        self.provider_message_id = provider_message_id
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
@@ -0,0 +1,303 @@
+"""Database side of the message delivery workers.
+
+Queued messages are expanded into one `message_recipients` row per address.
+The channel's beat task claims QUEUED rows per school in chunks
+(`FOR UPDATE SKIP LOCKED`, so concurrent runs never take the same rows) and
+hands each chunk to one batch task, at most the channel's dispatch limit
+per school and run, so a large broadcast is fed out over several runs
+instead of queueing behind the rate limit. The task only takes rows still
+carrying its claim timestamp, sends them and writes the outcomes back with
+one UPDATE for the sent rows (or one executemany when the provider returned
+message ids) and one executemany for the failed ones. Failures worth
+retrying go back to QUEUED until the channel's attempt limit. Attempts are
+counted when a task takes its rows, not when they are claimed. Rows left
+SENDING by a lost or late task are claimed again after CLAIM_TIMEOUT (a task
+that starts after that finds its claim gone and sends nothing), or failed
+once they have used up their attempts.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+import logging
+import re
+
+from sqlalchemy import and_, any_, bindparam, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+
+from app.core.database import SessionLocal
+from app.models.communication import Message, MessageRecipient, MessageStatus, MessageType
+from app.models.school import School, SchoolStatus
+
+logger = logging.getLogger(__name__)
+
+CLAIM_TIMEOUT = timedelta(minutes=15)
+
+_PHONE_SEPARATORS = re.compile(r"[\s\-().]")
+
+ADDRESS_COLUMNS = {
+    MessageType.EMAIL: Message.to_emails,
+    MessageType.SMS: Message.to_phones,
+}
+
+NORMALIZE: Dict[MessageType, Callable[[str], str]] = {
+    MessageType.EMAIL: lambda address: address.strip().lower(),
+    MessageType.SMS: lambda address: _PHONE_SEPARATORS.sub("", address),
+}
+
+
+def any_id(ids):
+    return any_(literal(list(ids), ARRAY(UUID(as_uuid=True))))
+
+
+def chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def expand_messages(
+    db,
+    school_id,
+    channel: MessageType,
+    now: datetime,
+    extra: Optional[Callable[[str], dict]] = None,
+) -> int:
+    """Turn due QUEUED messages of `channel` into recipient rows; returns the number of rows
+
+    `extra(content)` adds per-message columns to every row of that message.
+    """
+    messages = db.execute(
+        select(Message.id, Message.content, ADDRESS_COLUMNS[channel]).where(
+            Message.school_id == school_id,
+            Message.message_type == channel,
+            Message.status == MessageStatus.QUEUED,
+            or_(Message.scheduled_at.is_(None), Message.scheduled_at <= now),
+        )
+    ).all()
+    if not messages:
+        return 0
+    normalize = NORMALIZE[channel]
+    rows, sending, empty = [], [], []
+    for message_id, content, addresses in messages:
+        addresses = {normalize(a) for a in addresses or [] if a and a.strip()} - {""}
+        # A message without a single address has nothing to send
+        (sending if addresses else empty).append(message_id)
+        columns = extra(content) if extra else {}
+        rows.extend(
+            {"school_id": school_id, "message_id": message_id, "channel": channel, "address": address, **columns}
+            for address in sorted(addresses)
+        )
+    if rows:
+        db.execute(insert(MessageRecipient), rows)
+    for ids, status in ((sending, MessageStatus.SENDING), (empty, MessageStatus.FAILED)):
+        if ids:
+            db.execute(
+                update(Message)
+                .where(Message.id == any_id(ids), Message.status == MessageStatus.QUEUED)
+                .values(status=status)
+                .execution_options(synchronize_session=False)
+            )
+    return len(rows)
+
+
+def fail_stale(db, school_id, channel: MessageType, now: datetime, max_attempts: int) -> list:
+    """Fail rows left SENDING past CLAIM_TIMEOUT with no attempts left; returns their message ids"""
+    return db.execute(
+        update(MessageRecipient)
+        .where(
+            MessageRecipient.school_id == school_id,
+            MessageRecipient.channel == channel,
+            MessageRecipient.status == MessageStatus.SENDING,
+            MessageRecipient.updated_at < now - CLAIM_TIMEOUT,
+            MessageRecipient.attempts >= max_attempts,
+        )
+        .values(status=MessageStatus.FAILED, error="Delivery did not complete", updated_at=now)
+        .returning(MessageRecipient.message_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+
+def claim_recipients(db, school_id, channel: MessageType, limit: int, now: datetime, max_attempts: int) -> list:
+    """Mark up to `limit` deliverable rows SENDING, stamped with `now`, and return their ids"""
+    claimable = (
+        select(MessageRecipient.id)
+        .where(
+            MessageRecipient.school_id == school_id,
+            MessageRecipient.channel == channel,
+            or_(
+                MessageRecipient.status == MessageStatus.QUEUED,
+                and_(
+                    MessageRecipient.status == MessageStatus.SENDING,
+                    MessageRecipient.updated_at < now - CLAIM_TIMEOUT,
+                    MessageRecipient.attempts < max_attempts,
+                ),
+            ),
+        )
+        .order_by(MessageRecipient.created_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return db.execute(
+        update(MessageRecipient)
+        .where(MessageRecipient.id.in_(claimable))
+        .values(status=MessageStatus.SENDING, updated_at=now)
+        .returning(MessageRecipient.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+
+def load_claimed(db, recipient_ids, claimed_at: datetime, now: datetime) -> list:
+    """Take the rows still held by the claim stamped `claimed_at`, with their message's subject and content
+
+    Rows claimed again since (the task started after CLAIM_TIMEOUT) are left
+    to the newer task. The taken rows are re-stamped with `now`, so the
+    timeout runs from the start of sending, and count an attempt; a claim
+    that no task took costs none. Grouped by message.
+    """
+    taken = db.execute(
+        update(MessageRecipient)
+        .where(
+            MessageRecipient.id == any_id(recipient_ids),
+            MessageRecipient.status == MessageStatus.SENDING,
+            MessageRecipient.updated_at == claimed_at,
+        )
+        .values(attempts=MessageRecipient.attempts + 1, updated_at=now)
+        .returning(MessageRecipient.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if not taken:
+        return []
+    return db.execute(
+        select(
+            MessageRecipient.id,
+            MessageRecipient.attempts,
+            MessageRecipient.message_id,
+            MessageRecipient.address,
+            Message.subject,
+            Message.content,
+        )
+        .join(Message, Message.id == MessageRecipient.message_id)
+        .where(MessageRecipient.id == any_id(taken))
+        .order_by(MessageRecipient.message_id)
+    ).all()
+
+
+def record_deliveries(db, rows: list, deliveries: list, now: datetime, max_attempts: int) -> None:
+    """Write the outcome of one batch back: (id, attempts) rows paired with their deliveries"""
+    table = MessageRecipient.__table__
+    sent = [(row_id, d.provider_message_id) for (row_id, _), d in zip(rows, deliveries) if d.ok]
+    if sent and any(provider_id for _, provider_id in sent):
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(status=MessageStatus.SENT, sent_at=now, error=None, provider_message_id=bindparam("provider_id")),
+            [{"row_id": row_id, "provider_id": provider_id} for row_id, provider_id in sent],
+        )
+    elif sent:
+        db.execute(
+            update(MessageRecipient)
+            .where(MessageRecipient.id == any_id(row_id for row_id, _ in sent))
+            .values(status=MessageStatus.SENT, sent_at=now, error=None)
+            .execution_options(synchronize_session=False)
+        )
+    failed = [
+        {
+            "row_id": row_id,
+            "new_status": (
+                MessageStatus.QUEUED
+                if delivery.retry and attempts < max_attempts
+                else MessageStatus.FAILED
+            ),
+            "new_error": (delivery.error or "")[:2000],
+        }
+        for (row_id, attempts), delivery in zip(rows, deliveries)
+        if not delivery.ok
+    ]
+    if failed:
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("row_id"))
+            .values(status=bindparam("new_status"), error=bindparam("new_error"), updated_at=now),
+            failed,
+        )
+
+
+def finish_messages(db, message_ids, now: datetime) -> None:
+    """Close messages none of whose recipients are still pending"""
+    counts = db.execute(
+        select(MessageRecipient.message_id, MessageRecipient.status, func.count())
+        .where(MessageRecipient.message_id == any_id(message_ids))
+        .group_by(MessageRecipient.message_id, MessageRecipient.status)
+    ).all()
+    by_message = {}
+    for message_id, status, count in counts:
+        by_message.setdefault(message_id, Counter())[status.value] = count
+    for message_id, report in by_message.items():
+        if report[MessageStatus.QUEUED.value] or report[MessageStatus.SENDING.value]:
+            continue
+        failed = db.execute(
+            select(MessageRecipient.address).where(
+                MessageRecipient.message_id == message_id,
+                MessageRecipient.status == MessageStatus.FAILED,
+            )
+        ).scalars().all()
+        db.execute(
+            update(Message)
+            .where(Message.id == message_id, Message.status == MessageStatus.SENDING)
+            .values(
+                status=MessageStatus.SENT if report[MessageStatus.SENT.value] else MessageStatus.FAILED,
+                sent_at=now,
+                delivery_report=dict(report),
+                failed_recipients=failed or None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def dispatch_pending(
+    channel: MessageType,
+    batch_size: int,
+    send_batch,
+    now: datetime,
+    extra: Optional[Callable[[str], dict]] = None,
+    *,
+    max_claim: int,
+    max_attempts: int,
+) -> dict:
+    """Expand and claim every active school's pending `channel` messages, one `send_batch` task per chunk
+
+    At most `max_claim` recipients are claimed per school; the rest wait for
+    the next run.
+    """
+    with SessionLocal() as db:
+        school_ids = db.execute(
+            select(School.id).where(School.status == SchoolStatus.ACTIVE)
+        ).scalars().all()
+
+    totals = {"recipients": 0, "batches": 0}
+    for school_id in school_ids:
+        with SessionLocal() as db:
+            db.info["tenant_id"] = str(school_id)
+            try:
+                expand_messages(db, school_id, channel, now, extra)
+                stale = fail_stale(db, school_id, channel, now, max_attempts)
+                if stale:
+                    finish_messages(db, set(stale), now)
+                db.commit()
+                claimed = 0
+                while claimed < max_claim:
+                    limit = min(batch_size, max_claim - claimed)
+                    ids = claim_recipients(db, school_id, channel, limit, now, max_attempts)
+                    db.commit()
+                    if not ids:
+                        break
+                    send_batch.delay(str(school_id), [str(i) for i in ids], now.isoformat())
+                    claimed += len(ids)
+                    totals["recipients"] += len(ids)
+                    totals["batches"] += 1
+                    if len(ids) < limit:
+                        break
+            except Exception as e:
+                # One school's failure must not stop the others; it is retried next run
+                db.rollback()
+                logger.error(f"{channel.value} dispatch failed for school {school_id}: {str(e)}")
+    return totals
@@ -0,0 +1,304 @@
+"""SMS delivery through pluggable HTTP providers.
+
+A provider sends one body to a list of numbers; `max_batch` is how many
+numbers one API call accepts (Africa's Talking takes a comma-separated
+list, Twilio one number per request). `SMSSender` groups a batch by body,
+splits it into provider calls and runs them concurrently over one shared
+`httpx.AsyncClient` connection pool, paced by a token bucket per sender
+number (SMS_RATE_LIMIT messages per second per worker process).
+
+Celery tasks are synchronous, so each worker process runs one event loop in
+a background thread that owns the HTTP pool; tasks submit their sends to it
+and keep reusing its connections instead of opening new ones per task.
+
+`segments` counts GSM-7/UCS-2 segments the way carriers bill them, so the
+cost of a message is known before it is sent.
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.workers.delivery import Delivery
+
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Sent as an escape plus the character: two septets
+GSM7_EXTENDED = frozenset("\f^{}\\[~]|€")
+
+# (single message, per part of a concatenated message)
+SEGMENT_SIZES = {"gsm7": (160, 153), "ucs2": (70, 67)}
+
+
+def segments(text: str) -> Tuple[str, int]:
+    """(encoding, number of segments) of an SMS body"""
+    if all(ch in GSM7_BASIC or ch in GSM7_EXTENDED for ch in text):
+        encoding = "gsm7"
+        units = [2 if ch in GSM7_EXTENDED else 1 for ch in text]
+    else:
+        encoding = "ucs2"
+        # UTF-16 code units: characters outside the BMP take a surrogate pair
+        units = [2 if ord(ch) > 0xFFFF else 1 for ch in text]
+    single, part = SEGMENT_SIZES[encoding]
+    if sum(units) <= single:
+        return encoding, 1
+    # Escapes and surrogate pairs are never split across parts
+    count, used = 1, 0
+    for size in units:
+        if used + size > part:
+            count, used = count + 1, 0
+        used += size
+    return encoding, count
+
+
+def estimate_cost(body: str, recipients: int) -> dict:
+    encoding, count = segments(body)
+    return {
+        "encoding": encoding,
+        "segments": count,
+        "total_segments": count * recipients,
+        "cost": round(count * recipients * settings.SMS_SEGMENT_COST, 2),
+    }
+
+
+class AsyncTokenBucket:
+    """Token bucket for the coroutines of one event loop; rate <= 0 disables it"""
+    __slots__ = ("rate", "capacity", "_tokens", "_updated")
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self, tokens: int = 1) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        # Take the tokens now and wait off the debt, so a bulk call larger
+        # than the bucket still goes out and later callers queue behind it
+        self._tokens -= tokens
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+
+def _error(response: httpx.Response) -> str:
+    try:
+        detail = response.json().get("message")
+    except ValueError:
+        detail = None
+    return f"HTTP {response.status_code}: {detail or response.text[:200]}"
+
+
+def _retryable(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+class SMSProvider:
+    """Sends one body to up to `max_batch` numbers per call"""
+    name = "base"
+    max_batch = 1
+
+    def __init__(self, sender: str):
+        self.sender = sender
+
+    async def send(self, client: httpx.AsyncClient, body: str, numbers: Sequence[str]) -> List[Delivery]:
+        raise NotImplementedError
+
+
+class TwilioProvider(SMSProvider):
+    name = "twilio"
+    max_batch = 1
+    URL = "https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
+
+    def __init__(self, account_sid: str, auth_token: str, sender: str):
+        super().__init__(sender)
+        self.url = self.URL.format(account_sid=account_sid)
+        self.auth = (account_sid, auth_token)
+
+    async def send(self, client, body, numbers):
+        results = []
+        for number in numbers:
+            try:
+                response = await client.post(
+                    self.url, auth=self.auth, data={"To": number, "From": self.sender, "Body": body}
+                )
+            except httpx.HTTPError as e:
+                results.append(Delivery(number, str(e) or type(e).__name__, retry=True))
+                continue
+            if response.is_success:
+                results.append(Delivery(number, provider_message_id=response.json().get("sid")))
+            else:
+                results.append(Delivery(number, _error(response), retry=_retryable(response.status_code)))
+        return results
+
+
+class AfricasTalkingProvider(SMSProvider):
+    name = "africastalking"
+    max_batch = 1000
+    URL = "https://api.africastalking.com/version1/messaging"
+    SANDBOX_URL = "https://api.sandbox.africastalking.com/version1/messaging"
+    ACCEPTED = {100, 101, 102}  # Processed, Sent, Queued
+    RETRY = {405, 500, 501}  # InsufficientBalance, InternalServerError, GatewayError
+
+    def __init__(self, username: str, api_key: str, sender: Optional[str] = None):
+        super().__init__(sender or "")
+        self.username = username
+        self.url = self.SANDBOX_URL if username == "sandbox" else self.URL
+        self.headers = {"apiKey": api_key, "Accept": "application/json"}
+
+    async def send(self, client, body, numbers):
+        data = {"username": self.username, "to": ",".join(numbers), "message": body}
+        if self.sender:
+            data["from"] = self.sender
+        try:
+            response = await client.post(self.url, headers=self.headers, data=data)
+        except httpx.HTTPError as e:
+            return [Delivery(number, str(e) or type(e).__name__, retry=True) for number in numbers]
+        if not response.is_success:
+            error, retry = _error(response), _retryable(response.status_code)
+            return [Delivery(number, error, retry=retry) for number in numbers]
+
+        accepted = {r["number"]: r for r in response.json()["SMSMessageData"]["Recipients"]}
+        results = []
+        for number in numbers:
+            recipient = accepted.get(number)
+            if recipient is None:
+                results.append(Delivery(number, "Not in provider response", retry=True))
+            elif recipient.get("statusCode") in self.ACCEPTED:
+                results.append(Delivery(number, provider_message_id=recipient.get("messageId")))
+            else:
+                results.append(Delivery(
+                    number, recipient.get("status") or "Rejected", retry=recipient.get("statusCode") in self.RETRY
+                ))
+        return results
+
+
+class FakeProvider(SMSProvider):
+    """In-memory provider for tests and benchmarks; `latency` seconds per API call"""
+    name = "fake"
+
+    def __init__(self, sender: str = "INKINGI", *, max_batch: int = 1000, latency: float = 0.0, fail=()):
+        super().__init__(sender)
+        self.max_batch = max_batch
+        self.latency = latency
+        self.fail = set(fail)
+        self.sent: List[Tuple[str, str]] = []  # (number, body)
+        self.calls = 0
+
+    async def send(self, client, body, numbers):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        results = []
+        for number in numbers:
+            if number in self.fail:
+                results.append(Delivery(number, "Rejected by fake provider"))
+                continue
+            self.sent.append((number, body))
+            results.append(Delivery(number, provider_message_id=f"fake-{len(self.sent)}"))
+        return results
+
+
+PROVIDERS: Dict[str, Callable[[], SMSProvider]] = {
+    "twilio": lambda: TwilioProvider(
+        settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, settings.TWILIO_PHONE_NUMBER
+    ),
+    "africastalking": lambda: AfricasTalkingProvider(
+        settings.AFRICASTALKING_USERNAME, settings.AFRICASTALKING_API_KEY, settings.SMS_SENDER_ID
+    ),
+    "fake": lambda: FakeProvider(settings.SMS_SENDER_ID or "INKINGI"),
+}
+
+
+class SMSSender:
+    """Sends batches through one provider over a shared HTTP connection pool"""
+
+    _buckets: Dict[str, AsyncTokenBucket] = {}
+
+    def __init__(self, provider: SMSProvider, *, rate: float = 0.0, pool_size: int = 20, timeout: float = 15.0):
+        self.provider = provider
+        self.rate = rate
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _bucket(self) -> AsyncTokenBucket:
+        # Per sender number, shared by every sender object using it
+        bucket = self._buckets.get(self.provider.sender)
+        if bucket is None:
+            bucket = self._buckets[self.provider.sender] = AsyncTokenBucket(self.rate)
+        return bucket
+
+    async def send(self, messages: Sequence[Tuple[str, str]]) -> List[Delivery]:
+        """Send (number, body) pairs; deliveries come back in the same order"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        by_body: Dict[str, List[int]] = {}
+        for position, (_, body) in enumerate(messages):
+            by_body.setdefault(body, []).append(position)
+        bucket = self._bucket()
+
+        async def call(body: str, positions: List[int]):
+            await bucket.acquire(len(positions))
+            return positions, await self.provider.send(self._client, body, [messages[p][0] for p in positions])
+
+        calls = [
+            call(body, positions[start:start + self.provider.max_batch])
+            for body, positions in by_body.items()
+            for start in range(0, len(positions), self.provider.max_batch)
+        ]
+        results: List[Optional[Delivery]] = [None] * len(messages)
+        for positions, deliveries in await asyncio.gather(*calls):
+            for position, delivery in zip(positions, deliveries):
+                results[position] = delivery
+        return results
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class _LoopThread:
+    """Event loop of one worker process, run in a daemon thread"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="sms-sender", daemon=True).start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+_state = {"pid": None, "loop": None, "sender": None}
+_state_lock = threading.Lock()
+
+
+def _process_state() -> dict:
+    with _state_lock:
+        if _state["pid"] != os.getpid():
+            # The loop thread and its connections do not survive a fork
+            _state.update(pid=os.getpid(), loop=_LoopThread(), sender=None)
+        if _state["sender"] is None:
+            factory = PROVIDERS.get(settings.SMS_PROVIDER)
+            if factory is None:
+                raise ValueError(f"Unknown SMS provider '{settings.SMS_PROVIDER}'")
+            _state["sender"] = SMSSender(
+                factory(), rate=settings.SMS_RATE_LIMIT, pool_size=settings.SMS_HTTP_POOL_SIZE
+            )
+        return _state
+
+
+def send_messages(messages: Sequence[Tuple[str, str]]) -> List[Delivery]:
+    """Send (number, body) pairs with the worker process's sender, blocking until done"""
+    state = _process_state()
+    return state["loop"].run(state["sender"].send(messages))
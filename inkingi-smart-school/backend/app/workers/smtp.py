@@ -0,0 +1,211 @@
+"""Pooled SMTP delivery for the email workers.
+
+Each worker process keeps up to SMTP_POOL_SIZE connections per provider
+that have already been through EHLO, STARTTLS and LOGIN, and sends whole
+batches over one of them, so the handshake is paid once per connection
+instead of once per message. A connection that dropped is replaced and the
+batch resumes at the message that failed; a connection idle for a while is
+checked with NOOP before reuse. Sends are paced by a token bucket per
+provider (SMTP_RATE_LIMIT messages per second per worker process) to stay
+under the provider's throttling.
+"""
+from contextlib import contextmanager
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Iterator, List, Optional, Sequence
+import logging
+import os
+import smtplib
+import threading
+import time
+
+from app.core.config import settings
+from app.workers.delivery import Delivery
+
+logger = logging.getLogger(__name__)
+
+# Refusals of one message; the connection stays usable
+REFUSED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class TokenBucket:
+    """Blocking token bucket shared by the threads of one process; rate <= 0 disables it"""
+    __slots__ = ("rate", "capacity", "_tokens", "_updated", "_lock")
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SMTPPool:
+    """Authenticated SMTP connections to one provider"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        *,
+        use_tls: bool = True,
+        size: int = 4,
+        rate: float = 0.0,
+        timeout: float = 30.0,
+        max_idle: float = 60.0,
+        retries: int = 2,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.retries = retries
+        self.bucket = TokenBucket(rate)
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: List[tuple] = []  # (connection, idle since)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.ehlo()
+            if self.use_tls:
+                conn.starttls()
+                conn.ehlo()
+            if self.user:
+                conn.login(self.user, self.password)
+        except Exception:
+            self._discard(conn)
+            raise
+        return conn
+
+    @staticmethod
+    def _discard(conn: smtplib.SMTP) -> None:
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, since = self._idle.pop()
+            if time.monotonic() - since < self.max_idle:
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except smtplib.SMTPException:
+                pass
+            self._discard(conn)
+        return self._connect()
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        """A pooled connection; dropped instead of returned if the block raises"""
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except BaseException:
+            if conn is not None:
+                self._discard(conn)
+            raise
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def send(self, messages: Sequence[MIMEMultipart]) -> List[Delivery]:
+        """Send `messages` in order over one connection, reconnecting if it drops"""
+        results: List[Delivery] = []
+        failures = 0
+        while len(results) < len(messages):
+            try:
+                with self.connection() as conn:
+                    for msg in messages[len(results):]:
+                        self.bucket.acquire()
+                        try:
+                            conn.send_message(msg)
+                        except REFUSED as e:
+                            code = getattr(e, "smtp_code", None)
+                            results.append(Delivery(msg["To"], str(e), retry=code is not None and 400 <= code < 500))
+                        else:
+                            results.append(Delivery(msg["To"]))
+            except (OSError, smtplib.SMTPException) as e:
+                failures += 1
+                if failures > self.retries:
+                    logger.error(f"SMTP {self.host}:{self.port} unavailable: {str(e)}")
+                    results.extend(Delivery(msg["To"], str(e), retry=True) for msg in messages[len(results):])
+                    break
+                logger.warning(f"SMTP connection to {self.host} failed, reconnecting: {str(e)}")
+                time.sleep(0.5 * failures)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    """The worker process's pool for the configured provider"""
+    global _pools_pid
+    key = (settings.SMTP_HOST, settings.SMTP_PORT, settings.SMTP_USER)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Connections inherited through fork belong to the parent
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPPool(
+                settings.SMTP_HOST,
+                settings.SMTP_PORT,
+                settings.SMTP_USER,
+                settings.SMTP_PASSWORD,
+                use_tls=settings.SMTP_USE_TLS,
+                size=settings.SMTP_POOL_SIZE,
+                rate=settings.SMTP_RATE_LIMIT,
+            )
+    return pool
+
+
+def build_message(to_email: str, subject: str, body: str, html_body: str = None) -> MIMEMultipart:
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = f"{settings.EMAIL_FROM_NAME} <{settings.EMAIL_FROM}>"
+    msg["To"] = to_email
+    msg.attach(MIMEText(body, "plain"))
+    if html_body:
+        msg.attach(MIMEText(html_body, "html"))
+    return msg
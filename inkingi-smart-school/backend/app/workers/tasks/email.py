@@ -1,9 +1,20 @@
+"""Email delivery tasks.
+
+Every minute `send_pending_emails` expands and claims queued email
+messages (see app.workers.outbox) and hands each chunk of EMAIL_BATCH_SIZE
+recipients to one `send_email_batch` task, which sends it over a pooled
+SMTP connection (see app.workers.smtp) and writes the outcomes back.
+"""
+from datetime import datetime, timezone
+import logging
+
 from celery import shared_task
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+
 from app.core.config import settings
-import logging
+from app.core.database import SessionLocal
+from app.models.communication import MessageType
+from app.workers.outbox import chunks, dispatch_pending, finish_messages, load_claimed, record_deliveries
+from app.workers.smtp import build_message, get_pool
 
 logger = logging.getLogger(__name__)
 
@@ -11,45 +22,67 @@ logger = logging.getLogger(__name__)
 @shared_task
 def send_email(to_email: str, subject: str, body: str, html_body: str = None):
     """Send email to a single recipient"""
-    try:
-        # Create message
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = f"{settings.EMAIL_FROM_NAME} <{settings.EMAIL_FROM}>"
-        msg["To"] = to_email
-        
-        # Add text and HTML parts
-        msg.attach(MIMEText(body, "plain"))
-        if html_body:
-            msg.attach(MIMEText(html_body, "html"))
-        
-        # Send email
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.send_message(msg)
-        
+    delivery = get_pool().send([build_message(to_email, subject, body, html_body)])[0]
+    if delivery.ok:
         logger.info(f"Email sent successfully to {to_email}")
         return {"status": "success", "recipient": to_email}
-        
-    except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {str(e)}")
-        return {"status": "failed", "recipient": to_email, "error": str(e)}
+    logger.error(f"Failed to send email to {to_email}: {delivery.error}")
+    return {"status": "failed", "recipient": to_email, "error": delivery.error}
+
+
+@shared_task
+def send_emails(recipients: list, subject: str, body: str, html_body: str = None):
+    """Send the same email to a chunk of recipients over one connection"""
+    deliveries = get_pool().send([build_message(to, subject, body, html_body) for to in recipients])
+    failed = {d.address: d.error for d in deliveries if not d.ok}
+    if failed:
+        logger.error(f"Failed to send email to {len(failed)} of {len(recipients)} recipients")
+    return {"total": len(recipients), "sent": len(recipients) - len(failed), "failed": failed}
 
 
 @shared_task
 def send_bulk_email(recipients: list, subject: str, body: str, html_body: str = None):
-    """Send email to multiple recipients"""
-    results = []
-    for recipient in recipients:
-        result = send_email.delay(recipient, subject, body, html_body)
-        results.append(result)
-    return {"total": len(recipients), "queued": len(results)}
+    """Send email to multiple recipients, EMAIL_BATCH_SIZE per task"""
+    batches = 0
+    for chunk in chunks(list(recipients), settings.EMAIL_BATCH_SIZE):
+        send_emails.delay(chunk, subject, body, html_body)
+        batches += 1
+    return {"total": len(recipients), "queued": len(recipients), "batches": batches}
+
+
+@shared_task
+def send_email_batch(school_id: str, recipient_ids: list, claimed_at: str):
+    """Send one claimed chunk of recipient rows over one pooled connection"""
+    with SessionLocal() as db:
+        db.info["tenant_id"] = str(school_id)
+        rows = load_claimed(db, recipient_ids, datetime.fromisoformat(claimed_at), datetime.now(timezone.utc))
+        # Nothing is held open while sending
+        db.commit()
+        if not rows:
+            return {"sent": 0, "failed": 0}
+
+        deliveries = get_pool().send([
+            build_message(row.address, row.subject or "", row.content) for row in rows
+        ])
+        now = datetime.now(timezone.utc)
+        record_deliveries(db, [(row.id, row.attempts) for row in rows], deliveries, now, settings.EMAIL_MAX_ATTEMPTS)
+        finish_messages(db, {row.message_id for row in rows}, now)
+        db.commit()
+
+    sent = sum(d.ok for d in deliveries)
+    return {"sent": sent, "failed": len(deliveries) - sent}
 
 
 @shared_task
 def send_pending_emails():
     """Process pending emails from database"""
-    # This would fetch pending emails from database and send them
-    logger.info("Processing pending emails...")
-    return {"processed": 0}
\ No newline at end of file
+    totals = dispatch_pending(
+        MessageType.EMAIL,
+        settings.EMAIL_BATCH_SIZE,
+        send_email_batch,
+        datetime.now(timezone.utc),
+        max_claim=settings.EMAIL_DISPATCH_LIMIT,
+        max_attempts=settings.EMAIL_MAX_ATTEMPTS,
+    )
+    logger.info(f"Processing pending emails: {totals}")
+    return totals
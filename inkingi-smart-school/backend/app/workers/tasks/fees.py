@@ -0,0 +1,165 @@
+"""Overdue fee sweeper.
+
+Each run only looks at unpaid fees due between the school's checkpoint
+(`overdue_sweeps.swept_through`, the day of its previous run) and today,
+through the (school_id, is_paid, due_date) index. A school without a
+checkpoint starts OVERDUE_FIRST_SWEEP_DAYS back, so its first run is
+bounded too. Fees are marked in
+batches of OVERDUE_SWEEP_BATCH with one `UPDATE ... WHERE id = ANY(:ids)`
+that also adds the fee structure's `late_fee_amount`; `overdue_since` keeps
+a fee from being charged twice if a run is repeated. Parents with an email
+address get one reminder per batch listing their children's overdue fees,
+queued after the batch commits.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+import logging
+
+from celery import shared_task
+from sqlalchemy import any_, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.fees import FeeStructure, OverdueSweep, StudentFee
+from app.models.school import School, SchoolStatus
+from app.models.student import Parent, Student, StudentParent
+from app.workers.tasks.email import send_email
+
+logger = logging.getLogger(__name__)
+
+REMINDER_SUBJECT = "School fees overdue"
+
+
+def _any_id(ids):
+    return any_(literal(list(ids), ARRAY(UUID(as_uuid=True))))
+
+
+def _reminders(db, school_id, fees) -> list:
+    """(email, body) per parent of the students owning `fees`."""
+    by_student = defaultdict(list)
+    for fee in fees:
+        by_student[fee.student_id].append(fee)
+    rows = db.execute(
+        select(Parent.email, Parent.first_name, Student.id, Student.first_name, Student.last_name)
+        .join(StudentParent, StudentParent.parent_id == Parent.id)
+        .join(Student, Student.id == StudentParent.student_id)
+        .where(
+            StudentParent.school_id == school_id,
+            StudentParent.student_id == _any_id(by_student),
+            Parent.email.isnot(None),
+        )
+    ).all()
+
+    lines = defaultdict(list)
+    names = {}
+    for email, parent_name, student_id, first_name, last_name in rows:
+        names[email] = parent_name
+        for fee in by_student[student_id]:
+            lines[email].append(
+                f"- {first_name} {last_name}: {fee.balance:,.2f} due on {fee.due_date:%d %b %Y}"
+            )
+    return [
+        (
+            email,
+            f"Dear {names[email]},\n\nThe following school fees are past their due date:\n"
+            + "\n".join(student_lines)
+            + "\n\nPlease pay the outstanding balance as soon as possible.",
+        )
+        for email, student_lines in lines.items()
+    ]
+
+
+def sweep_school(db, school_id, today: date, batch_size: int, first_sweep_days: int) -> dict:
+    """Mark one school's newly overdue fees; commits per batch."""
+    since = db.execute(
+        select(OverdueSweep.swept_through).where(OverdueSweep.school_id == school_id)
+    ).scalar_one_or_none()
+    if since is None:
+        since = today - timedelta(days=first_sweep_days)
+    elif since >= today:
+        return {"fees": 0, "late_fees": 0.0, "reminders": 0}
+
+    late_fee = func.coalesce(
+        select(FeeStructure.late_fee_amount)
+        .where(FeeStructure.id == StudentFee.fee_structure_id)
+        .scalar_subquery(),
+        0,
+    )
+    unpaid = (
+        StudentFee.school_id == school_id,
+        StudentFee.is_paid == "false",
+        StudentFee.overdue_since.is_(None),
+    )
+    marked, late_fees, reminders = 0, 0.0, 0
+    while True:
+        ids = db.execute(
+            select(StudentFee.id)
+            .where(*unpaid, StudentFee.due_date >= since, StudentFee.due_date < today)
+            .order_by(StudentFee.due_date, StudentFee.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        fees = db.execute(
+            update(StudentFee)
+            .where(StudentFee.id == _any_id(ids), *unpaid)
+            .values(
+                overdue_since=today,
+                late_fee_charged=late_fee,
+                amount=StudentFee.amount + late_fee,
+                balance=StudentFee.balance + late_fee,
+            )
+            .returning(StudentFee.student_id, StudentFee.balance, StudentFee.due_date, StudentFee.late_fee_charged)
+            .execution_options(synchronize_session=False)
+        ).all()
+        emails = _reminders(db, school_id, fees) if fees else []
+        db.commit()
+
+        # Only once the batch is committed
+        for email, body in emails:
+            send_email.delay(email, REMINDER_SUBJECT, body)
+        marked += len(fees)
+        late_fees += sum(fee.late_fee_charged for fee in fees)
+        reminders += len(emails)
+        if len(ids) < batch_size:
+            break
+
+    stmt = insert(OverdueSweep).values(school_id=school_id, swept_through=today)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["school_id"],
+            set_={"swept_through": stmt.excluded.swept_through, "updated_at": func.now()},
+        )
+    )
+    db.commit()
+    return {"fees": marked, "late_fees": late_fees, "reminders": reminders}
+
+
+@shared_task
+def sweep_overdue_fees():
+    """Mark newly overdue fees of every active school and queue parent reminders"""
+    today = date.today()
+    with SessionLocal() as db:
+        school_ids = db.execute(
+            select(School.id).where(School.status == SchoolStatus.ACTIVE)
+        ).scalars().all()
+
+    totals = {"schools": len(school_ids), "fees": 0, "late_fees": 0.0, "reminders": 0}
+    for school_id in school_ids:
+        with SessionLocal() as db:
+            # Applied as the RLS tenant at the start of every transaction
+            db.info["tenant_id"] = str(school_id)
+            try:
+                result = sweep_school(
+                    db, school_id, today, settings.OVERDUE_SWEEP_BATCH, settings.OVERDUE_FIRST_SWEEP_DAYS
+                )
+            except Exception as e:
+                # One school's failure must not stop the others; it is retried next run
+                logger.error(f"Overdue sweep failed for school {school_id}: {str(e)}")
+                continue
+        for key in ("fees", "late_fees", "reminders"):
+            totals[key] += result[key]
+    logger.info(f"Overdue sweep done: {totals}")
+    return totals
@@ -0,0 +1,92 @@
+"""SMS delivery tasks.
+
+Every minute `send_pending_sms` expands and claims queued SMS messages (see
+app.workers.outbox), recording each recipient's segment count as it is
+queued, and hands each chunk of SMS_BATCH_SIZE recipients to one
+`send_sms_batch` task, which sends it through the configured provider (see
+app.workers.sms) and writes the outcomes and provider message ids back.
+"""
+from datetime import datetime, timezone
+import logging
+
+from celery import shared_task
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.communication import MessageType
+from app.workers.outbox import chunks, dispatch_pending, finish_messages, load_claimed, record_deliveries
+from app.workers.sms import estimate_cost, segments, send_messages
+
+logger = logging.getLogger(__name__)
+
+
+def _segment_columns(content: str) -> dict:
+    return {"segments": segments(content)[1]}
+
+
+@shared_task
+def send_sms(to_phone: str, body: str):
+    """Send SMS to a single recipient"""
+    delivery = send_messages([(to_phone, body)])[0]
+    if delivery.ok:
+        logger.info(f"SMS sent successfully to {to_phone}")
+        return {"status": "success", "recipient": to_phone, "provider_message_id": delivery.provider_message_id}
+    logger.error(f"Failed to send SMS to {to_phone}: {delivery.error}")
+    return {"status": "failed", "recipient": to_phone, "error": delivery.error}
+
+
+@shared_task
+def send_sms_messages(recipients: list, body: str):
+    """Send the same SMS to a chunk of recipients, in as few provider calls as it allows"""
+    deliveries = send_messages([(to, body) for to in recipients])
+    failed = {d.address: d.error for d in deliveries if not d.ok}
+    if failed:
+        logger.error(f"Failed to send SMS to {len(failed)} of {len(recipients)} recipients")
+    return {"total": len(recipients), "sent": len(recipients) - len(failed), "failed": failed}
+
+
+@shared_task
+def send_bulk_sms(recipients: list, body: str):
+    """Send SMS to multiple recipients, SMS_BATCH_SIZE per task"""
+    batches = 0
+    for chunk in chunks(list(recipients), settings.SMS_BATCH_SIZE):
+        send_sms_messages.delay(chunk, body)
+        batches += 1
+    return {"total": len(recipients), "queued": len(recipients), "batches": batches, **estimate_cost(body, len(recipients))}
+
+
+@shared_task
+def send_sms_batch(school_id: str, recipient_ids: list, claimed_at: str):
+    """Send one claimed chunk of recipient rows"""
+    with SessionLocal() as db:
+        db.info["tenant_id"] = str(school_id)
+        rows = load_claimed(db, recipient_ids, datetime.fromisoformat(claimed_at), datetime.now(timezone.utc))
+        # Nothing is held open while sending
+        db.commit()
+        if not rows:
+            return {"sent": 0, "failed": 0}
+
+        deliveries = send_messages([(row.address, row.content) for row in rows])
+        now = datetime.now(timezone.utc)
+        record_deliveries(db, [(row.id, row.attempts) for row in rows], deliveries, now, settings.SMS_MAX_ATTEMPTS)
+        finish_messages(db, {row.message_id for row in rows}, now)
+        db.commit()
+
+    sent = sum(d.ok for d in deliveries)
+    return {"sent": sent, "failed": len(deliveries) - sent}
+
+
+@shared_task
+def send_pending_sms():
+    """Process pending SMS messages from database"""
+    totals = dispatch_pending(
+        MessageType.SMS,
+        settings.SMS_BATCH_SIZE,
+        send_sms_batch,
+        datetime.now(timezone.utc),
+        _segment_columns,
+        max_claim=settings.SMS_DISPATCH_LIMIT,
+        max_attempts=settings.SMS_MAX_ATTEMPTS,
+    )
+    logger.info(f"Processing pending SMS: {totals}")
+    return totals
@@ -0,0 +1,139 @@
+"""Requests per second through the tenant and rate-limit middleware.
+
+Serves a trivial JSON endpoint and a streaming CSV export (`--rows` rows,
+one chunk each) through two middleware stacks and reports requests/sec for
+`--requests` requests, `--concurrency` at a time, over httpx's in-process
+ASGI transport:
+
+- before: the previous BaseHTTPMiddleware implementations (same tenant
+          parsing and rate-limit checks, run through dispatch/call_next)
+- after:  app.api.middleware's plain ASGI TenantMiddleware and
+          RateLimitMiddleware
+
+Rate limits are checked against the in-process limiter only unless
+`--redis` is given, so the numbers show the middleware cost itself:
+
+    python benchmarks/middleware.py --requests 5000 --rows 1000
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# app.core.config requires these; nothing here connects to them without --redis
+for name, value in {
+    "SECRET_KEY": "benchmark", "JWT_SECRET_KEY": "benchmark",
+    "DATABASE_URL": "postgresql+asyncpg://localhost/benchmark", "DATABASE_SYNC_URL": "postgresql://localhost/benchmark",
+    "REDIS_URL": "redis://localhost", "CELERY_BROKER_URL": "redis://localhost", "CELERY_RESULT_BACKEND": "redis://localhost",
+    "SMTP_HOST": "127.0.0.1", "SMTP_PORT": "25", "SMTP_USER": "", "SMTP_PASSWORD": "",
+    "EMAIL_FROM": "bench@example.com", "EMAIL_FROM_NAME": "Benchmark",
+    "RATE_LIMIT_REQUESTS": "100000000",
+    "TENANT_BASE_DOMAINS": "app.com",
+}.items():
+    os.environ.setdefault(name, value)
+
+from app.api.middleware.rate_limit import RateLimitMiddleware  # noqa: E402
+from app.api.middleware.tenant import TenantMiddleware  # noqa: E402
+from app.core.rate_limit import RateLimiter, quotas_for  # noqa: E402
+
+
+class LegacyTenantMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        host = request.headers.get("host", "")
+        tenant_slug = None
+        if "." in host:
+            subdomain = host.split(".")[0]
+            if subdomain and subdomain not in ["www", "api", "app"]:
+                tenant_slug = subdomain
+        if not tenant_slug:
+            tenant_slug = request.headers.get("x-tenant-id")
+        request.state.tenant_slug = tenant_slug
+        return await call_next(request)
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.limiter = RateLimiter()
+
+    async def dispatch(self, request: Request, call_next):
+        quotas = quotas_for(request.url.path, request.client.host if request.client else "unknown")
+        result = await self.limiter.check(quotas)
+        if not result.allowed:
+            return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded."}, headers=result.headers())
+        response = await call_next(request)
+        response.headers.update(result.headers())
+        return response
+
+
+def build(legacy: bool, rows: int, use_redis: bool):
+    app = FastAPI()
+
+    @app.get("/api/v1/ping")
+    async def ping(request: Request):
+        return {"tenant": request.state.tenant_slug}
+
+    @app.get("/api/v1/export")
+    async def export():
+        async def lines():
+            yield "id,name,balance\n"
+            for i in range(rows):
+                yield f"{i},Student {i},{i * 1000}\n"
+        return StreamingResponse(lines(), media_type="text/csv")
+
+    if legacy:
+        app.add_middleware(LegacyTenantMiddleware)
+        app.add_middleware(LegacyRateLimitMiddleware)
+        stack = app.build_middleware_stack()
+        limiter = stack.app.limiter
+    else:
+        stack = RateLimitMiddleware(TenantMiddleware(app))
+        limiter = stack.limiter
+    if not use_redis:
+        # In-process limits only
+        limiter._redis_down_until = math.inf
+    return stack
+
+
+async def run(stack, path: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=stack, client=("10.0.0.1", 1234))
+    async with httpx.AsyncClient(transport=transport, base_url="http://school1.app.com") as client:
+        remaining = iter(range(requests))
+
+        async def worker():
+            for _ in remaining:
+                response = await client.get(path)
+                assert response.status_code == 200, response.status_code
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--redis", action="store_true")
+    args = parser.parse_args()
+
+    for path in ("/api/v1/ping", "/api/v1/export"):
+        for legacy in (True, False):
+            stack = build(legacy, args.rows, args.redis)
+            rate = await run(stack, path, args.requests, args.concurrency)
+            print(f"{path:16} {'before' if legacy else 'after':7} {rate:9.1f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
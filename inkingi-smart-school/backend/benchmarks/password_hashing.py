@@ -0,0 +1,89 @@
+"""Latency of unrelated requests during a login storm.
+
+Runs `--logins` concurrent password verifications on one event loop while a
+probe coroutine stands in for an unrelated endpoint, waking every 5ms. The
+probe's scheduling delay is what any other request on the worker waits.
+Reports probe p50/p99/max and login throughput:
+
+- inline: pwd_context.verify called in the coroutine (the old login route)
+- pool:   app.core.hashing.PasswordHasher with `--workers` threads and
+          `--max-pending` admission (rejected logins are counted)
+
+    python benchmarks/password_hashing.py --logins 200 --rounds 12
+    python benchmarks/password_hashing.py --scheme argon2 --logins 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from passlib.context import CryptContext
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.hashing import HashingBusy, PasswordHasher  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+PROBE_INTERVAL = 0.005
+
+
+async def probe(delays: list, stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        delays.append(time.perf_counter() - expected)
+
+
+async def run(strategy, context, hashed, args):
+    hasher = PasswordHasher(context, args.workers, args.max_pending)
+
+    async def login():
+        if strategy == "inline":
+            return context.verify(PASSWORD, hashed)
+        try:
+            return (await hasher.verify(PASSWORD, hashed))[0]
+        except HashingBusy:
+            return None
+
+    delays, stop = [], asyncio.Event()
+    probing = asyncio.create_task(probe(delays, stop))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    results = []
+    # Logins arrive in waves, as clients retry
+    for _ in range(0, args.logins, args.wave):
+        results += await asyncio.gather(*(login() for _ in range(args.wave)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probing
+    hasher.shutdown()
+
+    delays_ms = sorted(d * 1000 for d in delays)
+    p99 = delays_ms[int(len(delays_ms) * 0.99) - 1] if delays_ms else 0.0
+    verified = sum(r is True for r in results)
+    print(
+        f"{strategy:7} probe p50 {statistics.median(delays_ms):7.1f}ms  p99 {p99:7.1f}ms  max {delays_ms[-1]:7.1f}ms"
+        f"  logins {verified:5d} ok {sum(r is None for r in results):5d} rejected  {verified / elapsed:7.1f}/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt rounds / argon2 time cost")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--wave", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=64)
+    args = parser.parse_args()
+
+    context = CryptContext(schemes=[args.scheme], **{f"{args.scheme}__rounds": args.rounds})
+    hashed = context.hash(PASSWORD)
+    for strategy in ("inline", "pool"):
+        asyncio.run(run(strategy, context, hashed, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Per-request overhead of the rate limiter.
+
+Runs `--requests` checks, one after another, for `--clients` users of one
+tenant and reports microseconds per check:
+
+- incr_expire: the old middleware, INCR then EXPIRE on a fixed-window key
+               (two round-trips on a window's first request)
+- lua:         app.core.rate_limit.RateLimiter, user + tenant + route quotas
+               in one script call
+- local:       the in-process pre-limiter alone (what a Redis outage or an
+               already-blocked client costs)
+- over_limit:  RateLimiter with one client far past its quota; after the
+               first denial from Redis it is turned away locally
+
+Needs a Redis server for all but `local`:
+
+    python benchmarks/rate_limit.py --redis-url redis://localhost:6379/15 --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# app.core.config requires these; only REDIS_URL is used
+parser = argparse.ArgumentParser()
+parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+parser.add_argument("--requests", type=int, default=10000)
+parser.add_argument("--clients", type=int, default=50)
+args = parser.parse_args()
+
+os.environ["REDIS_URL"] = args.redis_url
+for name, value in {
+    "SECRET_KEY": "benchmark", "JWT_SECRET_KEY": "benchmark",
+    "DATABASE_URL": "postgresql+asyncpg://localhost/benchmark", "DATABASE_SYNC_URL": "postgresql://localhost/benchmark",
+    "CELERY_BROKER_URL": "redis://localhost", "CELERY_RESULT_BACKEND": "redis://localhost",
+    "SMTP_HOST": "127.0.0.1", "SMTP_PORT": "25", "SMTP_USER": "", "SMTP_PASSWORD": "",
+    "EMAIL_FROM": "bench@example.com", "EMAIL_FROM_NAME": "Benchmark",
+    # Generous quotas so only over_limit gets denied
+    "RATE_LIMIT_USER_REQUESTS": "1000000", "RATE_LIMIT_TENANT_REQUESTS": "1000000",
+    "RATE_LIMIT_ROUTE_QUOTAS": '{"/api/v1/auth/": 1000000}',
+}.items():
+    os.environ.setdefault(name, value)
+
+from app.core.cache import get_redis  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.rate_limit import LocalLimiter, Quota, RateLimiter  # noqa: E402
+
+PERIOD = 60
+
+
+def quotas(client: int):
+    return [
+        Quota(f"rl:bench:user:{client}", settings.RATE_LIMIT_USER_REQUESTS, PERIOD),
+        Quota("rl:bench:tenant:1", settings.RATE_LIMIT_TENANT_REQUESTS, PERIOD),
+        Quota(f"rl:bench:route:/api/v1/auth/:user:{client}", settings.RATE_LIMIT_ROUTE_QUOTAS["/api/v1/auth/"], PERIOD),
+    ]
+
+
+async def incr_expire(n):
+    client = get_redis()
+    for i in range(n):
+        key = f"rl:bench:fixed:{i % args.clients}:{int(time.time() // PERIOD)}"
+        if await client.incr(key) == 1:
+            await client.expire(key, PERIOD)
+    return n
+
+
+async def lua(n):
+    limiter = RateLimiter()
+    allowed = 0
+    for i in range(n):
+        allowed += (await limiter.check(quotas(i % args.clients))).allowed
+    return allowed
+
+
+async def local(n):
+    limiter = LocalLimiter(settings.RATE_LIMIT_LOCAL_MAXSIZE)
+    return sum(limiter.check(quotas(i % args.clients)).allowed for i in range(n))
+
+
+async def over_limit(n):
+    limiter = RateLimiter()
+    abuser = [Quota("rl:bench:abuser", 10, PERIOD)]
+    allowed = 0
+    for _ in range(n):
+        allowed += (await limiter.check(abuser)).allowed
+    return allowed
+
+
+async def main():
+    try:
+        await get_redis().ping()
+        strategies = (incr_expire, lua, local, over_limit)
+    except Exception as e:
+        print(f"Redis unavailable ({e}); running local only")
+        strategies = (local,)
+    for strategy in strategies:
+        if strategy is not local:
+            keys = await get_redis().keys("rl:bench:*")
+            if keys:
+                await get_redis().delete(*keys)
+        started = time.perf_counter()
+        allowed = await strategy(args.requests)
+        elapsed = time.perf_counter() - started
+        print(f"{strategy.__name__:12} {elapsed / args.requests * 1e6:8.1f} us/check  {allowed:7d} allowed")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
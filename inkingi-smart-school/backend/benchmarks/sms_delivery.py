@@ -0,0 +1,80 @@
+"""SMS throughput through the fake provider.
+
+Sends one reminder to `--recipients` numbers with `--latency` seconds per
+provider API call and reports messages per second:
+
+- per_message: one API call per number, one after another (a send_sms
+               task per recipient)
+- single:      app.workers.sms.SMSSender over a provider without a bulk
+               API (one number per call), calls run concurrently
+- bulk:        SMSSender over a provider taking `--batch` numbers per call
+
+    python benchmarks/sms_delivery.py --recipients 5000 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# app.core.config requires these; nothing here connects to them
+for name, value in {
+    "SECRET_KEY": "benchmark", "JWT_SECRET_KEY": "benchmark",
+    "DATABASE_URL": "postgresql+asyncpg://localhost/benchmark", "DATABASE_SYNC_URL": "postgresql://localhost/benchmark",
+    "REDIS_URL": "redis://localhost", "CELERY_BROKER_URL": "redis://localhost", "CELERY_RESULT_BACKEND": "redis://localhost",
+    "SMTP_HOST": "127.0.0.1", "SMTP_PORT": "25", "SMTP_USER": "", "SMTP_PASSWORD": "",
+    "EMAIL_FROM": "bench@example.com", "EMAIL_FROM_NAME": "Benchmark",
+}.items():
+    os.environ.setdefault(name, value)
+
+from app.workers.sms import FakeProvider, SMSSender, estimate_cost  # noqa: E402
+
+BODY = "Dear parent, a school fees invoice for your child is past its due date. Please pay the outstanding balance."
+
+
+async def per_message(messages, latency, batch):
+    provider = FakeProvider(max_batch=1, latency=latency)
+    for number, body in messages:
+        await provider.send(None, body, [number])
+    return provider
+
+
+async def single(messages, latency, batch):
+    provider = FakeProvider(max_batch=1, latency=latency)
+    sender = SMSSender(provider)
+    await sender.send(messages)
+    await sender.aclose()
+    return provider
+
+
+async def bulk(messages, latency, batch):
+    provider = FakeProvider(max_batch=batch, latency=latency)
+    sender = SMSSender(provider)
+    await sender.send(messages)
+    await sender.aclose()
+    return provider
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recipients", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    messages = [(f"+2507{i:08d}", BODY) for i in range(args.recipients)]
+    print(f"estimate: {estimate_cost(BODY, len(messages))}")
+    for strategy in (per_message, single, bulk):
+        started = time.perf_counter()
+        provider = asyncio.run(strategy(messages, args.latency, args.batch))
+        elapsed = time.perf_counter() - started
+        print(
+            f"{strategy.__name__:12} {len(provider.sent):6d} msgs  {provider.calls:6d} calls"
+            f"  {elapsed:7.2f}s  {len(provider.sent) / elapsed:10.1f} msg/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
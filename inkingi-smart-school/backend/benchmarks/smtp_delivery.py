@@ -0,0 +1,119 @@
+"""Email throughput against a local aiosmtpd stand-in.
+
+Sends `--messages` emails through a local SMTP sink under each strategy and
+reports messages per second:
+
+- per_message: new connection, EHLO and QUIT for every message (the old
+               `send_email` task, minus STARTTLS/LOGIN)
+- pooled:      app.workers.smtp.SMTPPool, `--batch` messages per send()
+               from `--workers` threads sharing the pool
+
+`--latency` adds a delay (seconds) to every SMTP command the sink answers,
+standing in for a remote provider's round-trips:
+
+    pip install aiosmtpd
+    python benchmarks/smtp_delivery.py --messages 2000 --workers 4 --latency 0.002
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# app.core.config requires these; nothing here connects to them
+for name, value in {
+    "SECRET_KEY": "benchmark", "JWT_SECRET_KEY": "benchmark",
+    "DATABASE_URL": "postgresql+asyncpg://localhost/benchmark", "DATABASE_SYNC_URL": "postgresql://localhost/benchmark",
+    "REDIS_URL": "redis://localhost", "CELERY_BROKER_URL": "redis://localhost", "CELERY_RESULT_BACKEND": "redis://localhost",
+    "SMTP_HOST": "127.0.0.1", "SMTP_PORT": "8025", "SMTP_USER": "", "SMTP_PASSWORD": "",
+    "EMAIL_FROM": "bench@example.com", "EMAIL_FROM_NAME": "Benchmark",
+}.items():
+    os.environ.setdefault(name, value)
+
+from aiosmtpd.controller import Controller  # noqa: E402
+from aiosmtpd.smtp import SMTP  # noqa: E402
+
+from app.workers.smtp import SMTPPool, build_message  # noqa: E402
+
+
+class Sink:
+    def __init__(self):
+        self.received = 0
+        self._lock = threading.Lock()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.received += 1
+        return "250 OK"
+
+
+class SlowSMTP(SMTP):
+    latency = 0.0
+
+    async def push(self, status):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await super().push(status)
+
+
+class SlowController(Controller):
+    def factory(self):
+        return SlowSMTP(self.handler, **self.SMTP_kwargs)
+
+
+def per_message(host, port, messages, workers, batch):
+    def send(msg):
+        with smtplib.SMTP(host, port) as server:
+            server.send_message(msg)
+
+    with ThreadPoolExecutor(workers) as executor:
+        list(executor.map(send, messages))
+
+
+def pooled(host, port, messages, workers, batch):
+    pool = SMTPPool(host, port, use_tls=False, size=workers)
+    chunks = [messages[i:i + batch] for i in range(0, len(messages), batch)]
+    with ThreadPoolExecutor(workers) as executor:
+        for deliveries in executor.map(pool.send, chunks):
+            failed = [d for d in deliveries if not d.ok]
+            if failed:
+                raise RuntimeError(f"{len(failed)} messages failed: {failed[0].error}")
+    pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    SlowSMTP.latency = args.latency
+    sink = Sink()
+    controller = SlowController(sink, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        messages = [
+            build_message(f"parent{i}@example.com", "School fees overdue", "Please pay the outstanding balance.")
+            for i in range(args.messages)
+        ]
+        for strategy in (per_message, pooled):
+            before = sink.received
+            started = time.perf_counter()
+            strategy("127.0.0.1", args.port, messages, args.workers, args.batch)
+            elapsed = time.perf_counter() - started
+            delivered = sink.received - before
+            print(f"{strategy.__name__:12} {delivered:6d} msgs  {elapsed:7.2f}s  {delivered / elapsed:9.1f} msg/s")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()